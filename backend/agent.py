@@ -0,0 +1,194 @@
+"""
+远程探测节点 - 独立入口
+
+从监控平台API领取探测任务（拉模式），复用 MonitorService.check_service 执行探测，
+结果按批次gzip压缩后回传。节点不需要数据库连接，可部署在多台机器/多个网络位置。
+
+用法:
+    python agent.py --server http://monitor:8001 --agent-id bj-01 --location beijing
+服务端需设置 PROBE_EXECUTION=agent 和 AGENT_TOKEN，节点通过 --token 传入同一令牌。
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import signal
+import socket
+from datetime import datetime
+from typing import Dict, Any, List
+
+# 节点不访问数据库，避免加载MySQL驱动和连接配置
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import httpx
+
+from app.core.config import settings
+from app.models.service import MonitorService as ServiceModel
+from app.services.monitor import monitor_service
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - probe-agent - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("probe_agent")
+
+
+class ProbeAgent:
+    """远程探测节点"""
+
+    def __init__(self, server: str, agent_id: str, token: str = "", location: str = None,
+                 concurrency: int = 100, batch_size: int = 200, flush_interval: float = 2.0,
+                 poll_interval: float = 5.0):
+        self.agent_id = agent_id
+        self.location = location
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        # 已领取未完成的任务上限，保证领取的任务能在租约超时前完成
+        self.max_in_flight = concurrency * 2
+
+        # 导入模块时已创建全局实例，直接复用，避免再建一套连接池
+        self.monitor = monitor_service
+        self.monitor.dispatcher.max_concurrency = concurrency
+        self.monitor.dispatcher.result_handler = self._collect
+
+        headers = {"X-Agent-Token": token} if token else {}
+        self.api = httpx.AsyncClient(base_url=server.rstrip("/"), headers=headers, timeout=30.0)
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_event = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._drained = False
+
+    async def _collect(self, service: ServiceModel, result: Dict[str, Any]):
+        """收集探测结果，攒够一批时触发回传"""
+        result = dict(result)
+        if isinstance(result.get("check_time"), datetime):
+            result["check_time"] = result["check_time"].isoformat()
+        self._buffer.append({"lease_id": service.lease_id, "service_id": service.id, "result": result})
+        if len(self._buffer) >= self.batch_size:
+            self._flush_event.set()
+
+    async def _lease(self) -> int:
+        """领取一批任务并提交到本地探测调度器，返回领取数量"""
+        free = self.max_in_flight - self.monitor.dispatcher.in_flight
+        if free <= 0:
+            return 0
+
+        response = await self.api.post("/api/agent/lease", json={
+            "agent_id": self.agent_id,
+            "max_items": free,
+            "location": self.location
+        })
+        response.raise_for_status()
+        lease = response.json()
+
+        for service_data in lease["services"]:
+            service = ServiceModel(**service_data)
+            service.lease_id = lease["lease_id"]
+            self.monitor.dispatcher.submit(service)
+        return len(lease["services"])
+
+    async def _flush(self) -> bool:
+        """回传一批结果，失败时放回缓冲区等待下次重试"""
+        batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+        body = gzip.compress(json.dumps({"agent_id": self.agent_id, "results": batch}).encode("utf-8"))
+        try:
+            response = await self.api.post(
+                "/api/agent/results",
+                content=body,
+                headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+            )
+            response.raise_for_status()
+            summary = response.json()
+            logger.info(f"回传探测结果 {len(batch)} 条，接受 {summary['accepted']}，忽略 {summary['ignored']}")
+            return True
+        except Exception as e:
+            logger.error(f"回传探测结果失败，稍后重试: {str(e)}")
+            # 超过租约时间的结果服务端会忽略，缓冲区最多保留10批
+            self._buffer = (batch + self._buffer)[:self.batch_size * 10]
+            return False
+
+    async def _flush_loop(self):
+        """定期或攒够一批时回传结果，探测全部结束后回传剩余结果并退出"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            while self._buffer and await self._flush():
+                pass
+            if self._drained:
+                break
+
+    async def run(self):
+        """主循环：领取任务、探测、回传"""
+        logger.info(f"探测节点 {self.agent_id} 启动，服务端: {self.api.base_url}")
+        flusher = asyncio.create_task(self._flush_loop())
+
+        while not self._stopping.is_set():
+            try:
+                leased = await self._lease()
+            except Exception as e:
+                logger.error(f"领取探测任务失败: {str(e)}")
+                leased = 0
+            delay = 0.5 if leased else self.poll_interval
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+        # 等待执行中的探测完成并回传剩余结果
+        await self.monitor.dispatcher.close(timeout=30.0)
+        self._drained = True
+        self._flush_event.set()
+        await flusher
+        await self.monitor.close()
+        await self.api.aclose()
+        logger.info(f"探测节点 {self.agent_id} 已退出")
+
+    def stop(self):
+        self._stopping.set()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="业务监控平台远程探测节点")
+    parser.add_argument("--server", default=os.getenv("AGENT_SERVER", "http://127.0.0.1:8001"), help="监控平台API地址")
+    parser.add_argument("--token", default=os.getenv("AGENT_TOKEN", ""), help="探测节点访问令牌")
+    parser.add_argument("--agent-id", default=os.getenv("AGENT_ID", socket.gethostname()), help="探测节点ID")
+    parser.add_argument("--location", default=os.getenv("AGENT_LOCATION"), help="探测节点所在位置")
+    parser.add_argument("--concurrency", type=int, default=settings.PROBE_MAX_CONCURRENCY, help="并发探测上限")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批回传的结果数")
+    parser.add_argument("--flush-interval", type=float, default=2.0, help="结果回传间隔（秒）")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="无任务时的领取间隔（秒）")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    agent = ProbeAgent(
+        server=args.server,
+        agent_id=args.agent_id,
+        token=args.token,
+        location=args.location,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+        poll_interval=args.poll_interval
+    )
+
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, agent.stop)
+        except NotImplementedError:  # Windows
+            pass
+
+    await agent.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+远程探测节点API
+"""
+import gzip
+import json
+import logging
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Body, Header, HTTPException, Request, Depends
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.schemas.agent import AgentResultItem, AgentResultPush
+from app.services.agent_lease import agent_lease_manager
+from app.services.monitor import monitor_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+async def verify_agent_token(x_agent_token: Optional[str] = Header(None)):
+    """校验探测节点令牌，未配置AGENT_TOKEN时拒绝所有探测节点请求"""
+    if not settings.AGENT_TOKEN:
+        raise HTTPException(status_code=503, detail="未配置AGENT_TOKEN，探测节点接口不可用")
+    if not x_agent_token or not secrets.compare_digest(x_agent_token, settings.AGENT_TOKEN):
+        raise HTTPException(status_code=401, detail="探测节点令牌无效")
+
+
+@router.post("/lease", dependencies=[Depends(verify_agent_token)])
+async def lease_services(
+    agent_id: str = Body(..., min_length=1, max_length=100, description="探测节点ID"),
+    max_items: int = Body(100, ge=1, description="最多领取的任务数"),
+    location: Optional[str] = Body(None, description="探测节点所在位置")
+):
+    """探测节点领取一批待执行的探测任务"""
+    return agent_lease_manager.lease(agent_id, max_items, location)
+
+
+@router.post("/results", dependencies=[Depends(verify_agent_token)])
+async def push_results(request: Request):
+    """
+    探测节点批量回传探测结果
+
+    请求体为JSON（支持 Content-Encoding: gzip）:
+    {"agent_id": "...", "results": [{"lease_id": "...", "service_id": 1, "result": {...}}]}
+    """
+    raw = await request.body()
+    try:
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            raw = gzip.decompress(raw)
+        payload = AgentResultPush.model_validate(json.loads(raw))
+    except (OSError, ValueError) as e:
+        # ValidationError 是 ValueError 的子类
+        raise HTTPException(status_code=400, detail=f"结果数据格式错误: {str(e)}")
+
+    agent_id = payload.agent_id
+    accepted = 0
+    ignored = 0
+    for raw_item in payload.results:
+        try:
+            item = AgentResultItem.model_validate(raw_item)
+        except ValidationError:
+            ignored += 1
+            continue
+        completed = agent_lease_manager.complete(agent_id, item.lease_id, item.service_id, item.result)
+        if completed is None:
+            ignored += 1
+            continue
+
+        service, result = completed
+        try:
+            await monitor_service.process_result(service, result)
+            accepted += 1
+        except Exception as e:
+            logger.error(f"处理探测节点结果失败: agent={agent_id}, service_id={service.id}, 错误: {str(e)}")
+
+    return {"accepted": accepted, "ignored": ignored}
+
+
+@router.get("/status")
+async def get_agent_status():
+    """获取探测节点和任务租约状态"""
+    return agent_lease_manager.get_stats()
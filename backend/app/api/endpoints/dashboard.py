@@ -5,12 +5,12 @@ from typing import Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
 
 from app.core.database import get_db
 from app.models.service import MonitorService
 from app.models.monitor_log import MonitorLog
 from app.models.alert_config import AlertConfig
+from app.services.rollup import rollup_service, bucket_labels, merge_buckets, HISTOGRAM_BOUNDS, DASHBOARD_BOUNDS
 
 router = APIRouter()
 
@@ -30,25 +30,14 @@ async def get_dashboard_overview(db: Session = Depends(get_db)):
     total_alert_configs = db.query(AlertConfig).count()
     active_alert_configs = db.query(AlertConfig).filter(AlertConfig.is_active == True).count()
     
-    # 今天的监控统计
+    # 今天的告警次数（读取统计汇总）
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_checks = db.query(MonitorLog).filter(MonitorLog.check_time >= today_start).count()
-    today_success = db.query(MonitorLog).filter(
-        MonitorLog.check_time >= today_start,
-        MonitorLog.status == "success"
-    ).count()
-    today_alerts = db.query(MonitorLog).filter(
-        MonitorLog.check_time >= today_start,
-        MonitorLog.alert_sent == True
-    ).count()
+    today_alerts = rollup_service.summary(db, today_start)[0]["alert_count"]
     
-    # 最近24小时监控统计（保留用于其他统计）
-    last_24h = datetime.now() - timedelta(hours=24)
-    recent_checks = db.query(MonitorLog).filter(MonitorLog.check_time >= last_24h).count()
-    recent_success = db.query(MonitorLog).filter(
-        MonitorLog.check_time >= last_24h,
-        MonitorLog.status == "success"
-    ).count()
+    # 最近24小时监控统计
+    recent = rollup_service.summary(db, datetime.now() - timedelta(hours=24))[0]
+    recent_checks = recent["total_count"]
+    recent_success = recent["success_count"]
     
     # 计算成功率
     success_rate = round(recent_success / recent_checks * 100, 2) if recent_checks > 0 else 0
@@ -83,13 +72,9 @@ async def get_services_status(db: Session = Depends(get_db)):
     """获取所有服务的当前状态"""
     services = db.query(MonitorService).filter(MonitorService.is_active == True).all()
     
+    # 最近一次检查的结果随状态一起写在服务表上，一次查询即可
     services_status = []
     for service in services:
-        # 获取最近的监控日志
-        latest_log = db.query(MonitorLog).filter(
-            MonitorLog.service_id == service.id
-        ).order_by(MonitorLog.check_time.desc()).first()
-        
         services_status.append({
             "id": service.id,
             "name": service.name,
@@ -97,9 +82,9 @@ async def get_services_status(db: Session = Depends(get_db)):
             "status": service.status,
             "last_check_time": service.last_check_time.isoformat() if service.last_check_time else None,
             "last_success_time": service.last_success_time.isoformat() if service.last_success_time else None,
-            "response_time": latest_log.response_time if latest_log else None,
-            "status_code": latest_log.status_code if latest_log else None,
-            "error_message": latest_log.error_message if latest_log and latest_log.error_message else None
+            "response_time": service.last_response_time,
+            "status_code": service.last_status_code,
+            "error_message": service.last_error_message or None
         })
     
     return {"services": services_status}
@@ -145,27 +130,19 @@ async def get_hourly_stats(
     hours: int = Query(24, ge=1, le=720, description="统计小时数"),
     db: Session = Depends(get_db)
 ):
-    """获取按小时统计的监控数据"""
+    """获取按小时统计的监控数据（按整点分组，最后一组为当前小时）"""
     # 计算开始时间
-    start_time = datetime.now() - timedelta(hours=hours)
+    start_time = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    
+    # 一次读取各小时的汇总
+    series = rollup_service.series(db, "hour", start_time)
     
-    # 按小时分组统计
     hourly_stats = []
     for i in range(hours):
         hour_start = start_time + timedelta(hours=i)
-        hour_end = hour_start + timedelta(hours=1)
-        
-        # 统计该小时内的监控记录
-        total_checks = db.query(MonitorLog).filter(
-            MonitorLog.check_time >= hour_start,
-            MonitorLog.check_time < hour_end
-        ).count()
-        
-        success_checks = db.query(MonitorLog).filter(
-            MonitorLog.check_time >= hour_start,
-            MonitorLog.check_time < hour_end,
-            MonitorLog.status == "success"
-        ).count()
+        stats = series.get(hour_start)
+        total_checks = stats["total_count"] if stats else 0
+        success_checks = stats["success_count"] if stats else 0
         
         # 计算成功率
         success_rate = round(success_checks / total_checks * 100, 2) if total_checks > 0 else 0
@@ -184,54 +161,39 @@ async def get_hourly_stats(
 @router.get("/response-time-stats")
 async def get_response_time_stats(
     days: int = Query(7, ge=1, le=30, description="统计天数"),
+    service_id: Optional[int] = Query(None, description="服务ID筛选"),
     db: Session = Depends(get_db)
 ):
-    """获取响应时间分布统计"""
+    """
+    获取响应时间分布统计
+
+    合并写入时维护的区间计数，开销只与区间数和时间段数有关，与检查次数无关。
+    distribution 为仪表板的5个区间，histogram 为配置的对数刻度细分区间。
+    """
     # 计算开始时间
     start_time = datetime.now() - timedelta(days=days)
     
-    # 获取指定时间范围内的响应时间数据
-    response_times = db.query(MonitorLog.response_time).filter(
-        MonitorLog.check_time >= start_time,
-        MonitorLog.response_time.isnot(None),
-        MonitorLog.status == "success"
-    ).all()
-    
-    # 统计响应时间分布
-    distribution = {
-        "0-100ms": 0,
-        "100-300ms": 0,
-        "300-500ms": 0,
-        "500-1000ms": 0,
-        "1000ms+": 0
-    }
-    
-    for (response_time,) in response_times:
-        if response_time < 100:
-            distribution["0-100ms"] += 1
-        elif response_time < 300:
-            distribution["100-300ms"] += 1
-        elif response_time < 500:
-            distribution["300-500ms"] += 1
-        elif response_time < 1000:
-            distribution["500-1000ms"] += 1
-        else:
-            distribution["1000ms+"] += 1
+    # 成功检查的响应时间分布和平均值（读取统计汇总）
+    counts = rollup_service.histogram(db, start_time, service_id=service_id)
+    summary = rollup_service.summary(db, start_time, service_id=service_id)[0]
     
     # 转换为前端需要的格式
     distribution_list = [
         {"range": range_name, "count": count}
-        for range_name, count in distribution.items()
+        for range_name, count in zip(bucket_labels(DASHBOARD_BOUNDS), merge_buckets(counts, DASHBOARD_BOUNDS))
+    ]
+    histogram = [
+        {"range": range_name, "count": count}
+        for range_name, count in zip(bucket_labels(HISTOGRAM_BOUNDS), merge_buckets(counts, HISTOGRAM_BOUNDS))
     ]
     
-    # 计算平均响应时间
-    total_response_time = sum(rt[0] for rt in response_times)
-    avg_response_time = round(total_response_time / len(response_times), 2) if response_times else 0
+    avg_response_time = summary["avg_success_response_time"]
     
     return {
         "distribution": distribution_list,
-        "avg_response_time": avg_response_time,
-        "total_samples": len(response_times)
+        "histogram": histogram,
+        "avg_response_time": round(avg_response_time, 2) if avg_response_time else 0,
+        "total_samples": summary["success_response_time_count"]
     }
 
 
@@ -348,39 +310,23 @@ async def get_availability_stats(
     # 获取所有活跃服务
     services = db.query(MonitorService).filter(MonitorService.is_active == True).all()
     
+    # 一次读取各服务的汇总
+    summaries = {row["service_id"]: row for row in rollup_service.summary(db, start_time, by_service=True)}
+    
     availability_stats = []
     
     for service in services:
-        # 统计该服务在指定时间范围内的监控记录
-        total_checks = db.query(MonitorLog).filter(
-            MonitorLog.service_id == service.id,
-            MonitorLog.check_time >= start_time
-        ).count()
-        
-        success_checks = db.query(MonitorLog).filter(
-            MonitorLog.service_id == service.id,
-            MonitorLog.check_time >= start_time,
-            MonitorLog.status == "success"
-        ).count()
+        stats = summaries.get(service.id)
+        total_checks = stats["total_count"] if stats else 0
+        success_checks = stats["success_count"] if stats else 0
         
         # 计算可用性百分比
         availability = round(success_checks / total_checks * 100, 2) if total_checks > 0 else 0
         
-        # 计算平均响应时间
-        avg_response_time = db.query(func.avg(MonitorLog.response_time)).filter(
-            MonitorLog.service_id == service.id,
-            MonitorLog.check_time >= start_time,
-            MonitorLog.response_time.isnot(None),
-            MonitorLog.status == "success"
-        ).scalar()
-        
+        # 成功检查的平均响应时间
+        avg_response_time = stats["avg_success_response_time"] if stats else None
         avg_response_time = round(avg_response_time, 2) if avg_response_time else 0
         
-        # 获取最近一次检查时间
-        latest_log = db.query(MonitorLog).filter(
-            MonitorLog.service_id == service.id
-        ).order_by(MonitorLog.check_time.desc()).first()
-        
         availability_stats.append({
             "service_id": service.id,
             "service_name": service.name,
@@ -390,7 +336,7 @@ async def get_availability_stats(
             "success_checks": success_checks,
             "failed_checks": total_checks - success_checks,
             "avg_response_time": avg_response_time,
-            "last_check_time": latest_log.check_time.isoformat() if latest_log else None,
+            "last_check_time": service.last_check_time.isoformat() if service.last_check_time else None,
             "current_status": service.status
         })
     
@@ -1,14 +1,16 @@
 """
 数据库维护管理API
 """
+import asyncio
 from typing import Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.services.data_cleanup import data_cleanup_service
 from app.services.maintenance_scheduler import maintenance_scheduler
+from app.services.rollup import rollup_service
 
 router = APIRouter()
 
@@ -39,7 +41,7 @@ async def manual_cleanup(
 ):
     """手动执行数据清理"""
     try:
-        result = data_cleanup_service.cleanup_old_logs(
+        result = await data_cleanup_service.cleanup_old_logs_async(
             retention_days=retention_days,
             dry_run=dry_run,
             service_id=service_id
@@ -64,9 +66,10 @@ async def create_partition(
     target_year: int = Body(..., ge=2024, le=2030, description="目标年份"),
     target_month: int = Body(..., ge=1, le=12, description="目标月份")
 ):
-    """手动创建分区"""
+    """手动创建分区：补齐到目标月份月底为止的按天分区"""
     try:
-        target_date = datetime(target_year, target_month, 1)
+        next_month = datetime(target_year, target_month, 28) + timedelta(days=4)
+        target_date = next_month.replace(day=1) - timedelta(days=1)
         result = data_cleanup_service.create_partition_if_needed(target_date)
         return result
     except Exception as e:
@@ -111,6 +114,24 @@ async def list_partitions(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"获取分区信息失败: {str(e)}")
 
 
+@router.post("/partitions/migrate")
+async def migrate_partitions(
+    dry_run: bool = Body(True, embed=True, description="是否为试运行")
+):
+    """把已有的未分区 monitor_logs 迁移为按天分区表（重建整张表，应在低峰期执行）"""
+    try:
+        # 分区起点与定时清理的保留天数一致
+        result = await asyncio.get_event_loop().run_in_executor(
+            None, data_cleanup_service.migrate_to_partitions, dry_run,
+            maintenance_scheduler.maintenance_config["cleanup_retention_days"]
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"分区迁移失败: {str(e)}")
+
+
 @router.get("/indexes")
 async def list_indexes(db: Session = Depends(get_db)):
     """列出所有索引信息"""
@@ -186,6 +207,27 @@ async def update_scheduler_config(config: Dict[str, Any] = Body(...)):
         raise HTTPException(status_code=500, detail=f"更新配置失败: {str(e)}")
 
 
+@router.post("/rollups/backfill")
+async def backfill_rollups(
+    days: int = Body(7, ge=1, le=730, embed=True, description="重建最近几个完整日期的统计汇总")
+):
+    """从原始日志重建统计汇总（补齐历史数据），不含今天"""
+    try:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        result = await asyncio.get_event_loop().run_in_executor(
+            None, rollup_service.rebuild, today - timedelta(days=days), today
+        )
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"重建统计汇总失败: {str(e)}")
+
+
+@router.get("/rollups")
+async def get_rollup_stats():
+    """获取统计汇总写入和重建状态"""
+    return rollup_service.get_stats()
+
+
 @router.post("/scheduler/jobs/{job_id}/run")
 async def run_job_now(job_id: str):
     """立即执行指定任务"""
@@ -266,6 +308,11 @@ async def analyze_performance(
         
         slow_queries = db.execute(text(slow_queries_sql), {"days": days}).fetchall()
         
+        # 成功检查响应时间的分位数（合并预先构建的草图）
+        percentiles = rollup_service.percentiles(
+            db, [0.5, 0.95, 0.99], datetime.now() - timedelta(days=days)
+        )["quantiles"]
+        
         # 获取表大小趋势
         table_stats = data_cleanup_service.get_table_stats()
         
@@ -276,7 +323,10 @@ async def analyze_performance(
                 "avg_response_time": round(float(result.avg_response_time), 2) if result.avg_response_time else 0,
                 "min_response_time": round(float(result.min_response_time), 2) if result.min_response_time else 0,
                 "max_response_time": round(float(result.max_response_time), 2) if result.max_response_time else 0,
-                "stddev_response_time": round(float(result.stddev_response_time), 2) if result.stddev_response_time else 0
+                "stddev_response_time": round(float(result.stddev_response_time), 2) if result.stddev_response_time else 0,
+                "p50_response_time": round(percentiles[0.5], 2) if percentiles[0.5] is not None else None,
+                "p95_response_time": round(percentiles[0.95], 2) if percentiles[0.95] is not None else None,
+                "p99_response_time": round(percentiles[0.99], 2) if percentiles[0.99] is not None else None
             },
             "status_distribution": {
                 "success_count": result.success_count or 0,
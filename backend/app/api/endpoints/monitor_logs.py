@@ -1,7 +1,7 @@
 """
 监控日志管理API - 性能优化版本
 """
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
@@ -10,6 +10,8 @@ from sqlalchemy import desc, func, text
 from app.core.database import get_db
 from app.models.monitor_log import MonitorLog
 from app.models.service import MonitorService
+from app.services.rollup import rollup_service, TIMING_FIELDS
+from app.services.data_cleanup import data_cleanup_service
 
 router = APIRouter()
 
@@ -147,11 +149,20 @@ async def get_monitor_log(log_id: int, db: Session = Depends(get_db)):
         "response_time": log.response_time,
         "status_code": log.status_code,
         "response_size": log.response_size,
+        "response_truncated": log.response_truncated,
+        "timing": {
+            "dns_time": log.dns_time,
+            "connect_time": log.connect_time,
+            "tls_time": log.tls_time,
+            "ttfb_time": log.ttfb_time,
+            "download_time": log.download_time
+        },
         "error_message": log.error_message,
         "error_type": log.error_type,
         "request_url": log.request_url,
         "request_method": log.request_method,
         "request_headers": log.request_headers,
+        "probe_node": log.probe_node,
         "response_headers": log.response_headers,
         "response_body": log.response_body,
         "check_time": log.check_time.isoformat() if log.check_time else None,
@@ -245,43 +256,17 @@ async def get_monitor_stats(
     days: int = Query(7, ge=1, le=365, description="统计天数"),
     db: Session = Depends(get_db)
 ):
-    """获取监控统计信息 - 优化版本"""
-    # 使用单个优化的SQL查询获取所有统计数据
-    sql = """
-    SELECT 
-        -- 总体统计
-        COUNT(*) as total_checks,
-        SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-        AVG(CASE WHEN response_time IS NOT NULL THEN response_time END) as avg_response_time,
-        
-        -- 24小时统计
-        SUM(CASE WHEN check_time >= :last_24h_start THEN 1 ELSE 0 END) as last_24h_checks,
-        SUM(CASE WHEN check_time >= :last_24h_start AND status = 'success' THEN 1 ELSE 0 END) as last_24h_success
-    FROM monitor_logs 
-    WHERE check_time >= :start_time
-    """
+    """获取监控统计信息（读取统计汇总）"""
+    summary = rollup_service.summary(db, datetime.now() - timedelta(days=days), service_id=service_id)[0]
+    last_24h = rollup_service.summary(db, datetime.now() - timedelta(hours=24), service_id=service_id)[0]
     
-    start_time = datetime.now() - timedelta(days=days)
-    last_24h_start = datetime.now() - timedelta(hours=24)
-    
-    params = {
-        "start_time": start_time,
-        "last_24h_start": last_24h_start
-    }
-    
-    if service_id:
-        sql += " AND service_id = :service_id"
-        params["service_id"] = service_id
-    
-    result = db.execute(text(sql), params).fetchone()
-    
-    total_checks = result.total_checks or 0
-    success_count = result.success_count or 0
+    total_checks = summary["total_count"]
+    success_count = summary["success_count"]
     failed_count = total_checks - success_count
     success_rate = round(success_count / total_checks * 100, 2) if total_checks > 0 else 0
     
-    last_24h_checks = result.last_24h_checks or 0
-    last_24h_success = result.last_24h_success or 0
+    last_24h_checks = last_24h["total_count"]
+    last_24h_success = last_24h["success_count"]
     last_24h_success_rate = round(last_24h_success / last_24h_checks * 100, 2) if last_24h_checks > 0 else 0
     
     return {
@@ -289,7 +274,7 @@ async def get_monitor_stats(
         "success_count": success_count,
         "failed_count": failed_count,
         "success_rate": success_rate,
-        "avg_response_time": round(float(result.avg_response_time), 2) if result.avg_response_time else None,
+        "avg_response_time": round(summary["avg_response_time"], 2) if summary["avg_response_time"] else None,
         "last_24h_checks": last_24h_checks,
         "last_24h_success_rate": last_24h_success_rate
     }
@@ -301,43 +286,23 @@ async def get_timeline_stats(
     days: int = Query(7, ge=1, le=30, description="统计天数"),
     db: Session = Depends(get_db)
 ):
-    """获取时间线统计数据 - 优化版本"""
-    
-    # 优化的SQL查询，利用索引
-    sql = """
-    SELECT 
-        DATE(check_time) as date,
-        COUNT(*) as total_checks,
-        SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-        AVG(CASE WHEN response_time IS NOT NULL THEN response_time END) as avg_response_time,
-        MIN(response_time) as min_response_time,
-        MAX(response_time) as max_response_time
-    FROM monitor_logs 
-    WHERE check_time >= :start_time
-    """
-    
-    params = {"start_time": datetime.now() - timedelta(days=days)}
-    
-    if service_id:
-        sql += " AND service_id = :service_id"
-        params["service_id"] = service_id
-    
-    sql += " GROUP BY DATE(check_time) ORDER BY date"
-    
-    result = db.execute(text(sql), params).fetchall()
+    """获取时间线统计数据（读取按天汇总，首日为整天）"""
+    series = rollup_service.series(db, "day", datetime.now() - timedelta(days=days), service_id=service_id)
     
     timeline_data = []
-    for row in result:
-        success_rate = round(row.success_count / row.total_checks * 100, 2) if row.total_checks > 0 else 0
+    for day in sorted(series):
+        row = series[day]
+        total_checks = row["total_count"]
+        success_rate = round(row["success_count"] / total_checks * 100, 2) if total_checks > 0 else 0
         timeline_data.append({
-            "date": row.date.isoformat(),
-            "total_checks": row.total_checks,
-            "success_count": row.success_count,
-            "failed_count": row.total_checks - row.success_count,
+            "date": day.date().isoformat(),
+            "total_checks": total_checks,
+            "success_count": row["success_count"],
+            "failed_count": total_checks - row["success_count"],
             "success_rate": success_rate,
-            "avg_response_time": round(row.avg_response_time, 2) if row.avg_response_time else None,
-            "min_response_time": round(row.min_response_time, 2) if row.min_response_time else None,
-            "max_response_time": round(row.max_response_time, 2) if row.max_response_time else None
+            "avg_response_time": round(row["avg_response_time"], 2) if row["avg_response_time"] else None,
+            "min_response_time": round(row["response_time_min"], 2) if row["response_time_min"] else None,
+            "max_response_time": round(row["response_time_max"], 2) if row["response_time_max"] else None
         })
     
     return {"timeline": timeline_data}
@@ -349,102 +314,112 @@ async def get_performance_stats(
     days: int = Query(7, ge=1, le=30, description="统计天数"),
     db: Session = Depends(get_db)
 ):
-    """获取性能统计数据 - 新增接口"""
-    
-    sql = """
-    SELECT 
-        service_id,
-        s.name as service_name,
-        COUNT(*) as total_checks,
-        SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-        AVG(CASE WHEN response_time IS NOT NULL THEN response_time END) as avg_response_time,
-        MIN(CASE WHEN response_time IS NOT NULL THEN response_time END) as min_response_time,
-        MAX(CASE WHEN response_time IS NOT NULL THEN response_time END) as max_response_time,
-        STDDEV(CASE WHEN response_time IS NOT NULL THEN response_time END) as stddev_response_time
-    FROM monitor_logs ml
-    JOIN monitor_services s ON ml.service_id = s.id
-    WHERE ml.check_time >= :start_time
-    """
-    
-    params = {"start_time": datetime.now() - timedelta(days=days)}
-    
-    if service_id:
-        sql += " AND ml.service_id = :service_id"
-        params["service_id"] = service_id
-    
-    sql += " GROUP BY service_id, s.name ORDER BY avg_response_time DESC"
-    
-    result = db.execute(text(sql), params).fetchall()
+    """获取性能统计数据（读取统计汇总，标准差由平方和计算）"""
+    summaries = rollup_service.summary(
+        db, datetime.now() - timedelta(days=days), service_id=service_id, by_service=True
+    )
+    names = dict(
+        db.query(MonitorService.id, MonitorService.name)
+        .filter(MonitorService.id.in_([row["service_id"] for row in summaries]))
+        .all()
+    ) if summaries else {}
+    
+    def rounded(value):
+        return round(value, 2) if value is not None else None
     
     performance_data = []
-    for row in result:
-        success_rate = round(row.success_count / row.total_checks * 100, 2) if row.total_checks > 0 else 0
+    for row in summaries:
+        if row["service_id"] not in names:
+            continue
+        total_checks = row["total_count"]
+        success_rate = round(row["success_count"] / total_checks * 100, 2) if total_checks > 0 else 0
         performance_data.append({
-            "service_id": row.service_id,
-            "service_name": row.service_name,
-            "total_checks": row.total_checks,
-            "success_count": row.success_count,
+            "service_id": row["service_id"],
+            "service_name": names[row["service_id"]],
+            "total_checks": total_checks,
+            "success_count": row["success_count"],
             "success_rate": success_rate,
-            "avg_response_time": round(row.avg_response_time, 2) if row.avg_response_time else None,
-            "min_response_time": round(row.min_response_time, 2) if row.min_response_time else None,
-            "max_response_time": round(row.max_response_time, 2) if row.max_response_time else None,
-            "stddev_response_time": round(row.stddev_response_time, 2) if row.stddev_response_time else None
+            "avg_response_time": round(row["avg_response_time"], 2) if row["avg_response_time"] else None,
+            "min_response_time": round(row["response_time_min"], 2) if row["response_time_min"] else None,
+            "max_response_time": round(row["response_time_max"], 2) if row["response_time_max"] else None,
+            "stddev_response_time": round(row["stddev_response_time"], 2) if row["stddev_response_time"] else None,
+            "avg_timing": {
+                field: rounded(row[f"avg_{field}"]) for field in TIMING_FIELDS
+            }
         })
     
+    # 按平均响应时间从高到低排序
+    performance_data.sort(key=lambda item: item["avg_response_time"] or 0, reverse=True)
+    
     return {"performance": performance_data}
 
 
+@router.get("/stats/percentiles")
+async def get_percentile_stats(
+    service_ids: Optional[List[int]] = Query(None, description="服务ID，可重复传多个，为空时统计全部服务"),
+    quantiles: List[float] = Query([0.5, 0.95, 0.99], description="分位数（0~1），可重复传多个"),
+    days: int = Query(1, ge=1, le=730, description="统计天数（未指定开始时间时）"),
+    start_time: Optional[datetime] = Query(None, description="开始时间"),
+    end_time: Optional[datetime] = Query(None, description="结束时间"),
+    by_service: bool = Query(False, description="是否同时返回各服务的分位数"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取成功检查响应时间的分位数
+
+    合并按服务、小时/天预先构建的DDSketch草图，相对误差不超过 ROLLUP_SKETCH_ACCURACY，
+    时间范围两端对齐到整点。
+    """
+    if any(q < 0 or q > 1 for q in quantiles):
+        raise HTTPException(status_code=400, detail="分位数必须在0到1之间")
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time - timedelta(days=days)
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="开始时间必须早于结束时间")
+    
+    result = rollup_service.percentiles(db, quantiles, start_time, end_time, service_ids=service_ids,
+                                        by_service=by_service)
+    
+    def named(values):
+        return {f"p{q * 100:g}": round(value, 2) if value is not None else None for q, value in values.items()}
+    
+    response = {
+        "start_time": start_time.isoformat(),
+        "end_time": end_time.isoformat(),
+        "count": result["count"],
+        "percentiles": named(result["quantiles"])
+    }
+    if by_service:
+        response["services"] = [
+            {"service_id": service_id, "count": item["count"], "percentiles": named(item["quantiles"])}
+            for service_id, item in sorted(result["services"].items())
+        ]
+    return response
+
+
 @router.post("/cleanup")
 async def cleanup_old_logs(
     days_to_keep: int = Query(90, ge=7, le=365, description="保留天数"),
-    dry_run: bool = Query(True, description="是否为试运行"),
-    db: Session = Depends(get_db)
+    dry_run: bool = Query(True, description="是否为试运行")
 ):
-    """清理旧日志数据"""
-    cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-    
-    # 获取要删除的记录数
-    count_sql = "SELECT COUNT(*) FROM monitor_logs WHERE check_time < :cutoff_date"
-    count_to_delete = db.execute(text(count_sql), {"cutoff_date": cutoff_date}).scalar()
+    """清理旧日志数据：统计、删除分区和分批删除都在线程池中执行，不阻塞事件循环"""
+    result = await data_cleanup_service.cleanup_old_logs_async(retention_days=days_to_keep, dry_run=dry_run)
+    cutoff_date = datetime.fromisoformat(result["cutoff_date"])
     
     if dry_run:
         return {
-            "message": f"试运行模式：将删除 {count_to_delete} 条记录（{cutoff_date.strftime('%Y-%m-%d')} 之前的数据）",
-            "count_to_delete": count_to_delete,
-            "cutoff_date": cutoff_date.isoformat()
+            "message": f"试运行模式：将删除 {result['total_count']} 条记录（{cutoff_date.strftime('%Y-%m-%d')} 之前的数据）",
+            "count_to_delete": result["total_count"],
+            "cutoff_date": result["cutoff_date"]
         }
     
-    if count_to_delete == 0:
+    if result["total_count"] == 0:
         return {"message": "没有需要清理的数据"}
     
-    # 分批删除
-    batch_size = 1000
-    deleted_count = 0
-    
-    while True:
-        delete_sql = """
-        DELETE FROM monitor_logs 
-        WHERE check_time < :cutoff_date
-        LIMIT :batch_size
-        """
-        
-        result = db.execute(text(delete_sql), {
-            "cutoff_date": cutoff_date,
-            "batch_size": batch_size
-        })
-        
-        batch_deleted = result.rowcount
-        if batch_deleted == 0:
-            break
-            
-        deleted_count += batch_deleted
-        db.commit()
-        
-        if batch_deleted < batch_size:
-            break
-    
     return {
-        "message": f"成功清理 {deleted_count} 条旧日志记录",
-        "deleted_count": deleted_count,
-        "cutoff_date": cutoff_date.isoformat()
+        "message": f"成功清理 {result['deleted_count']} 条旧日志记录",
+        "deleted_count": result["deleted_count"],
+        "dropped_partitions": result.get("dropped_partitions", []),
+        "dropped_rows_estimate": result.get("dropped_rows_estimate", 0),
+        "cutoff_date": result["cutoff_date"]
     }
\ No newline at end of file
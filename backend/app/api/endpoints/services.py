@@ -2,12 +2,15 @@
 服务监控管理API
 """
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, or_
 
 from app.core.database import get_db
 from app.models.service import MonitorService
+from app.services.scheduler import scheduler_service
+from app.services.data_cleanup import data_cleanup_service
+from app.services.monitor import PRIORITY_CLASSES
 
 router = APIRouter()
 
@@ -57,6 +60,9 @@ async def get_services(
             "timeout": service.timeout,
             "interval": service.interval,
             "retry_count": service.retry_count,
+            "max_response_size": service.max_response_size,
+            "http2": service.http2,
+            "priority": service.priority,
             "is_active": service.is_active,
             "status": service.status,
             "last_check_time": service.last_check_time.isoformat() if service.last_check_time else None,
@@ -84,32 +90,17 @@ async def get_service(service_id: int, db: Session = Depends(get_db)):
     if not service:
         raise HTTPException(status_code=404, detail="服务不存在")
     
-    # 导入MonitorLog模型来计算统计信息
-    from app.models.monitor_log import MonitorLog
-    from sqlalchemy import func
+    from app.services.rollup import rollup_service
     from datetime import datetime, timedelta
     
-    # 计算统计信息
-    logs_query = db.query(MonitorLog).filter(MonitorLog.service_id == service_id)
-    
-    # 获取最近的状态
-    latest_log = logs_query.order_by(desc(MonitorLog.check_time)).first()
-    last_status = latest_log.status if latest_log else None
-    
-    # 计算平均响应时间（最近30天）
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    avg_response_time = logs_query.filter(
-        MonitorLog.check_time >= thirty_days_ago,
-        MonitorLog.response_time.isnot(None)
-    ).with_entities(func.avg(MonitorLog.response_time)).scalar()
+    # 最近一次检查的状态（未检查过时为空）
+    last_status = service.status if service.last_check_time else None
     
-    # 计算可用率（最近30天）
-    total_checks = logs_query.filter(MonitorLog.check_time >= thirty_days_ago).count()
-    success_checks = logs_query.filter(
-        MonitorLog.check_time >= thirty_days_ago,
-        MonitorLog.status == "success"
-    ).count()
-    uptime_rate = success_checks / total_checks if total_checks > 0 else None
+    # 最近30天的平均响应时间和可用率（读取统计汇总）
+    summary = rollup_service.summary(db, datetime.now() - timedelta(days=30), service_id=service_id)[0]
+    avg_response_time = summary["avg_response_time"]
+    total_checks = summary["total_count"]
+    uptime_rate = summary["success_count"] / total_checks if total_checks > 0 else None
     
     return {
         "id": service.id,
@@ -119,11 +110,17 @@ async def get_service(service_id: int, db: Session = Depends(get_db)):
         "timeout": service.timeout,
         "interval": service.interval,
         "retry_count": service.retry_count,
+        "max_response_size": service.max_response_size,
+        "http2": service.http2,
+        "priority": service.priority,
         "is_active": service.is_active,
         "status": service.status,
         "last_status": last_status,
         "last_check_time": service.last_check_time.isoformat() if service.last_check_time else None,
         "last_success_time": service.last_success_time.isoformat() if service.last_success_time else None,
+        "last_response_time": service.last_response_time,
+        "last_status_code": service.last_status_code,
+        "last_error_message": service.last_error_message,
         "avg_response_time": round(avg_response_time, 2) if avg_response_time else None,
         "uptime_rate": round(uptime_rate, 4) if uptime_rate is not None else None,
         "enable_alert": service.enable_alert,
@@ -143,6 +140,8 @@ async def create_service(service_data: dict, db: Session = Depends(get_db)):
     existing = db.query(MonitorService).filter(MonitorService.url == service_data.get("url")).first()
     if existing:
         raise HTTPException(status_code=400, detail="该URL已存在监控服务")
+    if service_data.get("priority", "normal") not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail="探测优先级只能是 critical/normal/low")
     
     # 创建服务
     db_service = MonitorService(
@@ -152,6 +151,9 @@ async def create_service(service_data: dict, db: Session = Depends(get_db)):
         timeout=service_data.get("timeout", 30),
         interval=service_data.get("interval", 300),
         retry_count=service_data.get("retry_count", 3),
+        max_response_size=service_data.get("max_response_size"),
+        http2=service_data.get("http2", False),
+        priority=service_data.get("priority", "normal"),
         is_active=service_data.get("is_active", True),
         enable_alert=service_data.get("enable_alert", True),
         alert_methods=service_data.get("alert_methods", "email"),
@@ -163,6 +165,9 @@ async def create_service(service_data: dict, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(db_service)
     
+    # 通知调度器，新服务在下一个调度刻度即开始探测
+    scheduler_service.sync_service(db_service, probe_soon=True)
+    
     return {"message": "服务创建成功", "id": db_service.id}
 
 
@@ -173,6 +178,9 @@ async def update_service(service_id: int, service_data: dict, db: Session = Depe
     if not service:
         raise HTTPException(status_code=404, detail="服务不存在")
     
+    if "priority" in service_data and service_data["priority"] not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail="探测优先级只能是 critical/normal/low")
+    
     # 更新服务信息
     for field, value in service_data.items():
         if hasattr(service, field):
@@ -181,12 +189,15 @@ async def update_service(service_id: int, service_data: dict, db: Session = Depe
     db.commit()
     db.refresh(service)
     
+    # 通知调度器更新监控任务
+    scheduler_service.sync_service(service)
+    
     return {"message": "服务更新成功"}
 
 
 @router.delete("/{service_id}")
-async def delete_service(service_id: int, db: Session = Depends(get_db)):
-    """删除监控服务"""
+async def delete_service(service_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """删除监控服务，其日志和统计汇总在后台删除"""
     service = db.query(MonitorService).filter(MonitorService.id == service_id).first()
     if not service:
         raise HTTPException(status_code=404, detail="服务不存在")
@@ -195,6 +206,12 @@ async def delete_service(service_id: int, db: Session = Depends(get_db)):
     db.delete(service)
     db.commit()
     
+    # 通知调度器删除监控任务
+    scheduler_service.remove_monitor_job(service_id)
+    
+    # 日志没有外键级联，汇总按服务累加，需要单独删除，否则仍计入全局统计
+    background_tasks.add_task(data_cleanup_service.delete_service_data, service_id)
+    
     return {"message": "服务删除成功"}
 
 
@@ -209,6 +226,9 @@ async def toggle_service(service_id: int, db: Session = Depends(get_db)):
     service.is_active = not service.is_active
     db.commit()
     
+    # 通知调度器，重新启用的服务立即探测
+    scheduler_service.sync_service(service, probe_soon=True)
+    
     return {
         "message": f"服务已{'启用' if service.is_active else '禁用'}",
         "is_active": service.is_active
@@ -252,6 +272,9 @@ async def test_service(service_id: int, db: Session = Depends(get_db)):
         # 更新服务的最后检查时间和状态
         service.last_check_time = datetime.now()
         service.status = status
+        service.last_response_time = response_time
+        service.last_status_code = response.status_code
+        service.last_error_message = error_message
         if status == "success":
             service.last_success_time = datetime.now()
         
@@ -274,6 +297,9 @@ async def test_service(service_id: int, db: Session = Depends(get_db)):
         # 更新服务状态
         service.last_check_time = datetime.now()
         service.status = status
+        service.last_response_time = response_time
+        service.last_status_code = None
+        service.last_error_message = error_message
         db.commit()
         
         return {
@@ -292,6 +318,9 @@ async def test_service(service_id: int, db: Session = Depends(get_db)):
         # 更新服务状态
         service.last_check_time = datetime.now()
         service.status = status
+        service.last_response_time = None
+        service.last_status_code = None
+        service.last_error_message = error_message
         db.commit()
         
         return {
@@ -2,7 +2,7 @@
 API路由配置
 """
 from fastapi import APIRouter
-from .endpoints import services, monitor_logs, alert_configs, dashboard, settings, maintenance
+from .endpoints import services, monitor_logs, alert_configs, dashboard, settings, maintenance, agents
 
 # 创建主路由
 api_router = APIRouter()
@@ -42,4 +42,10 @@ api_router.include_router(
     maintenance.router,
     prefix="/maintenance",
     tags=["maintenance"]
-)
\ No newline at end of file
+)
+
+api_router.include_router(
+    agents.router,
+    prefix="/agent",
+    tags=["agents"]
+)
@@ -22,6 +22,7 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 20
     DB_POOL_TIMEOUT: int = 30
     DB_POOL_RECYCLE: int = 3600
+    DB_EXECUTOR_THREADS: int = 4  # 探测路径数据库读写专用线程数
     
     # 安全配置
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -44,6 +45,78 @@ class Settings(BaseSettings):
     DEFAULT_TIMEOUT: int = 30  # 默认超时时间（秒）
     DEFAULT_INTERVAL: int = 300  # 默认监控间隔（秒）
     MAX_RETRY_COUNT: int = 3  # 最大重试次数
+    LOOP_LAG_INTERVAL_MS: int = 100  # 事件循环延迟采样间隔（毫秒）
+    SCHEDULER_TICK_MS: int = 250  # 监控任务时间轮刻度（毫秒）
+    SCHEDULER_WHEEL_SLOTS: int = 4096  # 时间轮槽数，间隔超过一圈的任务多转几圈
+    SCHEDULER_SYNC_INTERVAL: int = 60  # 按updated_at兜底同步监控任务的间隔（秒）
+    SCHEDULER_SYNC_OVERLAP: int = 60  # 兜底同步向前多查的时间（秒），覆盖事务提交延迟
+    SCHEDULER_CATCHUP_POLICY: str = "spread"  # 重启/接管后错过探测的服务：skip 跳过，run_once 立即补探一次，spread 在补探窗口内分散补探一次
+    SCHEDULER_CATCHUP_WINDOW: int = 60  # spread 策略的补探窗口（秒）
+    ADAPTIVE_INTERVAL_ENABLED: bool = False  # 是否按服务状态自适应调整探测间隔
+    ADAPTIVE_FAILURE_FACTOR: float = 0.25  # 异常或抖动的服务按 间隔×该系数 加快探测（持续异常的重复告警仍按配置间隔发送）
+    ADAPTIVE_MIN_INTERVAL: int = 10  # 加快探测时的最小间隔（秒）
+    ADAPTIVE_STABLE_CHECKS: int = 10  # 每连续成功这么多次放慢一档（间隔翻倍）
+    ADAPTIVE_MAX_FACTOR: float = 4.0  # 长期稳定的服务最多放慢到 间隔×该系数
+    ADAPTIVE_MAX_INTERVAL: int = 3600  # 放慢后的最大间隔（秒）
+    ADAPTIVE_FLAP_WINDOW: int = 10  # 判断抖动时看最近多少次检查
+    ADAPTIVE_FLAP_CHANGES: int = 3  # 最近检查中状态切换达到该次数视为抖动
+    
+    # 多进程/多副本部署配置
+    WORKERS: int = 1  # uvicorn工作进程数，PROBE_EXECUTION=agent 时必须为1
+    LEADER_ELECTION_ENABLED: bool = True  # 是否通过数据库租约选主，只有主节点运行调度器
+    LEADER_LEASE_SECONDS: int = 30  # 租约时长（秒），主节点失联后最多这么久由其他节点接管
+    LEADER_RENEW_INTERVAL: int = 10  # 续约间隔（秒），需小于租约时长
+    NODE_ID: str = ""  # 节点标识前缀，为空时使用主机名；实际标识为 前缀:进程号:随机后缀，多个工作进程/副本不会重复
+    SCHEDULER_SHARDING_ENABLED: bool = False  # 是否由多个节点按一致性哈希分担探测任务（维护任务仍只在主节点运行）
+    CLUSTER_HEARTBEAT_INTERVAL: int = 10  # 节点心跳间隔（秒）
+    CLUSTER_NODE_TIMEOUT: int = 30  # 节点心跳超时（秒），超时后其负责的服务分给其他节点
+    CLUSTER_VIRTUAL_NODES: int = 100  # 一致性哈希环上每个节点的虚拟节点数
+
+    # 探测调度配置
+    PROBE_MAX_CONCURRENCY: int = 100  # 全局并发探测上限（同时作为HTTP连接池上限）
+    PROBE_PER_ORIGIN_CONCURRENCY: int = 6  # 同一源站(scheme://host:port)并发探测上限
+    PROBE_HTTP2_PER_ORIGIN_CONCURRENCY: int = 50  # HTTP/2模式下同一源站并发探测上限（复用连接的并发流数）
+    PROBE_QUEUE_SIZE: int = 20000  # 待执行探测队列最大长度
+    PROBE_OVERLAP_POLICY: str = "skip"  # 同一服务上次探测未结束时又到期：skip 跳过，queue_one 排队一次等上次结束，allow_n 最多同时N个
+    PROBE_MAX_IN_FLIGHT_PER_SERVICE: int = 2  # allow_n 策略下同一服务最多同时进行的探测数
+    PROBE_SHED_LOW_RATIO: float = 0.5  # 待执行探测超过队列容量的该比例时丢弃新的低优先级探测
+    PROBE_WORKER_PROCESSES: int = 0  # 探测工作进程数，0表示在API进程内探测
+    PROBE_MAX_RESPONSE_SIZE: int = 1048576  # 单次探测最多读取的响应体字节数（服务未单独配置时）
+    PROBE_RESPONSE_BODY_PREVIEW: int = 1000  # 保存到日志的响应体字节数
+
+    # 探测结果写缓冲配置
+    RESULT_SINK_ENABLED: bool = True  # 是否批量写入探测结果，关闭时每次探测单独写库
+    RESULT_SINK_FLUSH_INTERVAL_MS: int = 500  # 写库间隔（毫秒）
+    RESULT_SINK_BATCH_SIZE: int = 500  # 单次写库最多条数，攒够即写
+    RESULT_SINK_MAX_BUFFER: int = 10000  # 缓冲区最大条数，超出时探测结果处理等待写库（背压）
+    RESULT_SINK_MAX_RETRIES: int = 3  # 批量写库失败后的最大重试次数，仍失败才丢弃该批结果
+    RESULT_SINK_RETRY_BACKOFF_MS: int = 500  # 首次重试等待时间（毫秒），之后每次翻倍
+
+    # 统计汇总配置
+    ROLLUP_ENABLED: bool = True  # 写入日志时是否增量更新按分钟/小时/天的统计汇总（统计接口读取汇总，关闭后只能由每日重建任务补齐）
+    ROLLUP_MINUTE_RETENTION_DAYS: int = 2  # 分钟汇总保留天数
+    ROLLUP_HOUR_RETENTION_DAYS: int = 90  # 小时汇总保留天数
+    ROLLUP_DAY_RETENTION_DAYS: int = 730  # 天汇总保留天数
+    ROLLUP_HISTOGRAM_BOUNDS: str = "1,2,5,10,20,50,100,200,300,500,1000,2000,5000,10000,30000"  # 响应时间分布区间边界(毫秒，逗号分隔，建议按对数刻度)，必须包含仪表板的100/300/500/1000，否则启动失败
+    ROLLUP_SKETCH_ACCURACY: float = 0.01  # 响应时间分位数草图的相对误差，按服务每小时/每天各保存一个草图
+
+    # 监控日志分区配置（MySQL）
+    LOG_PARTITION_ENABLED: bool = True  # monitor_logs 是否按天分区，过期日志整分区删除
+    LOG_PARTITION_PRECREATE_DAYS: int = 7  # 提前创建未来几天的分区
+    
+    # 远程探测节点配置
+    PROBE_EXECUTION: str = "local"  # 探测执行方式: local(本机探测) / agent(由远程探测节点领取执行)
+    AGENT_TOKEN: str = ""  # 探测节点访问令牌，PROBE_EXECUTION=agent 时必须设置，为空时拒绝探测节点请求
+    AGENT_LEASE_TIMEOUT: int = 120  # 领取的探测任务未回传结果的超时时间（秒），超时后丢弃等待下次调度
+    AGENT_MAX_LEASE_SIZE: int = 500  # 单次最多领取的探测任务数
+
+    # 探测DNS缓存配置
+    DNS_CACHE_ENABLED: bool = True  # 是否启用探测DNS缓存
+    DNS_CACHE_MAX_SIZE: int = 10000  # 最大缓存域名数，超出按LRU淘汰
+    DNS_CACHE_MIN_TTL: int = 5  # DNS记录TTL下限（秒）
+    DNS_CACHE_MAX_TTL: int = 300  # DNS记录TTL上限（秒）
+    DNS_CACHE_DEFAULT_TTL: int = 60  # 无法获取TTL（使用系统解析器）时的缓存时间（秒）
+    DNS_CACHE_NEGATIVE_TTL: int = 30  # 解析失败结果的缓存时间（秒）
 
     # 邮件代理配置
     # 是否启用邮件代理
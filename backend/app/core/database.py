@@ -1,11 +1,15 @@
 """
 数据库配置和初始化 - 优化版本
 """
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import asyncio
+import functools
 import logging
 
 from .config import settings
@@ -59,6 +63,20 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+# 探测路径上的数据库读写（读取服务、写入结果）在专用线程中执行，
+# 同步驱动的慢查询不会阻塞事件循环，也不会拖慢正在进行的探测计时
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_EXECUTOR_THREADS,
+    thread_name_prefix="db-worker"
+)
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """在数据库专用线程中执行同步数据库操作"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+
 def get_db():
     """获取数据库会话"""
     db = SessionLocal()
@@ -111,8 +129,19 @@ async def init_db():
     print("初始化数据库...")
     
     try:
+        # 新建的汇总表需要回填已有日志，建表前记录哪些表不存在及当前日志ID上限
+        from app.services.rollup import rollup_service
+        backfill_tables, backfill_max_log_id = rollup_service.pending_backfill()
+        
         # 创建所有表
         Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
+        # 每个工作进程都会执行初始化，这里只记录回填任务，由主节点的维护任务执行
+        rollup_service.plan_backfill(backfill_tables, backfill_max_log_id)
+        
+        # MySQL下新建的日志表改为按天分区，已分区时补齐未来的分区
+        from app.services.data_cleanup import data_cleanup_service
+        data_cleanup_service.init_partitions()
         print("数据库表创建完成")
         
         # 测试数据库连接
@@ -131,6 +160,22 @@ async def init_db():
     print("数据库初始化完成")
 
 
+def _add_missing_columns():
+    """为已存在的表补充模型中新增的列（create_all不会修改已有表）"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+                print(f"已为表 {table.name} 添加列 {column.name}")
+
+
 def get_db_info():
     """获取数据库信息"""
     db_url = settings.DATABASE_URL
@@ -151,6 +196,5 @@ def get_pool_status():
         "size": pool.size(),
         "checked_in": pool.checkedin(),
         "checked_out": pool.checkedout(),
-        "overflow": pool.overflow(),
-        "invalid": pool.invalidated()
+        "overflow": pool.overflow()
     }
\ No newline at end of file
@@ -5,6 +5,9 @@ from .service import MonitorService
 from .monitor_log import MonitorLog
 from .alert_config import AlertConfig
 from .system_setting import SystemSetting, AlertChannelTemplate, EmailTemplate
+from .scheduler_lease import SchedulerLease
+from .scheduler_node import SchedulerNode
+from .rollup import MonitorRollup, MonitorRollupHistogram, MonitorRollupSketch, MonitorRollupBackfill
 
 __all__ = [
     "MonitorService",
@@ -12,5 +15,11 @@ __all__ = [
     "AlertConfig",
     "SystemSetting",
     "AlertChannelTemplate",
-    "EmailTemplate"
+    "EmailTemplate",
+    "SchedulerLease",
+    "SchedulerNode",
+    "MonitorRollup",
+    "MonitorRollupHistogram",
+    "MonitorRollupSketch",
+    "MonitorRollupBackfill"
 ]
\ No newline at end of file
@@ -1,24 +1,38 @@
 """
 监控日志模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, backref
 from app.core.database import Base
 
 
 class MonitorLog(Base):
-    """监控日志表"""
+    """
+    监控日志表
+
+    MySQL下按 TO_DAYS(check_time) 按天分区（见 DataCleanupService），过期数据整分区删除。
+    分区表不支持外键且唯一键必须包含分区列，因此 service_id 不建外键，
+    数据库中的主键为 (id, check_time)。
+    """
     __tablename__ = "monitor_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    service_id = Column(Integer, ForeignKey("monitor_services.id"), nullable=False, comment="服务ID")
+    service_id = Column(Integer, nullable=False, index=True, comment="服务ID")
     
     # 检查结果
     status = Column(String(20), nullable=False, comment="检查状态: success/failed/timeout")
     response_time = Column(Float, comment="响应时间(毫秒)")
     status_code = Column(Integer, comment="HTTP状态码")
     response_size = Column(Integer, comment="响应大小(字节)")
+    response_truncated = Column(Boolean, default=False, comment="响应体是否因超出读取上限而被截断")
+    
+    # 分阶段耗时(毫秒)，复用连接时连接和握手阶段为空
+    dns_time = Column(Float, comment="DNS解析耗时(毫秒)")
+    connect_time = Column(Float, comment="TCP连接耗时(毫秒)")
+    tls_time = Column(Float, comment="TLS握手耗时(毫秒)")
+    ttfb_time = Column(Float, comment="首字节时间(毫秒)，从发送请求到收到响应头")
+    download_time = Column(Float, comment="响应体下载耗时(毫秒)")
     
     # 错误信息
     error_message = Column(Text, comment="错误信息")
@@ -28,6 +42,7 @@ class MonitorLog(Base):
     request_url = Column(String(500), comment="请求URL")
     request_method = Column(String(10), comment="请求方法")
     request_headers = Column(Text, comment="请求头(JSON)")
+    probe_node = Column(String(100), comment="执行探测的远程节点ID，本机探测为空")
     
     # 响应详情
     response_headers = Column(Text, comment="响应头(JSON)")
@@ -38,11 +53,17 @@ class MonitorLog(Base):
     alert_methods = Column(String(100), comment="已发送的告警方式")
     
     # 时间戳
-    check_time = Column(DateTime, default=func.now(), comment="检查时间")
+    check_time = Column(DateTime, nullable=False, default=func.now(), comment="检查时间（分区列）")
     created_at = Column(DateTime, default=func.now(), comment="创建时间")
     
     # 关联关系
-    service = relationship("MonitorService", backref="logs")
+    # 没有外键，显式指定关联条件；删除服务时不加载也不修改其日志
+    service = relationship(
+        "MonitorService",
+        primaryjoin="MonitorLog.service_id == MonitorService.id",
+        foreign_keys=[service_id],
+        backref=backref("logs", passive_deletes="all")
+    )
     
     def __repr__(self):
         return f"<MonitorLog(id={self.id}, service_id={self.service_id}, status='{self.status}')>"
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+监控统计汇总模型
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, LargeBinary, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class MonitorRollup(Base):
+    """按服务、时间粒度（分钟/小时/天）汇总的监控统计，写入日志时增量更新"""
+    __tablename__ = "monitor_rollups"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    service_id = Column(Integer, nullable=False, comment="服务ID")
+    granularity = Column(String(10), nullable=False, comment="时间粒度: minute/hour/day")
+    bucket_start = Column(DateTime, nullable=False, comment="时间段开始时间")
+    
+    # 检查次数
+    total_count = Column(Integer, nullable=False, default=0, comment="检查次数")
+    success_count = Column(Integer, nullable=False, default=0, comment="成功次数")
+    failed_count = Column(Integer, nullable=False, default=0, comment="失败次数")
+    timeout_count = Column(Integer, nullable=False, default=0, comment="超时次数")
+    alert_count = Column(Integer, nullable=False, default=0, comment="发送告警次数")
+    
+    # 响应时间(毫秒)，所有有响应时间的检查
+    response_time_count = Column(Integer, nullable=False, default=0, comment="有响应时间的检查次数")
+    response_time_sum = Column(Float, nullable=False, default=0, comment="响应时间总和")
+    response_time_sq_sum = Column(Float, nullable=False, default=0, comment="响应时间平方和，用于计算标准差")
+    response_time_min = Column(Float, comment="最小响应时间")
+    response_time_max = Column(Float, comment="最大响应时间")
+    # 成功检查的响应时间
+    success_response_time_count = Column(Integer, nullable=False, default=0, comment="有响应时间的成功检查次数")
+    success_response_time_sum = Column(Float, nullable=False, default=0, comment="成功检查的响应时间总和")
+    
+    # 分阶段耗时(毫秒)总和与次数
+    dns_time_sum = Column(Float, nullable=False, default=0, comment="DNS解析耗时总和")
+    dns_time_count = Column(Integer, nullable=False, default=0, comment="有DNS解析耗时的检查次数")
+    connect_time_sum = Column(Float, nullable=False, default=0, comment="TCP连接耗时总和")
+    connect_time_count = Column(Integer, nullable=False, default=0, comment="有TCP连接耗时的检查次数")
+    tls_time_sum = Column(Float, nullable=False, default=0, comment="TLS握手耗时总和")
+    tls_time_count = Column(Integer, nullable=False, default=0, comment="有TLS握手耗时的检查次数")
+    ttfb_time_sum = Column(Float, nullable=False, default=0, comment="首字节时间总和")
+    ttfb_time_count = Column(Integer, nullable=False, default=0, comment="有首字节时间的检查次数")
+    download_time_sum = Column(Float, nullable=False, default=0, comment="响应体下载耗时总和")
+    download_time_count = Column(Integer, nullable=False, default=0, comment="有下载耗时的检查次数")
+    
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment="更新时间")
+    
+    __table_args__ = (
+        UniqueConstraint('service_id', 'granularity', 'bucket_start', name='uq_monitor_rollup'),
+        Index('idx_monitor_rollup_time', 'granularity', 'bucket_start'),
+    )
+    
+    def __repr__(self):
+        return f"<MonitorRollup(service_id={self.service_id}, {self.granularity}={self.bucket_start}, total={self.total_count})>"
+
+
+class MonitorRollupHistogram(Base):
+    """成功检查的响应时间分布，每个时间段每个区间一行"""
+    __tablename__ = "monitor_rollup_histograms"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    service_id = Column(Integer, nullable=False, comment="服务ID")
+    granularity = Column(String(10), nullable=False, comment="时间粒度: minute/hour/day")
+    bucket_start = Column(DateTime, nullable=False, comment="时间段开始时间")
+    bucket = Column(Integer, nullable=False, comment="响应时间区间下界(毫秒)，按下界存储，调整区间边界后历史数据仍可合并")
+    count = Column(Integer, nullable=False, default=0, comment="落在该区间的检查次数")
+    
+    __table_args__ = (
+        UniqueConstraint('service_id', 'granularity', 'bucket_start', 'bucket', name='uq_monitor_rollup_histogram'),
+        Index('idx_monitor_rollup_histogram_time', 'granularity', 'bucket_start'),
+    )
+    
+    def __repr__(self):
+        return f"<MonitorRollupHistogram(service_id={self.service_id}, {self.granularity}={self.bucket_start}, bucket={self.bucket})>"
+
+
+class MonitorRollupSketch(Base):
+    """成功检查响应时间的分位数草图（DDSketch），按服务、小时/天各一行"""
+    __tablename__ = "monitor_rollup_sketches"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    service_id = Column(Integer, nullable=False, comment="服务ID")
+    granularity = Column(String(10), nullable=False, comment="时间粒度: hour/day")
+    bucket_start = Column(DateTime, nullable=False, comment="时间段开始时间")
+    count = Column(Integer, nullable=False, default=0, comment="草图中的样本数")
+    data = Column(LargeBinary, nullable=False, comment="草图编码（每个非空区间8字节）")
+    updated_at = Column(DateTime, default=func.now(), comment="更新时间")
+    
+    __table_args__ = (
+        UniqueConstraint('service_id', 'granularity', 'bucket_start', name='uq_monitor_rollup_sketch'),
+        Index('idx_monitor_rollup_sketch_time', 'granularity', 'bucket_start'),
+    )
+    
+    def __repr__(self):
+        return f"<MonitorRollupSketch(service_id={self.service_id}, {self.granularity}={self.bucket_start}, count={self.count})>"
+
+
+class MonitorRollupBackfill(Base):
+    """
+    汇总表的历史回填进度
+
+    汇总表新建（首次升级或表结构变更）时如果已有日志，记录当时最大的日志ID，
+    这些日志没有经过增量累加，由主节点按天补入汇总；之后的日志由写入时增量更新。
+    """
+    __tablename__ = "monitor_rollup_backfills"
+    
+    table_name = Column(String(64), primary_key=True, comment="需要回填的汇总表")
+    max_log_id = Column(BigInteger().with_variant(Integer, "sqlite"), nullable=False, comment="回填的日志ID上限（含），之后的日志已增量累加")
+    next_day = Column(DateTime, comment="下一个待回填的日期，为空表示尚未开始")
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+    
+    def __repr__(self):
+        return f"<MonitorRollupBackfill(table_name='{self.table_name}', max_log_id={self.max_log_id}, next_day={self.next_day})>"
@@ -0,0 +1,20 @@
+"""
+调度器租约数据模型
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from app.core.database import Base
+
+
+class SchedulerLease(Base):
+    """调度器租约模型，每个租约一行，持有者定期续约"""
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(50), primary_key=True, comment="租约名称")
+    holder = Column(String(100), comment="当前持有者节点ID，为空表示已释放")
+    version = Column(Integer, nullable=False, default=0, comment="版本号，每次续约/接管加1")
+    acquired_at = Column(DateTime, comment="当前持有者获得租约的时间")
+    renewed_at = Column(DateTime, comment="最近续约时间")
+    expires_at = Column(DateTime, comment="租约到期时间（持有者本地时间，仅供查看）")
+    
+    def __repr__(self):
+        return f"<SchedulerLease(name='{self.name}', holder='{self.holder}', version={self.version})>"
@@ -0,0 +1,19 @@
+"""
+调度节点数据模型
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from app.core.database import Base
+
+
+class SchedulerNode(Base):
+    """调度节点模型，分片调度时每个节点一行，定期心跳"""
+    __tablename__ = "scheduler_nodes"
+    
+    node_id = Column(String(100), primary_key=True, comment="节点ID")
+    version = Column(Integer, nullable=False, default=0, comment="心跳版本号，每次心跳加1")
+    assigned = Column(Integer, nullable=False, default=0, comment="当前负责的服务数")
+    started_at = Column(DateTime, comment="节点启动时间")
+    heartbeat_at = Column(DateTime, comment="最近心跳时间（节点本地时间）")
+    
+    def __repr__(self):
+        return f"<SchedulerNode(node_id='{self.node_id}', assigned={self.assigned})>"
@@ -1,7 +1,7 @@
 """
 服务监控模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -18,12 +18,18 @@ class MonitorService(Base):
     timeout = Column(Integer, default=30, comment="超时时间(秒)")
     interval = Column(Integer, default=300, comment="监控间隔(秒)")
     retry_count = Column(Integer, default=3, comment="重试次数")
+    max_response_size = Column(Integer, comment="最多读取的响应体字节数，为空时使用全局配置")
+    http2 = Column(Boolean, default=False, comment="是否使用HTTP/2探测（同源站探测复用连接）")
+    priority = Column(String(20), default="normal", comment="探测优先级: critical/normal/low，探测积压时低优先级先被延后或丢弃")
     
     # 状态字段
     is_active = Column(Boolean, default=True, comment="是否启用")
     status = Column(String(20), default="unknown", comment="当前状态: healthy/unhealthy/unknown")
     last_check_time = Column(DateTime, comment="最后检查时间")
     last_success_time = Column(DateTime, comment="最后成功时间")
+    last_response_time = Column(Float, comment="最后一次检查的响应时间(毫秒)")
+    last_status_code = Column(Integer, comment="最后一次检查的HTTP状态码")
+    last_error_message = Column(Text, comment="最后一次检查的错误信息")
     
     # 告警配置
     enable_alert = Column(Boolean, default=True, comment="是否启用告警")
@@ -29,6 +29,11 @@ from .alert_config import (
     FeishuConfig,
     WechatConfig
 )
+from .agent import (
+    AgentProbeResult,
+    AgentResultItem,
+    AgentResultPush
+)
 
 __all__ = [
     # Service schemas
@@ -57,5 +62,10 @@ __all__ = [
     "AlertTestResponse",
     "EmailConfig",
     "FeishuConfig",
-    "WechatConfig"
+    "WechatConfig",
+    
+    # Agent schemas
+    "AgentProbeResult",
+    "AgentResultItem",
+    "AgentResultPush"
 ]
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+远程探测节点相关的Pydantic模式
+"""
+from typing import Any, List, Literal, Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+class AgentProbeResult(BaseModel):
+    """
+    探测节点回传的探测结果，字段与日志表一致
+
+    未知字段直接忽略；服务ID和节点ID以服务端为准，不从结果中读取。
+    """
+    model_config = ConfigDict(extra="ignore")
+
+    status: Literal["success", "failed", "timeout"] = Field(..., description="检查状态")
+    response_time: Optional[float] = Field(None, ge=0, description="响应时间(毫秒)")
+    status_code: Optional[int] = Field(None, ge=0, le=999, description="HTTP状态码")
+    response_size: Optional[int] = Field(None, ge=0, description="响应大小(字节)")
+    response_truncated: bool = Field(default=False, description="响应体是否被截断")
+    dns_time: Optional[float] = Field(None, ge=0, description="DNS解析耗时(毫秒)")
+    connect_time: Optional[float] = Field(None, ge=0, description="TCP连接耗时(毫秒)")
+    tls_time: Optional[float] = Field(None, ge=0, description="TLS握手耗时(毫秒)")
+    ttfb_time: Optional[float] = Field(None, ge=0, description="首字节时间(毫秒)")
+    download_time: Optional[float] = Field(None, ge=0, description="响应体下载耗时(毫秒)")
+    error_message: Optional[str] = Field(None, description="错误信息")
+    error_type: Optional[str] = Field(None, max_length=50, description="错误类型")
+    request_url: Optional[str] = Field(None, max_length=500, description="请求URL")
+    request_method: Optional[str] = Field(None, max_length=10, description="请求方法")
+    request_headers: Optional[str] = Field(None, description="请求头(JSON)")
+    response_headers: Optional[str] = Field(None, description="响应头(JSON)")
+    response_body: Optional[str] = Field(None, description="响应体(截取前1000字符)")
+    check_time: Optional[datetime] = Field(None, description="检查时间，为空时使用服务端接收时间")
+
+    @field_validator("check_time")
+    @classmethod
+    def check_time_naive(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """日志表的检查时间不带时区（服务器本地时间），带时区的时间无法与其他日志比较"""
+        if value is not None and value.tzinfo is not None:
+            raise ValueError("check_time 必须是不带时区的本地时间")
+        return value
+
+
+class AgentResultItem(BaseModel):
+    """探测节点回传的单条结果"""
+    lease_id: str = Field(..., min_length=1, description="任务租约ID")
+    service_id: int = Field(..., description="服务ID")
+    result: AgentProbeResult = Field(..., description="探测结果")
+
+
+class AgentResultPush(BaseModel):
+    """探测节点批量回传结果，单条结果在处理时再逐条校验"""
+    agent_id: str = Field(..., min_length=1, max_length=100, description="探测节点ID")
+    results: List[Any] = Field(default_factory=list, description="探测结果列表")
@@ -13,10 +13,17 @@ class MonitorLogBase(BaseModel):
     response_time: Optional[float] = Field(None, description="响应时间(毫秒)")
     status_code: Optional[int] = Field(None, description="HTTP状态码")
     response_size: Optional[int] = Field(None, description="响应大小(字节)")
+    response_truncated: bool = Field(default=False, description="响应体是否被截断")
+    dns_time: Optional[float] = Field(None, description="DNS解析耗时(毫秒)")
+    connect_time: Optional[float] = Field(None, description="TCP连接耗时(毫秒)")
+    tls_time: Optional[float] = Field(None, description="TLS握手耗时(毫秒)")
+    ttfb_time: Optional[float] = Field(None, description="首字节时间(毫秒)")
+    download_time: Optional[float] = Field(None, description="响应体下载耗时(毫秒)")
     error_message: Optional[str] = Field(None, description="错误信息")
     error_type: Optional[str] = Field(None, description="错误类型")
     request_url: Optional[str] = Field(None, description="请求URL")
     request_method: Optional[str] = Field(None, description="请求方法")
+    probe_node: Optional[str] = Field(None, description="执行探测的远程节点ID")
     alert_sent: bool = Field(default=False, description="是否已发送告警")
     alert_methods: Optional[str] = Field(None, description="已发送的告警方式")
 
@@ -14,6 +14,9 @@ class ServiceBase(BaseModel):
     timeout: int = Field(default=30, ge=1, le=300, description="超时时间(秒)")
     interval: int = Field(default=300, ge=60, le=86400, description="监控间隔(秒)")
     retry_count: int = Field(default=3, ge=0, le=10, description="重试次数")
+    max_response_size: Optional[int] = Field(None, ge=1, description="最多读取的响应体字节数")
+    http2: bool = Field(default=False, description="是否使用HTTP/2探测")
+    priority: str = Field(default="normal", pattern="^(critical|normal|low)$", description="探测优先级")
     is_active: bool = Field(default=True, description="是否启用")
     enable_alert: bool = Field(default=True, description="是否启用告警")
     alert_methods: str = Field(default="email", description="告警方式")
@@ -35,6 +38,9 @@ class ServiceUpdate(BaseModel):
     timeout: Optional[int] = Field(None, ge=1, le=300)
     interval: Optional[int] = Field(None, ge=60, le=86400)
     retry_count: Optional[int] = Field(None, ge=0, le=10)
+    max_response_size: Optional[int] = Field(None, ge=1)
+    http2: Optional[bool] = None
+    priority: Optional[str] = Field(None, pattern="^(critical|normal|low)$")
     is_active: Optional[bool] = None
     enable_alert: Optional[bool] = None
     alert_methods: Optional[str] = None
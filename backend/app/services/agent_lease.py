@@ -0,0 +1,181 @@
+"""
+远程探测节点任务租约
+"""
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+from app.models.service import MonitorService as ServiceModel
+from app.schemas.agent import AgentProbeResult
+
+logger = logging.getLogger(__name__)
+
+# 下发给探测节点的服务字段，与多进程工作池一致，节点只负责探测
+LEASE_FIELDS = ("id", "name", "url", "method", "timeout", "max_response_size", "http2", "priority")
+
+
+class AgentLeaseManager:
+    """
+    远程探测节点任务租约管理
+
+    PROBE_EXECUTION=agent 时调度器不在本机探测，而是把到期的服务放入待领取队列，
+    探测节点按批次领取（拉模式）。每批任务有一个租约，节点在租约超时前回传结果，
+    结果由 monitor_service.process_result 统一入库和告警；超时未回传的任务直接丢弃，
+    等待下一次调度重新入队，避免节点宕机后任务堆积。
+    同一服务在队列中或租约中时不会重复入队。
+    队列和租约只保存在当前进程内存中，因此 agent 模式只支持单个工作进程（WORKERS=1），启动时校验。
+    """
+
+    def __init__(self, lease_timeout: int, max_lease_size: int, max_queue_size: int):
+        self.lease_timeout = lease_timeout
+        self.max_lease_size = max_lease_size
+        self.max_queue_size = max_queue_size
+
+        self._queue: "OrderedDict[int, ServiceModel]" = OrderedDict()  # service_id -> 服务
+        self._leases: Dict[str, Dict[str, Any]] = {}  # lease_id -> {agent_id, expires_at, services}
+        self._leased_ids: Dict[int, str] = {}  # service_id -> lease_id
+        self._agents: Dict[str, Dict[str, Any]] = {}  # agent_id -> 节点信息
+        self._lease_seq = itertools.count(1)
+
+        # 统计信息
+        self._enqueued = 0
+        self._duplicates = 0
+        self._rejected = 0
+        self._leased = 0
+        self._completed = 0
+        self._expired = 0
+        self._late = 0
+
+    def enqueue(self, service: ServiceModel) -> bool:
+        """到期服务放入待领取队列"""
+        service_id = service.id
+        if service_id in self._queue or service_id in self._leased_ids:
+            # 上一次探测还未被领取或未回传，跳过本次
+            self._duplicates += 1
+            return False
+        if len(self._queue) >= self.max_queue_size:
+            self._rejected += 1
+            logger.warning(f"探测节点待领取队列已满，丢弃探测: {service.name}")
+            return False
+
+        self._queue[service_id] = service
+        self._enqueued += 1
+        return True
+
+    def lease(self, agent_id: str, max_items: int, location: Optional[str] = None) -> Dict[str, Any]:
+        """探测节点领取一批任务"""
+        self._expire_leases()
+        self._touch_agent(agent_id, location)
+
+        count = min(max_items, self.max_lease_size, len(self._queue))
+        if count <= 0:
+            return {"lease_id": None, "expires_in": self.lease_timeout, "services": []}
+
+        lease_id = f"{agent_id}-{next(self._lease_seq)}"
+        services = {}
+        for _ in range(count):
+            service_id, service = self._queue.popitem(last=False)
+            services[service_id] = service
+            self._leased_ids[service_id] = lease_id
+
+        self._leases[lease_id] = {
+            "agent_id": agent_id,
+            "expires_at": time.monotonic() + self.lease_timeout,
+            "services": services
+        }
+        self._leased += count
+        self._agents[agent_id]["leased"] += count
+
+        return {
+            "lease_id": lease_id,
+            "expires_in": self.lease_timeout,
+            "services": [
+                {field: getattr(service, field, None) for field in LEASE_FIELDS}
+                for service in services.values()
+            ]
+        }
+
+    def complete(self, agent_id: str, lease_id: str, service_id: int,
+                 result: AgentProbeResult) -> Optional[tuple]:
+        """
+        登记探测节点回传的结果
+
+        Returns:
+            (服务, 清洗后的结果)；租约不存在、已超时或不属于该节点时返回None
+        """
+        lease = self._leases.get(lease_id)
+        if lease is None or lease["agent_id"] != agent_id or service_id not in lease["services"]:
+            self._late += 1
+            return None
+
+        service = lease["services"].pop(service_id)
+        self._leased_ids.pop(service_id, None)
+        if not lease["services"]:
+            del self._leases[lease_id]
+
+        self._completed += 1
+        self._agents[agent_id]["completed"] += 1
+        return service, self._clean_result(service, result, agent_id)
+
+    @staticmethod
+    def _clean_result(service: ServiceModel, result: AgentProbeResult, agent_id: str) -> Dict[str, Any]:
+        """结果已按日志表字段校验，服务ID和节点ID以服务端为准"""
+        cleaned = result.model_dump(exclude_unset=True)
+        cleaned["service_id"] = service.id
+        cleaned["probe_node"] = agent_id
+        if cleaned.get("check_time") is None:
+            cleaned["check_time"] = datetime.now()
+        return cleaned
+
+    def _expire_leases(self):
+        """丢弃超时未回传的租约"""
+        now = time.monotonic()
+        for lease_id in [key for key, lease in self._leases.items() if lease["expires_at"] <= now]:
+            lease = self._leases.pop(lease_id)
+            for service_id in lease["services"]:
+                self._leased_ids.pop(service_id, None)
+            self._expired += len(lease["services"])
+            logger.warning(f"探测节点 {lease['agent_id']} 的租约 {lease_id} 已超时，丢弃 {len(lease['services'])} 个探测")
+
+    def _touch_agent(self, agent_id: str, location: Optional[str] = None):
+        """记录探测节点最近一次访问"""
+        agent = self._agents.setdefault(agent_id, {"location": None, "leased": 0, "completed": 0})
+        if location:
+            agent["location"] = location
+        agent["last_seen"] = datetime.now()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取租约统计信息"""
+        self._expire_leases()
+        return {
+            "execution": settings.PROBE_EXECUTION,
+            "queued": len(self._queue),
+            "leased": len(self._leased_ids),
+            "active_leases": len(self._leases),
+            "enqueued": self._enqueued,
+            "duplicates": self._duplicates,
+            "rejected": self._rejected,
+            "leased_total": self._leased,
+            "completed": self._completed,
+            "expired": self._expired,
+            "late_results": self._late,
+            "agents": {
+                agent_id: {
+                    **info,
+                    "last_seen": info["last_seen"].isoformat() if info.get("last_seen") else None
+                }
+                for agent_id, info in self._agents.items()
+            }
+        }
+
+
+# 创建全局租约管理实例
+agent_lease_manager = AgentLeaseManager(
+    lease_timeout=settings.AGENT_LEASE_TIMEOUT,
+    max_lease_size=settings.AGENT_MAX_LEASE_SIZE,
+    max_queue_size=settings.PROBE_QUEUE_SIZE
+)
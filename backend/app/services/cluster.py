@@ -0,0 +1,195 @@
+"""
+分片调度的节点成员管理和一致性哈希
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterable
+
+from sqlalchemy import select, update, delete, insert
+
+from app.core.config import settings
+from app.core.database import get_db_session, run_in_db_thread
+from app.models.scheduler_node import SchedulerNode
+from app.services.leader import default_node_id
+from app.services.service_registry import service_registry
+
+logger = logging.getLogger(__name__)
+
+_nodes = SchedulerNode.__table__
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    一致性哈希环
+
+    每个节点在环上放 vnodes 个虚拟节点，服务ID顺时针找到的第一个虚拟节点即为负责节点。
+    节点加入/离开时只有落在其相邻区间的服务换节点，约占 1/节点数。
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int):
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, service_id: int) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(str(service_id))) % len(self._hashes)
+        return self._owners[index]
+
+
+class ClusterMembership:
+    """
+    调度节点成员管理
+
+    每个节点在 scheduler_nodes 表中一行，每 heartbeat_interval 秒把版本号加1并上报负责的服务数，
+    同时读取全部节点。与选主一样按本机单调时钟判断其他节点是否存活：
+    版本号连续 node_timeout 秒没有变化即视为离开（首次看到时按心跳时间粗略判断）。
+    存活节点集合变化时重建哈希环并通知调度器重新分配。各节点在一个心跳周期内看到的
+    成员可能不一致，期间个别服务可能被重复探测或漏探一次。
+    长时间没有心跳的节点行会被清理，正常关闭的节点删除自己的行。
+    """
+
+    def __init__(self, heartbeat_interval: int, node_timeout: int, vnodes: int, node_id: Optional[str] = None):
+        self.heartbeat_interval = heartbeat_interval
+        self.node_timeout = max(node_timeout, heartbeat_interval * 2)
+        self.vnodes = vnodes
+        self.node_id = node_id or default_node_id()
+
+        self.ring = HashRing([self.node_id], vnodes)
+        self._on_change: Optional[Callable[[], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._version = 0
+        self._started_at = datetime.now()
+
+        # 节点ID -> (版本号, 观察到该版本的本机单调时间)
+        self._observed: Dict[str, tuple] = {}
+        # 最近一次读取的节点信息
+        self._members: Dict[str, Dict[str, Any]] = {}
+        self._rebalances = 0
+
+    def owns(self, service_id: int) -> bool:
+        """本节点是否负责该服务"""
+        return self.ring.owner(service_id) == self.node_id
+
+    async def start(self, on_change: Callable[[], Awaitable[None]]):
+        """注册本节点并启动心跳，成员变化时调用 on_change"""
+        self._on_change = on_change
+        if self._task is None:
+            await self._heartbeat()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"分片调度节点已加入: {self.node_id}, 当前节点: {self.ring.nodes}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                if await self._heartbeat():
+                    self._rebalances += 1
+                    logger.info(f"调度节点变化，重新分配: {self.ring.nodes}")
+                    await self._on_change()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"调度节点心跳失败: {str(e)}")
+
+    async def _heartbeat(self) -> bool:
+        """上报心跳并刷新成员，返回存活节点是否变化"""
+        self._version += 1
+        rows = await run_in_db_thread(self._heartbeat_and_read, self._version, len(service_registry))
+        now = time.monotonic()
+        wall_now = datetime.now()
+
+        alive = [self.node_id]
+        members = {}
+        for row in rows:
+            node_id = row["node_id"]
+            observed = self._observed.get(node_id)
+            if observed is None or observed[0] != row["version"]:
+                if observed is None and row["heartbeat_at"] and \
+                        wall_now - row["heartbeat_at"] > timedelta(seconds=self.node_timeout):
+                    # 首次看到且心跳已久，视为已经离开
+                    observed = (row["version"], now - self.node_timeout)
+                else:
+                    observed = (row["version"], now)
+                self._observed[node_id] = observed
+            is_alive = node_id == self.node_id or now - observed[1] < self.node_timeout
+            if is_alive and node_id != self.node_id:
+                alive.append(node_id)
+            members[node_id] = {
+                "alive": is_alive,
+                "assigned": row["assigned"],
+                "started_at": row["started_at"].isoformat() if row["started_at"] else None,
+                "heartbeat_at": row["heartbeat_at"].isoformat() if row["heartbeat_at"] else None
+            }
+        self._members = members
+
+        # 清理长时间没有心跳的节点
+        stale = [node_id for node_id, (_, seen) in self._observed.items()
+                 if node_id != self.node_id and now - seen >= self.node_timeout * 10]
+        if stale:
+            await run_in_db_thread(self._delete_nodes, stale)
+            for node_id in stale:
+                self._observed.pop(node_id, None)
+
+        if sorted(alive) == self.ring.nodes:
+            return False
+        self.ring = HashRing(alive, self.vnodes)
+        return True
+
+    def _heartbeat_and_read(self, version: int, assigned: int) -> List[Dict[str, Any]]:
+        with get_db_session() as db:
+            values = {"version": version, "assigned": assigned, "heartbeat_at": datetime.now()}
+            result = db.execute(update(SchedulerNode).where(SchedulerNode.node_id == self.node_id).values(**values))
+            if result.rowcount == 0:
+                db.execute(insert(SchedulerNode).values(node_id=self.node_id, started_at=self._started_at, **values))
+            return [dict(row._mapping) for row in db.execute(select(_nodes))]
+
+    @staticmethod
+    def _delete_nodes(node_ids: List[str]):
+        with get_db_session() as db:
+            db.execute(delete(SchedulerNode).where(SchedulerNode.node_id.in_(node_ids)))
+
+    async def stop(self):
+        """停止心跳并删除本节点，其他节点在下一次心跳时接管本节点的服务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await run_in_db_thread(self._delete_nodes, [self.node_id])
+                logger.info(f"分片调度节点已离开: {self.node_id}")
+            except Exception as e:
+                logger.error(f"删除调度节点失败: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取节点和各节点负责的服务数"""
+        return {
+            "enabled": self._task is not None,
+            "node_id": self.node_id,
+            "alive_nodes": self.ring.nodes,
+            "rebalances": self._rebalances,
+            "members": self._members
+        }
+
+
+# 创建全局调度节点成员管理实例
+cluster_membership = ClusterMembership(
+    heartbeat_interval=settings.CLUSTER_HEARTBEAT_INTERVAL,
+    node_timeout=settings.CLUSTER_NODE_TIMEOUT,
+    vnodes=settings.CLUSTER_VIRTUAL_NODES
+)
@@ -3,19 +3,45 @@
 """
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any
+import time
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func
+from sqlalchemy import text, func, inspect, select, delete
 
-from app.core.database import get_db_sync, get_db_session
+from app.core.config import settings
+from app.core.database import get_db_sync, engine
 from app.models.monitor_log import MonitorLog
 
 logger = logging.getLogger(__name__)
 
 
+# MySQL TO_DAYS() 与 Python date.toordinal() 相差365天
+_TO_DAYS_OFFSET = 365
+
+
+def _to_days(day: date) -> int:
+    return day.toordinal() + _TO_DAYS_OFFSET
+
+
+def _from_days(value: int) -> date:
+    return date.fromordinal(value - _TO_DAYS_OFFSET)
+
+
+def _partition_name(day: date) -> str:
+    """按天分区名，pYYYYMMDD 表示该天的数据"""
+    return f"p{day:%Y%m%d}"
+
+
 class DataCleanupService:
-    """数据清理服务类"""
+    """
+    数据清理服务类
+
+    MySQL下 monitor_logs 按 TO_DAYS(check_time) 按天RANGE分区：p0 存放最早的数据，
+    pYYYYMMDD 为每天一个分区，pmax (MAXVALUE) 兜底。新分区通过拆分空的 pmax 提前创建
+    （REORGANIZE PARTITION），清理过期日志时整分区 DROP PARTITION，
+    只有跨过保留期边界的那一天才分批 DELETE。
+    """
     
     def __init__(self):
         self.default_retention_days = 90  # 默认保留90天
@@ -29,7 +55,7 @@ class DataCleanupService:
         service_id: int = None
     ) -> Dict[str, Any]:
         """
-        异步清理旧的监控日志
+        异步清理旧的监控日志：在线程池中执行同步清理，删除和删除分区不阻塞事件循环
         
         Args:
             retention_days: 保留天数，默认90天
@@ -39,71 +65,10 @@ class DataCleanupService:
         Returns:
             清理结果统计
         """
-        if retention_days is None:
-            retention_days = self.default_retention_days
-        
-        cutoff_date = datetime.now() - timedelta(days=retention_days)
-        
         try:
-            async with get_db_session() as db:
-                # 构建查询条件
-                conditions = ["check_time < :cutoff_date"]
-                params = {"cutoff_date": cutoff_date}
-                
-                if service_id:
-                    conditions.append("service_id = :service_id")
-                    params["service_id"] = service_id
-                
-                where_clause = " AND ".join(conditions)
-                
-                # 获取要删除的记录数和统计信息
-                stats_sql = f"""
-                SELECT 
-                    COUNT(*) as total_count,
-                    COUNT(DISTINCT service_id) as affected_services,
-                    MIN(check_time) as oldest_record,
-                    MAX(check_time) as newest_record,
-                    SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-                    SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed_count,
-                    SUM(CASE WHEN status = 'timeout' THEN 1 ELSE 0 END) as timeout_count
-                FROM monitor_logs 
-                WHERE {where_clause}
-                """
-                
-                stats_result = db.execute(text(stats_sql), params).fetchone()
-                
-                result = {
-                    "retention_days": retention_days,
-                    "cutoff_date": cutoff_date.isoformat(),
-                    "total_count": stats_result.total_count or 0,
-                    "affected_services": stats_result.affected_services or 0,
-                    "oldest_record": stats_result.oldest_record.isoformat() if stats_result.oldest_record else None,
-                    "newest_record": stats_result.newest_record.isoformat() if stats_result.newest_record else None,
-                    "success_count": stats_result.success_count or 0,
-                    "failed_count": stats_result.failed_count or 0,
-                    "timeout_count": stats_result.timeout_count or 0,
-                    "dry_run": dry_run,
-                    "deleted_count": 0
-                }
-                
-                if result["total_count"] == 0:
-                    result["message"] = "没有需要清理的数据"
-                    return result
-                
-                if dry_run:
-                    result["message"] = f"试运行模式：将删除 {result['total_count']} 条记录"
-                    return result
-                
-                # 执行实际删除
-                deleted_count = await self._batch_delete_async(db, where_clause, params)
-                result["deleted_count"] = deleted_count
-                result["message"] = f"成功清理 {deleted_count} 条监控日志记录"
-                
-                # 记录清理日志
-                await self._log_cleanup_operation_async(db, result)
-                
-                return result
-                
+            return await asyncio.get_event_loop().run_in_executor(
+                None, self.cleanup_old_logs, retention_days, dry_run, service_id
+            )
         except Exception as e:
             logger.error(f"异步数据清理失败: {str(e)}")
             raise
@@ -170,12 +135,22 @@ class DataCleanupService:
                 
                 if dry_run:
                     result["message"] = f"试运行模式：将删除 {result['total_count']} 条记录"
+                    if not service_id:
+                        result["expired_partitions"] = [
+                            name for name, _ in self._expired_partitions(db, cutoff_date)
+                        ]
                     return result
                 
-                # 执行实际删除
+                # 整分区删除过期日志，剩余的边界数据分批删除；
+                # deleted_count 只统计逐行删除的行数（决定是否需要优化表），整分区删除不产生碎片
+                dropped = self.drop_expired_partitions(db, cutoff_date) if not service_id else None
                 deleted_count = self._batch_delete(db, where_clause, params)
                 result["deleted_count"] = deleted_count
                 result["message"] = f"成功清理 {deleted_count} 条监控日志记录"
+                if dropped:
+                    result["dropped_partitions"] = dropped["partitions"]
+                    result["dropped_rows_estimate"] = dropped["rows_estimate"]
+                    result["message"] += f"，删除 {len(dropped['partitions'])} 个过期分区（约 {dropped['rows_estimate']} 条）"
                 
                 # 记录清理日志
                 self._log_cleanup_operation(db, result)
@@ -186,52 +161,13 @@ class DataCleanupService:
                 logger.error(f"数据清理失败: {str(e)}")
                 raise
     
-    async def _batch_delete_async(self, db: Session, where_clause: str, params: Dict) -> int:
-        """异步分批删除数据，避免长时间锁表"""
-        deleted_count = 0
-        batch_count = 0
-        
-        while True:
-            batch_start_time = datetime.now()
-            
-            delete_sql = f"""
-            DELETE FROM monitor_logs 
-            WHERE {where_clause}
-            LIMIT :batch_size
-            """
-            params["batch_size"] = self.batch_size
-            
-            result = db.execute(text(delete_sql), params)
-            batch_deleted = result.rowcount
-            
-            if batch_deleted == 0:
-                break
-                
-            deleted_count += batch_deleted
-            batch_count += 1
-            
-            logger.info(f"批次 {batch_count}: 删除 {batch_deleted} 条记录，累计删除 {deleted_count} 条")
-            
-            # 让出控制权，避免阻塞事件循环
-            await asyncio.sleep(0.1)
-            
-            # 检查批次执行时间，避免长时间占用数据库
-            batch_time = (datetime.now() - batch_start_time).total_seconds()
-            if batch_time > self.max_batch_time:
-                logger.warning(f"批次执行时间过长 ({batch_time:.2f}s)，暂停片刻")
-                await asyncio.sleep(1)
-            
-            # 如果删除的记录数小于批次大小，说明已经删除完毕
-            if batch_deleted < self.batch_size:
-                break
-        
-        return deleted_count
-    
     def _batch_delete(self, db: Session, where_clause: str, params: Dict) -> int:
-        """同步分批删除数据，避免长时间锁表"""
+        """同步分批删除数据，每批单独提交，避免长时间锁表"""
         deleted_count = 0
         
         while True:
+            batch_start_time = time.monotonic()
+            
             delete_sql = f"""
             DELETE FROM monitor_logs 
             WHERE {where_clause}
@@ -246,38 +182,20 @@ class DataCleanupService:
                 break
                 
             deleted_count += batch_deleted
+            db.commit()
             
             logger.info(f"已删除 {batch_deleted} 条记录，累计删除 {deleted_count} 条")
             
             # 如果删除的记录数小于批次大小，说明已经删除完毕
             if batch_deleted < self.batch_size:
                 break
+            
+            # 批次之间稍作停顿，避免长时间占用数据库
+            batch_time = time.monotonic() - batch_start_time
+            time.sleep(1 if batch_time > self.max_batch_time else 0.1)
         
         return deleted_count
     
-    async def _log_cleanup_operation_async(self, db: Session, result: Dict[str, Any]):
-        """异步记录清理操作日志"""
-        try:
-            log_sql = """
-            INSERT INTO system_logs (operation, message, details, created_at) 
-            VALUES ('data_cleanup', :message, :details, NOW())
-            """
-            
-            details = {
-                "retention_days": result["retention_days"],
-                "deleted_count": result["deleted_count"],
-                "affected_services": result["affected_services"],
-                "cutoff_date": result["cutoff_date"]
-            }
-            
-            db.execute(text(log_sql), {
-                "message": result["message"],
-                "details": str(details)
-            })
-            await asyncio.sleep(0)  # 让出控制权
-        except Exception as e:
-            logger.warning(f"记录清理日志失败: {str(e)}")
-    
     def _log_cleanup_operation(self, db: Session, result: Dict[str, Any]):
         """记录清理操作日志"""
         try:
@@ -300,6 +218,28 @@ class DataCleanupService:
         except Exception as e:
             logger.warning(f"记录清理日志失败: {str(e)}")
     
+    def delete_service_data(self, service_id: int) -> Dict[str, int]:
+        """
+        删除已删除服务的统计汇总和监控日志（服务删除后在后台执行）
+
+        先删除汇总，统计接口立即不再计入该服务；日志按主键分批删除，每批单独提交。
+        """
+        from app.services.rollup import rollup_service
+        
+        result = {"rollup_rows": rollup_service.delete_service(service_id), "log_rows": 0}
+        with get_db_sync() as db:
+            while True:
+                ids = db.execute(
+                    select(MonitorLog.id).where(MonitorLog.service_id == service_id).limit(self.batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                db.execute(delete(MonitorLog).where(MonitorLog.id.in_(ids)))
+                db.commit()
+                result["log_rows"] += len(ids)
+        logger.info(f"已删除服务 {service_id} 的数据: {result}")
+        return result
+    
     def get_cleanup_stats(self, days: int = 30) -> Dict[str, Any]:
         """获取清理统计信息"""
         with get_db_sync() as db:
@@ -418,56 +358,204 @@ class DataCleanupService:
             else:
                 return {}
     
+    # ---------- 日志分区（MySQL） ----------
+
+    @staticmethod
+    def partitioning_supported() -> bool:
+        return settings.LOG_PARTITION_ENABLED and engine.dialect.name == "mysql"
+
+    @staticmethod
+    def get_partitions(db: Session) -> List[Tuple[str, Optional[int]]]:
+        """按顺序返回 monitor_logs 的分区 [(名称, 上界TO_DAYS值)]，MAXVALUE 分区上界为空；未分区时为空列表"""
+        rows = db.execute(text("""
+            SELECT partition_name, partition_description
+            FROM information_schema.partitions
+            WHERE table_schema = DATABASE()
+            AND table_name = 'monitor_logs'
+            AND partition_name IS NOT NULL
+            ORDER BY partition_ordinal_position
+        """)).fetchall()
+        return [
+            (name, None if description == "MAXVALUE" else int(description))
+            for name, description in rows
+        ]
+
+    @staticmethod
+    def _daily_partitions(start: date, end: date) -> List[str]:
+        """[start, end] 每天一个分区的定义"""
+        definitions = []
+        day = start
+        while day <= end:
+            next_day = day + timedelta(days=1)
+            definitions.append(f"PARTITION {_partition_name(day)} VALUES LESS THAN (TO_DAYS('{next_day.isoformat()}'))")
+            day = next_day
+        return definitions
+
+    def init_partitions(self):
+        """
+        启动时调用：新建的空表直接改为分区表；已分区时补齐未来的分区；
+        已有数据的未分区表需要通过迁移接口显式迁移（会重建整张表）
+        """
+        if not self.partitioning_supported():
+            return
+        with get_db_sync() as db:
+            if self.get_partitions(db):
+                self._ensure_partitions(db, date.today() + timedelta(days=settings.LOG_PARTITION_PRECREATE_DAYS))
+                return
+            if db.execute(text("SELECT 1 FROM monitor_logs LIMIT 1")).first() is None:
+                self._partition_table(db, date.today())
+                logger.info("monitor_logs 已创建为按天分区表")
+            else:
+                logger.warning("monitor_logs 尚未分区，过期日志只能逐批删除；"
+                               "可调用 POST /api/maintenance/partitions/migrate 迁移为分区表")
+
+    def migrate_to_partitions(self, dry_run: bool = True, retention_days: int = None) -> Dict[str, Any]:
+        """
+        把已有的未分区 monitor_logs 迁移为按天分区表
+
+        按天分区从 max(最早数据, 今天-保留天数) 开始，保留天数应与定时清理一致（默认90天），
+        更早的数据进入 p0，下次清理时整分区删除。
+        迁移需要重建整张表（ALTER TABLE期间写入会被阻塞），应在低峰期执行。
+        """
+        if not self.partitioning_supported():
+            raise ValueError("只有MySQL支持日志分区，或已通过 LOG_PARTITION_ENABLED 关闭")
+        if retention_days is None:
+            retention_days = self.default_retention_days
+        with get_db_sync() as db:
+            if self.get_partitions(db):
+                return {"message": "monitor_logs 已是分区表", "migrated": False}
+            oldest = db.execute(text("SELECT MIN(check_time) FROM monitor_logs")).scalar()
+            total = db.execute(text("SELECT COUNT(*) FROM monitor_logs")).scalar()
+            first_day = self._first_partition_day(oldest, retention_days)
+            last_day = date.today() + timedelta(days=settings.LOG_PARTITION_PRECREATE_DAYS)
+            result = {
+                "table_rows": total,
+                "retention_days": retention_days,
+                "oldest_record": oldest.isoformat() if oldest else None,
+                "first_partition": _partition_name(first_day),
+                "last_partition": _partition_name(last_day),
+                "partition_count": (last_day - first_day).days + 3
+            }
+            if dry_run:
+                result["message"] = f"试运行模式：将把 {total} 条记录的 monitor_logs 重建为 {result['partition_count']} 个分区"
+                result["migrated"] = False
+                return result
+
+            started = datetime.now()
+            self._partition_table(db, first_day)
+            result["elapsed_seconds"] = round((datetime.now() - started).total_seconds(), 2)
+            result["message"] = "monitor_logs 已迁移为按天分区表"
+            result["migrated"] = True
+            logger.info(f"monitor_logs 分区迁移完成: {result}")
+            return result
+
+    @staticmethod
+    def _first_partition_day(oldest: Optional[datetime], retention_days: int, today: date = None) -> date:
+        """迁移时第一个按天分区的日期：最早数据所在的那天，但不早于保留期起点"""
+        today = today or date.today()
+        return max(oldest.date() if oldest else today, today - timedelta(days=retention_days))
+
+    def _partition_table(self, db: Session, first_day: date):
+        """把 monitor_logs 改为按天分区表：去掉外键，主键改为 (id, check_time)，一次重建"""
+        for foreign_key in inspect(db.get_bind()).get_foreign_keys("monitor_logs"):
+            db.execute(text(f"ALTER TABLE monitor_logs DROP FOREIGN KEY {foreign_key['name']}"))
+        db.execute(text("UPDATE monitor_logs SET check_time = COALESCE(created_at, NOW()) WHERE check_time IS NULL"))
+        last_day = date.today() + timedelta(days=settings.LOG_PARTITION_PRECREATE_DAYS)
+        partitions = [f"PARTITION p0 VALUES LESS THAN (TO_DAYS('{first_day.isoformat()}'))"]
+        partitions += self._daily_partitions(first_day, last_day)
+        partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        db.execute(text(f"""
+            ALTER TABLE monitor_logs
+            MODIFY check_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '检查时间（分区列）',
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, check_time)
+            PARTITION BY RANGE (TO_DAYS(check_time)) (
+                {", ".join(partitions)}
+            )
+        """))
+
+    def _ensure_partitions(self, db: Session, until: date) -> List[str]:
+        """拆分 pmax，补齐到 until（含）为止的按天分区，返回新建的分区名"""
+        partitions = self.get_partitions(db)
+        bounds = [bound for _, bound in partitions if bound is not None]
+        if not bounds:
+            return []
+        start = _from_days(max(bounds))
+        if start > until:
+            return []
+        definitions = self._daily_partitions(start, until)
+        if partitions[-1][1] is None:
+            # pmax 中没有数据（分区总是提前创建），拆分只是修改元数据
+            db.execute(text(f"""
+                ALTER TABLE monitor_logs REORGANIZE PARTITION {partitions[-1][0]} INTO (
+                    {", ".join(definitions)},
+                    PARTITION {partitions[-1][0]} VALUES LESS THAN MAXVALUE
+                )
+            """))
+        else:
+            db.execute(text(f"ALTER TABLE monitor_logs ADD PARTITION ({', '.join(definitions)})"))
+        created = [_partition_name(start + timedelta(days=i)) for i in range(len(definitions))]
+        logger.info(f"已创建日志分区: {created[0]} ~ {created[-1]}")
+        return created
+
+    def _expired_partitions(self, db: Session, cutoff_date: datetime) -> List[Tuple[str, int]]:
+        """上界不晚于截止日期零点的分区（其中全部数据都已过期），始终保留最后一个有上界的分区"""
+        if not self.partitioning_supported():
+            return []
+        return self.expired_of(self.get_partitions(db), cutoff_date)
+
+    @staticmethod
+    def expired_of(partitions: List[Tuple[str, Optional[int]]], cutoff_date: datetime) -> List[Tuple[str, int]]:
+        """从 get_partitions 的结果中选出全部数据都早于截止日期零点的分区"""
+        bounded = [(name, bound) for name, bound in partitions if bound is not None]
+        cutoff_days = _to_days(cutoff_date.date())
+        return [(name, bound) for name, bound in bounded[:-1] if bound <= cutoff_days]
+
+    def drop_expired_partitions(self, db: Session, cutoff_date: datetime) -> Optional[Dict[str, Any]]:
+        """
+        整分区删除过期日志，返回删除的分区和估算行数；未分区时返回None
+
+        行数取自 information_schema 的统计值（InnoDB为估算），不扫描要删除的分区。
+        """
+        expired = self._expired_partitions(db, cutoff_date)
+        if not expired:
+            return None
+        names = [name for name, _ in expired]
+        params = {f"p{index}": name for index, name in enumerate(names)}
+        rows = db.execute(text(f"""
+            SELECT SUM(table_rows) FROM information_schema.partitions
+            WHERE table_schema = DATABASE()
+            AND table_name = 'monitor_logs'
+            AND partition_name IN ({", ".join(f":{key}" for key in params)})
+        """), params).scalar() or 0
+        db.execute(text(f"ALTER TABLE monitor_logs DROP PARTITION {', '.join(names)}"))
+        logger.info(f"已删除过期日志分区 {names[0]} ~ {names[-1]}，约 {rows} 条")
+        return {"partitions": names, "rows_estimate": int(rows)}
+
     def create_partition_if_needed(self, target_date: datetime = None) -> Dict[str, Any]:
-        """根据需要创建新分区"""
+        """提前创建到目标日期（含）为止的按天分区"""
         if target_date is None:
-            target_date = datetime.now() + timedelta(days=30)  # 提前创建下个月的分区
+            target_date = datetime.now() + timedelta(days=settings.LOG_PARTITION_PRECREATE_DAYS)
         
-        partition_name = f"p{target_date.year}{target_date.month:02d}"
+        if not self.partitioning_supported():
+            return {"message": "当前数据库不使用日志分区", "created": []}
         
         with get_db_sync() as db:
-            # 检查分区是否已存在
-            check_sql = """
-            SELECT COUNT(*) as partition_exists
-            FROM information_schema.partitions 
-            WHERE table_schema = DATABASE() 
-            AND table_name = 'monitor_logs' 
-            AND partition_name = :partition_name
-            """
-            
-            exists = db.execute(text(check_sql), {"partition_name": partition_name}).scalar()
-            
-            if exists > 0:
+            if not self.get_partitions(db):
                 return {
-                    "message": f"分区 {partition_name} 已存在",
-                    "partition_name": partition_name,
-                    "created": False
+                    "message": "monitor_logs 尚未分区，请先调用迁移接口",
+                    "created": []
                 }
+            created = self._ensure_partitions(db, target_date.date() if isinstance(target_date, datetime) else target_date)
             
-            # 计算分区值
-            if target_date.month == 12:
-                next_year = target_date.year + 1
-                next_month = 1
-            else:
-                next_year = target_date.year
-                next_month = target_date.month + 1
-            
-            partition_value = next_year * 100 + next_month
-            
-            # 创建分区
-            create_sql = f"""
-            ALTER TABLE monitor_logs ADD PARTITION (
-                PARTITION {partition_name} VALUES LESS THAN ({partition_value})
-            )
-            """
-            
-            db.execute(text(create_sql))
-            
+            if not created:
+                return {
+                    "message": f"{target_date:%Y-%m-%d} 之前的分区已存在",
+                    "created": []
+                }
             return {
-                "message": f"成功创建分区 {partition_name}",
-                "partition_name": partition_name,
-                "partition_value": partition_value,
-                "created": True
+                "message": f"成功创建 {len(created)} 个分区 {created[0]} ~ {created[-1]}",
+                "created": created
             }
 
 
@@ -0,0 +1,221 @@
+"""
+探测用异步DNS缓存
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List
+
+import httpcore
+import httpx
+
+try:
+    import aiodns
+except ImportError:  # 未安装aiodns时退回系统解析器，使用默认TTL
+    aiodns = None
+
+logger = logging.getLogger(__name__)
+
+# 当前探测的计时器，由MonitorService在发起请求前设置，用于回填DNS解析耗时
+probe_timer_var: ContextVar = ContextVar("probe_timer", default=None)
+
+
+class AsyncDNSCache:
+    """
+    异步DNS缓存
+
+    - 安装了aiodns时直接查询DNS并遵循记录TTL，否则使用系统解析器和默认TTL
+    - 解析失败的结果也会缓存一段时间（负缓存），避免反复解析不存在的域名
+    - 超过最大条目数时按LRU淘汰
+    - 同一域名的并发解析只发起一次查询
+    """
+
+    def __init__(self, max_size: int = 10000, min_ttl: int = 5, max_ttl: int = 300,
+                 default_ttl: int = 60, negative_ttl: int = 30):
+        self.max_size = max_size
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+
+        # host -> (地址列表, 过期时间, 错误信息)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._resolver = None
+
+        # 统计信息
+        self._hits = 0
+        self._misses = 0
+        self._negative_hits = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._errors = 0
+        self._resolve_time_total = 0.0
+
+    async def resolve(self, host: str) -> List[str]:
+        """解析域名，返回IP地址列表；解析失败时抛出httpcore.ConnectError"""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        entry = self._entries.get(host)
+        if entry is not None:
+            addresses, expires_at, error = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(host)
+                if error is not None:
+                    self._negative_hits += 1
+                    raise httpcore.ConnectError(error)
+                self._hits += 1
+                return addresses
+            del self._entries[host]
+
+        lookup = self._inflight.get(host)
+        if lookup is not None:
+            self._coalesced += 1
+        else:
+            # 解析放在独立任务中执行，发起者被取消（如连接超时）不影响等待同一结果的其他探测
+            self._misses += 1
+            lookup = asyncio.ensure_future(self._shared_lookup(host))
+            self._inflight[host] = lookup
+            lookup.add_done_callback(lambda _: self._inflight.pop(host, None))
+
+        addresses, error = await asyncio.shield(lookup)
+        if error is not None:
+            raise httpcore.ConnectError(error)
+        return addresses
+
+    async def _shared_lookup(self, host: str) -> tuple:
+        """供并发解析共享的查询，异常转为错误信息返回"""
+        try:
+            return await self._lookup(host)
+        except Exception as e:
+            return [], f"DNS解析失败: {host} ({str(e)})"
+
+    async def _lookup(self, host: str) -> tuple:
+        """执行实际解析并写入缓存"""
+        started = time.perf_counter()
+        addresses, ttl, error = [], self.negative_ttl, None
+
+        if aiodns is not None:
+            addresses, ttl = await self._query_aiodns(host)
+
+        if not addresses:
+            # aiodns不可用或查询失败（如仅在hosts文件中配置的域名），使用系统解析器
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+                addresses = list(dict.fromkeys(info[4][0] for info in infos))
+                ttl = self.default_ttl
+            except OSError as e:
+                error = f"DNS解析失败: {host} ({str(e)})"
+                ttl = self.negative_ttl
+                self._errors += 1
+
+        self._resolve_time_total += time.perf_counter() - started
+        self._store(host, addresses, ttl, error)
+        return addresses, error
+
+    async def _query_aiodns(self, host: str) -> tuple:
+        """通过aiodns查询A/AAAA记录，返回(地址列表, TTL)"""
+        if self._resolver is None:
+            self._resolver = aiodns.DNSResolver()
+
+        for record_type in ("A", "AAAA"):
+            try:
+                records = await self._resolver.query(host, record_type)
+            except aiodns.error.DNSError:
+                continue
+            if records:
+                ttl = min(record.ttl for record in records)
+                ttl = max(self.min_ttl, min(self.max_ttl, ttl))
+                return [record.host for record in records], ttl
+        return [], self.negative_ttl
+
+    def _store(self, host: str, addresses: List[str], ttl: float, error: Optional[str]):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        self._entries[host] = (addresses, time.monotonic() + ttl, error)
+        self._entries.move_to_end(host)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self._hits + self._negative_hits + self._misses + self._coalesced
+        return {
+            "resolver": "aiodns" if aiodns is not None else "system",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self._hits,
+            "negative_hits": self._negative_hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "evictions": self._evictions,
+            "errors": self._errors,
+            "hit_rate": round((self._hits + self._negative_hits + self._coalesced) / lookups * 100, 2) if lookups else 0,
+            "avg_resolve_time_ms": round(self._resolve_time_total / self._misses * 1000, 2) if self._misses else 0
+        }
+
+
+class CachedDNSNetworkBackend(httpcore.AsyncNetworkBackend):
+    """先通过DNS缓存解析域名，再由原网络后端按IP建立TCP连接"""
+
+    def __init__(self, cache: AsyncDNSCache, backend: httpcore.AsyncNetworkBackend):
+        self._cache = cache
+        self._backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        started = time.perf_counter()
+        try:
+            addresses = await asyncio.wait_for(self._cache.resolve(host), timeout)
+        except asyncio.TimeoutError:
+            raise httpcore.ConnectTimeout(f"DNS解析超时: {host}")
+        finally:
+            timer = probe_timer_var.get()
+            if timer is not None:
+                timer.add_dns_time(time.perf_counter() - started)
+
+        last_error = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout,
+                    local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        raise last_error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class CachedDNSTransport(httpx.AsyncHTTPTransport):
+    """连接池使用DNS缓存网络后端的httpx传输层（直连，不支持代理）"""
+
+    def __init__(self, cache: AsyncDNSCache, verify=True, http1: bool = True, http2: bool = False,
+                 limits: httpx.Limits = httpx.Limits(), retries: int = 0):
+        super().__init__(verify=verify, http1=http1, http2=http2, limits=limits, retries=retries)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(verify=verify),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=http1,
+            http2=http2,
+            retries=retries,
+            network_backend=CachedDNSNetworkBackend(cache, httpcore.AnyIOBackend())
+        )
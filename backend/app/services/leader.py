@@ -0,0 +1,261 @@
+"""
+基于数据库租约的选主
+"""
+import asyncio
+import functools
+import logging
+import os
+import secrets
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from sqlalchemy import insert, update, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db_session, run_in_db_thread
+from app.models.scheduler_lease import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+_leases = SchedulerLease.__table__
+
+
+@functools.lru_cache(maxsize=None)
+def default_node_id() -> str:
+    """
+    节点标识：(NODE_ID或主机名):进程号:随机后缀
+
+    NODE_ID 只作为前缀，同一配置下的多个uvicorn工作进程和副本必须得到不同的标识，
+    否则会把其他进程持有的租约当成自己的；容器内进程号可能相同，再加随机后缀区分。
+    进程内只生成一次，选主和分片调度使用同一标识。
+    """
+    return f"{settings.NODE_ID or socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+
+class LeaderElector:
+    """
+    数据库租约选主
+
+    scheduler_leases 表中每个租约一行，持有者每 renew_interval 秒把版本号加1续约。
+    其他节点观察到版本号连续 lease_seconds 秒（按本机单调时钟）没有变化，才用
+    “版本号等于观察值”为条件抢占，同一时刻只会有一个节点抢占成功。
+    判断过期只依赖各节点自己的时钟计时，不比较不同机器的时间，不受时钟偏差影响。
+
+    续约最多等待 renew_interval 秒，主节点续约失败（数据库不可用）超过
+    lease_seconds - 2 * renew_interval 秒会主动让出，保证在其他节点可能接管之前停止调度；
+    续约时发现租约已被接管也立即让出。
+    正常关闭时释放租约，其他节点在下一次检查时即可接管。
+    """
+
+    def __init__(self, name: str, lease_seconds: int, renew_interval: int, node_id: Optional[str] = None):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.renew_interval = min(renew_interval, max(1, lease_seconds // 3))
+        self.node_id = node_id or default_node_id()
+
+        self._on_elected: Optional[Callable[[], Awaitable[None]]] = None
+        self._on_demoted: Optional[Callable[[], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._is_leader = False
+        self._version = 0
+
+        # 观察到的租约状态（跟随者用于判断过期）
+        self._observed: Optional[tuple] = None
+        self._observed_at = 0.0
+        self._holder: Optional[str] = None
+
+        # 最近一次成功续约开始的时间（主节点用于判断是否需要让出）
+        self._renew_started_at = 0.0
+
+        self._elected_count = 0
+        self._demoted_count = 0
+        self._leader_since: Optional[datetime] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    def start(self, on_elected: Callable[[], Awaitable[None]], on_demoted: Callable[[], Awaitable[None]]):
+        """启动选主任务，当选时调用 on_elected，失去主节点身份时调用 on_demoted"""
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"选主已启动: {self.name}, 节点: {self.node_id}, 租约: {self.lease_seconds}秒")
+
+    async def _run(self):
+        while True:
+            try:
+                if self._is_leader:
+                    await self._renew()
+                else:
+                    await self._try_acquire()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"选主检查失败: {str(e)}")
+                if self._is_leader and time.monotonic() - self._renew_started_at >= self.lease_seconds - 2 * self.renew_interval:
+                    logger.error(f"租约 {self.name} 续约失败时间过长，主动让出")
+                    await self._demote()
+            await asyncio.sleep(self.renew_interval)
+
+    async def _try_acquire(self):
+        """跟随者：租约空闲、已释放或长时间未续约时尝试抢占"""
+        started = time.monotonic()
+        row = await run_in_db_thread(self._read_lease)
+        if row is None:
+            acquired = await run_in_db_thread(self._insert_lease)
+        else:
+            holder, version = row
+            self._holder = holder
+            if (holder, version) != self._observed:
+                self._observed = (holder, version)
+                self._observed_at = started
+            expired = started - self._observed_at >= self.lease_seconds
+            if holder and holder != self.node_id and not expired:
+                return
+            acquired = await run_in_db_thread(self._take_over, version)
+
+        if acquired:
+            self._renew_started_at = started
+            self._version = acquired
+            self._is_leader = True
+            self._holder = self.node_id
+            self._elected_count += 1
+            self._leader_since = datetime.now()
+            logger.info(f"节点 {self.node_id} 成为 {self.name} 主节点")
+            try:
+                await self._on_elected()
+            except Exception as e:
+                logger.error(f"主节点启动失败，释放租约: {str(e)}")
+                await self._demote()
+                await run_in_db_thread(self._release_lease)
+
+    async def _renew(self):
+        """主节点：续约，发现租约已被接管时让出"""
+        started = time.monotonic()
+        version = await asyncio.wait_for(
+            run_in_db_thread(self._renew_lease, self._version), timeout=self.renew_interval
+        )
+        if version:
+            self._version = version
+            self._renew_started_at = started
+            return
+        logger.warning(f"租约 {self.name} 已被其他节点接管，节点 {self.node_id} 让出")
+        await self._demote()
+
+    async def _demote(self):
+        if not self._is_leader:
+            return
+        self._is_leader = False
+        self._observed = None
+        self._demoted_count += 1
+        self._leader_since = None
+        try:
+            await self._on_demoted()
+        except Exception as e:
+            logger.error(f"主节点停止调度失败: {str(e)}")
+
+    async def stop(self):
+        """停止选主，是主节点时先停止调度再释放租约"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._is_leader:
+            await self._demote()
+            try:
+                await run_in_db_thread(self._release_lease)
+                logger.info(f"已释放租约: {self.name}")
+            except Exception as e:
+                logger.error(f"释放租约失败: {str(e)}")
+
+    def _lease_values(self, version: int) -> Dict[str, Any]:
+        now = datetime.now()
+        return {
+            "holder": self.node_id,
+            "version": version,
+            "renewed_at": now,
+            "expires_at": now + timedelta(seconds=self.lease_seconds)
+        }
+
+    def _read_lease(self) -> Optional[tuple]:
+        with get_db_session() as db:
+            row = db.execute(
+                select(_leases.c.holder, _leases.c.version).where(_leases.c.name == self.name)
+            ).first()
+            return tuple(row) if row else None
+
+    def _insert_lease(self) -> int:
+        """租约行不存在时创建，主键冲突说明其他节点先创建了"""
+        values = self._lease_values(1)
+        db = SessionLocal()
+        try:
+            db.execute(insert(SchedulerLease).values(name=self.name, acquired_at=values["renewed_at"], **values))
+            db.commit()
+            return 1
+        except IntegrityError:
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+    def _take_over(self, observed_version: int) -> int:
+        """以观察到的版本号为条件抢占，返回新版本号，失败返回0"""
+        version = observed_version + 1
+        values = self._lease_values(version)
+        with get_db_session() as db:
+            result = db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.version == observed_version)
+                .values(acquired_at=values["renewed_at"], **values)
+            )
+            return version if result.rowcount == 1 else 0
+
+    def _renew_lease(self, current_version: int) -> int:
+        """续约，返回新版本号；租约已不属于本节点时返回0"""
+        version = current_version + 1
+        with get_db_session() as db:
+            result = db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.node_id,
+                       SchedulerLease.version == current_version)
+                .values(**self._lease_values(version))
+            )
+            return version if result.rowcount == 1 else 0
+
+    def _release_lease(self):
+        with get_db_session() as db:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.node_id)
+                .values(holder=None, version=SchedulerLease.version + 1, expires_at=datetime.now())
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取选主状态"""
+        return {
+            "name": self.name,
+            "node_id": self.node_id,
+            "is_leader": self._is_leader,
+            "leader": self._holder,
+            "leader_since": self._leader_since.isoformat() if self._leader_since else None,
+            "lease_seconds": self.lease_seconds,
+            "renew_interval": self.renew_interval,
+            "elected_count": self._elected_count,
+            "demoted_count": self._demoted_count
+        }
+
+
+# 创建全局调度器选主实例
+scheduler_leader = LeaderElector(
+    name="scheduler",
+    lease_seconds=settings.LEADER_LEASE_SECONDS,
+    renew_interval=settings.LEADER_RENEW_INTERVAL
+)
@@ -0,0 +1,82 @@
+"""
+事件循环延迟监控
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监控
+
+    按固定间隔 sleep，实际唤醒时间与预期时间的差值即为事件循环被阻塞的时长。
+    探测计时、调度触发都依赖事件循环，延迟持续偏高说明有同步调用（如数据库）阻塞了循环。
+    保留最近 window 个采样计算分位数。
+    """
+
+    def __init__(self, interval_ms: int, window: int = 600, warn_ms: float = 100.0):
+        self.interval = interval_ms / 1000
+        self.warn_ms = warn_ms
+        self._samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self._max = 0.0
+        self._slow = 0
+
+    def start(self):
+        """启动采样任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"事件循环延迟监控已启动，采样间隔: {self.interval * 1000:.0f}ms")
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            self._samples.append(lag_ms)
+            self._max = max(self._max, lag_ms)
+            if lag_ms >= self.warn_ms:
+                self._slow += 1
+                logger.warning(f"事件循环阻塞 {lag_ms:.1f}ms")
+
+    async def stop(self):
+        """停止采样任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取事件循环延迟统计（毫秒）"""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"running": self._task is not None, "samples": 0}
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+        return {
+            "running": self._task is not None,
+            "samples": len(samples),
+            "last_ms": round(self._samples[-1], 2),
+            "avg_ms": round(sum(samples) / len(samples), 2),
+            "p50_ms": percentile(0.5),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1], 2),
+            "max_since_start_ms": round(self._max, 2),
+            "slow_count": self._slow
+        }
+
+
+# 创建全局事件循环延迟监控实例
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_MS)
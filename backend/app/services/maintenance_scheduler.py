@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from typing import Dict, Any
 
 from app.services.data_cleanup import data_cleanup_service
+from app.services.rollup import rollup_service
 from apscheduler.executors.asyncio import AsyncIOExecutor
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -46,11 +47,14 @@ class MaintenanceScheduler:
             "cleanup_retention_days": 90,
             "cleanup_schedule": "0 2 * * 0",  # 每周日凌晨2点
             "partition_enabled": True,
-            "partition_schedule": "0 1 1 * *",  # 每月1号凌晨1点
+            "partition_schedule": "0 1 * * *",  # 每天凌晨1点提前创建按天分区
             "optimize_enabled": True,
             "optimize_schedule": "0 3 1 * *",  # 每月1号凌晨3点
+            "rollup_enabled": True,
+            "rollup_schedule": "30 0 * * *",  # 每天凌晨0点30分重建前一天的统计汇总
         }
         self._task_status = {}  # 记录任务执行状态
+        self._backfill_task = None
     
     async def start(self):
         """启动调度器"""
@@ -77,7 +81,7 @@ class MaintenanceScheduler:
                     self._create_monthly_partition,
                     CronTrigger.from_crontab(self.maintenance_config["partition_schedule"]),
                     id="create_monthly_partition",
-                    name="创建月度分区",
+                    name="创建日志分区",
                     max_instances=1,
                     coalesce=True
                 )
@@ -95,6 +99,18 @@ class MaintenanceScheduler:
                 )
                 logger.info(f"已添加表优化任务，调度: {self.maintenance_config['optimize_schedule']}")
             
+            # 添加统计汇总重建任务
+            if self.maintenance_config["rollup_enabled"]:
+                self.scheduler.add_job(
+                    self._rebuild_rollups,
+                    CronTrigger.from_crontab(self.maintenance_config["rollup_schedule"]),
+                    id="rebuild_rollups",
+                    name="重建统计汇总",
+                    max_instances=1,
+                    coalesce=True
+                )
+                logger.info(f"已添加统计汇总重建任务，调度: {self.maintenance_config['rollup_schedule']}")
+            
             # 添加健康检查任务（每小时执行一次）
             self.scheduler.add_job(
                 self._health_check,
@@ -119,6 +135,10 @@ class MaintenanceScheduler:
             self.is_running = True
             logger.info("维护调度器启动成功")
             
+            # 汇总表新建前已有的日志在后台回填，不阻塞启动
+            if rollup_service.enabled:
+                self._backfill_task = asyncio.create_task(self._backfill_rollups())
+            
         except Exception as e:
             logger.error(f"启动维护调度器失败: {str(e)}")
             raise
@@ -130,6 +150,8 @@ class MaintenanceScheduler:
         
         try:
             self.scheduler.shutdown(wait=True)
+            # 清空任务，失去主节点身份后重新当选时可再次启动
+            self.scheduler.remove_all_jobs()
             self.is_running = False
             logger.info("维护调度器已停止")
         except Exception as e:
@@ -151,7 +173,7 @@ class MaintenanceScheduler:
             
             logger.info(f"数据清理任务完成: {result['message']}")
             
-            # 如果删除了大量数据，执行表优化
+            # 逐行删除了大量数据时执行表优化（deleted_count 不含整分区删除的行，删除分区不产生碎片）
             if result["deleted_count"] > 10000:
                 logger.info("删除了大量数据，执行表优化")
                 await self._optimize_tables()
@@ -172,19 +194,74 @@ class MaintenanceScheduler:
                 "error": str(e)
             }
     
+    async def _rebuild_rollups(self, days: int = 1):
+        """从原始日志重建最近几个完整日期的统计汇总，并清理过期汇总"""
+        task_id = "rebuild_rollups"
+        self._task_status[task_id] = {"status": "running", "start_time": datetime.now()}
+        
+        try:
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            loop = asyncio.get_event_loop()
+            result = await loop.run_in_executor(None, rollup_service.rebuild, today - timedelta(days=days), today)
+            result["purged"] = await loop.run_in_executor(None, rollup_service.purge_expired)
+            
+            logger.info(f"统计汇总重建任务完成: {result}")
+            self._task_status[task_id] = {
+                "status": "completed",
+                "start_time": self._task_status[task_id]["start_time"],
+                "end_time": datetime.now(),
+                "result": result
+            }
+            return result
+            
+        except Exception as e:
+            logger.error(f"统计汇总重建任务失败: {str(e)}")
+            self._task_status[task_id] = {
+                "status": "failed",
+                "start_time": self._task_status[task_id]["start_time"],
+                "end_time": datetime.now(),
+                "error": str(e)
+            }
+            raise
+    
+    async def _backfill_rollups(self):
+        """回填汇总表新建之前的历史日志（没有回填任务时直接结束）"""
+        task_id = "backfill_rollups"
+        start_time = datetime.now()
+        
+        try:
+            # 停止调度器（失去主节点身份）后回填在当前这天处理完时停止，新的主节点从记录的进度继续
+            result = await asyncio.get_event_loop().run_in_executor(
+                None, rollup_service.backfill, lambda: not self.is_running
+            )
+            if result is not None:
+                self._task_status[task_id] = {
+                    "status": "completed",
+                    "start_time": start_time,
+                    "end_time": datetime.now(),
+                    "result": result
+                }
+        except Exception as e:
+            logger.error(f"统计汇总回填任务失败: {str(e)}")
+            self._task_status[task_id] = {
+                "status": "failed",
+                "start_time": start_time,
+                "end_time": datetime.now(),
+                "error": str(e)
+            }
+    
     async def _create_monthly_partition(self):
-        """创建月度分区任务"""
+        """提前创建日志分区任务（任务ID沿用月度分区时的名称）"""
         task_id = "create_monthly_partition"
         self._task_status[task_id] = {"status": "running", "start_time": datetime.now()}
         
         try:
             logger.info("开始执行分区创建任务")
             
-            # 为下个月创建分区
-            next_month = datetime.now().replace(day=1) + timedelta(days=32)
-            next_month = next_month.replace(day=1)
-            
-            result = data_cleanup_service.create_partition_if_needed(next_month)
+            # 补齐未来几天的按天分区
+            result = await asyncio.get_event_loop().run_in_executor(
+                None, data_cleanup_service.create_partition_if_needed
+            )
             
             logger.info(f"分区创建任务完成: {result['message']}")
             
@@ -296,9 +373,6 @@ class MaintenanceScheduler:
             if pool_status["overflow"] > 0:
                 logger.warning(f"数据库连接池溢出连接数: {pool_status['overflow']}")
             
-            if pool_status["invalid"] > 0:
-                logger.warning(f"数据库连接池无效连接数: {pool_status['invalid']}")
-            
             self._task_status["monitor_database_pool"] = {
                 "status": "completed",
                 "last_run": datetime.now(),
@@ -375,6 +449,8 @@ class MaintenanceScheduler:
                 await self._create_monthly_partition()
             elif job_id == "optimize_tables":
                 await self._optimize_tables()
+            elif job_id == "rebuild_rollups":
+                await self._rebuild_rollups()
             elif job_id == "health_check":
                 await self._health_check()
             elif job_id == "monitor_database_pool":
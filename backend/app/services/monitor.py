@@ -2,48 +2,500 @@
 服务监控核心逻辑 - 优化版本
 """
 import asyncio
+import itertools
+import re
 import time
 import logging
+from collections import deque
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable
 import httpx
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db_sync, get_db_session
+from app.core.config import settings
+from app.core.database import get_db_sync, get_db_session, run_in_db_thread
 from app.models.service import MonitorService as ServiceModel
 from app.models.monitor_log import MonitorLog
 from app.services.alert import alert_service
+from app.services.dns_cache import AsyncDNSCache, CachedDNSTransport, probe_timer_var
+from app.services.result_sink import result_sink, ResultSink
+from app.services.rollup import rollup_service
 
 logger = logging.getLogger(__name__)
 
 
+# 探测优先级，数值越小越先执行；探测积压时低优先级先被延后或丢弃
+PRIORITY_CLASSES = {"critical": 0, "normal": 1, "low": 2}
+
+
+class ProbeDispatcher:
+    """
+    探测调度器
+
+    所有探测统一经过这里排队执行：全局并发上限保证不超过HTTP连接池容量，
+    按源站(scheme://host:port)的并发上限避免同一网关被打满，待执行队列按
+    优先级分为几个FIFO队列，出队取最高优先级非空队列的队首，同优先级内保持FIFO。
+    探测只在占用执行槽期间发出网络请求，入库和告警在释放执行槽之后进行。
+
+    按服务记录已提交未结束的探测数，上一次探测还没结束（目标响应慢）时又到期的探测
+    按 overlap_policy 处理：skip 跳过；queue_one 最多暂存一次，上一次结束后再提交，
+    其余跳过；allow_n 同一服务最多同时 max_per_service 个，超出跳过。跳过次数按服务统计。
+
+    优先级取自服务的 priority 字段（critical/normal/low）。积压时低优先级的探测排在后面；
+    待执行任务超过队列容量的 shed_low_ratio 时直接丢弃新的 low 探测；队列满时新探测
+    挤掉最低优先级队列队尾（最后入队）的更低优先级探测，没有可挤掉的才拒绝，
+    持续过载时每次挤掉都是O(1)。丢弃数按优先级统计。
+    """
+
+    OVERLAP_POLICIES = ("skip", "queue_one", "allow_n")
+
+    def __init__(self, monitor: "MonitorService", max_concurrency: int,
+                 per_origin_limit: int, max_queue_size: int, http2_per_origin_limit: int = None,
+                 overlap_policy: str = "skip", max_per_service: int = 1, shed_low_ratio: float = 1.0):
+        self._monitor = monitor
+        self.max_concurrency = max_concurrency
+        self.per_origin_limit = per_origin_limit
+        self.http2_per_origin_limit = http2_per_origin_limit or per_origin_limit
+        self.max_queue_size = max_queue_size
+        if overlap_policy not in self.OVERLAP_POLICIES:
+            logger.warning(f"未知的探测重叠策略: {overlap_policy}，使用 skip")
+            overlap_policy = "skip"
+        self.overlap_policy = overlap_policy
+        self.max_per_service = max(1, max_per_service) if overlap_policy == "allow_n" else 1
+        self.shed_low_ratio = shed_low_ratio
+
+        self._seq = itertools.count()
+        self._pending: Dict[int, deque] = {priority: deque() for priority in sorted(PRIORITY_CLASSES.values())}  # 优先级 -> 按入队顺序的任务
+        self._pending_count = 0
+        self._parked: Dict[str, deque] = {}  # 源站并发已满时暂存的任务
+        self._parked_count = 0
+        self._origin_active: Dict[str, int] = {}
+        self._active = 0
+        self._tasks = set()
+        self._closed = False
+        # 结果处理函数，默认由MonitorService.process_result入库并告警
+        self.result_handler = None
+        self._service_in_flight: Dict[Any, int] = {}  # 服务ID -> 已提交未结束的探测数
+        self._deferred: Dict[Any, tuple] = {}  # queue_one: 服务ID -> 等上次结束后提交的 (服务, 优先级)
+        self._skipped_by_service: Dict[Any, int] = {}
+        self._queued_by_class = {name: 0 for name in PRIORITY_CLASSES}
+        self._shed_by_class = {name: 0 for name in PRIORITY_CLASSES}
+        self._wait_by_class = {name: [0, 0.0, 0.0] for name in PRIORITY_CLASSES}  # [执行数, 总等待, 最大等待]
+
+        # 统计信息
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._skipped = 0
+        self._deferred_total = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_last = 0.0
+
+    @staticmethod
+    def origin_of(url: str) -> str:
+        """获取URL的源站标识"""
+        try:
+            parsed = httpx.URL(url)
+            port = parsed.port or (443 if parsed.scheme == "https" else 80)
+            return f"{parsed.scheme}://{parsed.host}:{port}"
+        except Exception:
+            return url or ""
+
+    @staticmethod
+    def priority_class_of(service) -> str:
+        """服务的探测优先级，未设置或无效时为normal"""
+        priority = getattr(service, 'priority', None)
+        return priority if priority in PRIORITY_CLASSES else "normal"
+
+    def submit(self, service: ServiceModel) -> bool:
+        """提交探测任务，队列积压时按优先级丢弃并返回False"""
+        if self._closed:
+            return False
+
+        service_id = getattr(service, 'id', None)
+        if self._service_in_flight.get(service_id, 0) >= self.max_per_service:
+            if self.overlap_policy == "queue_one" and service_id not in self._deferred:
+                self._deferred[service_id] = service
+                self._deferred_total += 1
+                return True
+            self._skipped += 1
+            self._skipped_by_service[service_id] = self._skipped_by_service.get(service_id, 0) + 1
+            logger.debug(f"服务上次探测尚未结束，跳过本次探测: service_id={service_id}")
+            return False
+
+        priority_class = self.priority_class_of(service)
+        priority = PRIORITY_CLASSES[priority_class]
+        if priority_class == "low" and self.queue_depth >= self.max_queue_size * self.shed_low_ratio:
+            self._shed(priority_class, service_id)
+            return False
+        if self.queue_depth >= self.max_queue_size and not self._evict_lower(priority):
+            self._shed(priority_class, service_id)
+            return False
+
+        origin = self.origin_of(getattr(service, 'url', ''))
+        if getattr(service, 'http2', False):
+            # HTTP/2探测使用独立连接池，同源站请求复用连接，允许更高的并发流数
+            origin = f"h2+{origin}"
+            origin_limit = self.http2_per_origin_limit
+        else:
+            origin_limit = self.per_origin_limit
+        
+        item = {
+            "service": service,
+            "origin": origin,
+            "origin_limit": origin_limit,
+            "priority": priority,
+            "priority_class": priority_class,
+            "seq": next(self._seq),
+            "enqueued_at": time.monotonic()
+        }
+        self._pending[priority].append(item)
+        self._pending_count += 1
+        self._service_in_flight[service_id] = self._service_in_flight.get(service_id, 0) + 1
+        self._queued_by_class[priority_class] += 1
+        self._submitted += 1
+        self._pump()
+        return True
+
+    def _shed(self, priority_class: str, service_id):
+        self._rejected += 1
+        self._shed_by_class[priority_class] += 1
+        # 积压时丢弃量可能很大，每类每100次记录一次
+        if self._shed_by_class[priority_class] % 100 == 1:
+            logger.warning(f"探测队列积压({self.queue_depth}/{self.max_queue_size})，丢弃{priority_class}探测: "
+                           f"service_id={service_id}，该优先级累计丢弃 {self._shed_by_class[priority_class]} 次")
+
+    def _evict_lower(self, priority: int) -> bool:
+        """队列已满时挤掉待执行队列中最低优先级里最后入队的任务（须低于新任务的优先级），返回是否腾出了位置"""
+        lowest = next((level for level in reversed(self._pending) if self._pending[level]), None)
+        if lowest is None or lowest <= priority:
+            return False
+        item = self._pending[lowest].pop()
+        self._pending_count -= 1
+        self._queued_by_class[item["priority_class"]] -= 1
+        self._shed(item["priority_class"], getattr(item["service"], 'id', None))
+        self._finish_service(item["service"], resubmit=False)
+        return True
+
+    def _pump(self):
+        """在执行槽可用时按优先级启动任务"""
+        while self._active < self.max_concurrency and self._pending_count:
+            item = next(queue for queue in self._pending.values() if queue).popleft()
+            self._pending_count -= 1
+            origin = item["origin"]
+            if self._origin_active.get(origin, 0) >= item["origin_limit"]:
+                # 源站并发已满，暂存到该源站的等待队列，释放槽位时再放回
+                self._parked.setdefault(origin, deque()).append(item)
+                self._parked_count += 1
+                continue
+            self._start(item)
+
+    def _start(self, item: Dict[str, Any]):
+        """占用执行槽并启动探测"""
+        origin = item["origin"]
+        self._active += 1
+        self._origin_active[origin] = self._origin_active.get(origin, 0) + 1
+
+        wait_time = time.monotonic() - item["enqueued_at"]
+        self._wait_total += wait_time
+        self._wait_last = wait_time
+        self._wait_max = max(self._wait_max, wait_time)
+        self._queued_by_class[item["priority_class"]] -= 1
+        class_wait = self._wait_by_class[item["priority_class"]]
+        class_wait[0] += 1
+        class_wait[1] += wait_time
+        class_wait[2] = max(class_wait[2], wait_time)
+
+        task = asyncio.create_task(self._run(item))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _release(self, origin: str):
+        """释放执行槽，并将该源站暂存的一个任务放回待执行队列"""
+        self._active -= 1
+        remaining = self._origin_active.get(origin, 1) - 1
+        if remaining > 0:
+            self._origin_active[origin] = remaining
+        else:
+            self._origin_active.pop(origin, None)
+
+        parked = self._parked.get(origin)
+        if parked:
+            item = parked.popleft()
+            self._parked_count -= 1
+            if not parked:
+                del self._parked[origin]
+            self._requeue(item)
+
+        self._pump()
+
+    def _requeue(self, item: Dict[str, Any]):
+        """源站暂存的任务放回所属优先级队列，按入队顺序插入（通常在队首附近）"""
+        queue = self._pending[item["priority"]]
+        index = 0
+        while index < len(queue) and queue[index]["seq"] < item["seq"]:
+            index += 1
+        queue.insert(index, item)
+        self._pending_count += 1
+
+    async def _run(self, item: Dict[str, Any]):
+        """执行探测，释放执行槽后再处理结果"""
+        service = item["service"]
+        released = False
+        try:
+            result = await self._monitor.check_service(service)
+            self._release(item["origin"])
+            self._finish_service(service)
+            released = True
+            await (self.result_handler or self._monitor.process_result)(service, result)
+        except Exception as e:
+            logger.error(f"探测任务执行失败 (service_id: {getattr(service, 'id', 0)}): {str(e)}")
+        finally:
+            if not released:
+                self._release(item["origin"])
+                self._finish_service(service)
+            self._completed += 1
+
+    def _finish_service(self, service, resubmit: bool = True):
+        """服务的一次探测结束，queue_one 策略下提交暂存的下一次探测（被挤掉时一并丢弃）"""
+        service_id = getattr(service, 'id', None)
+        remaining = self._service_in_flight.get(service_id, 1) - 1
+        if remaining > 0:
+            self._service_in_flight[service_id] = remaining
+        else:
+            self._service_in_flight.pop(service_id, None)
+
+        deferred = self._deferred.pop(service_id, None)
+        if deferred is not None and resubmit and not self._closed:
+            self.submit(deferred)
+
+    def skipped_of(self, service_id) -> int:
+        """服务因上次探测未结束被跳过的次数"""
+        return self._skipped_by_service.get(service_id, 0)
+
+    def overlap_snapshot(self) -> Dict[str, Any]:
+        """重叠处理计数（含按服务的跳过次数），多进程工作池据此汇总各工作进程的统计"""
+        return {
+            "services_in_flight": len(self._service_in_flight),
+            "deferred": len(self._deferred),
+            "deferred_total": self._deferred_total,
+            "skipped": self._skipped,
+            "skipped_by_service": dict(self._skipped_by_service)
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        """待执行任务数（含源站等待队列）"""
+        return self._pending_count + self._parked_count
+
+    @property
+    def in_flight(self) -> int:
+        """已提交未完成的任务数（待执行+执行中）"""
+        return self.queue_depth + self._active
+
+    async def close(self, timeout: float = 10.0):
+        """停止接收新任务，丢弃未执行任务并等待执行中的任务结束"""
+        self._closed = True
+        for queue in self._pending.values():
+            queue.clear()
+        self._pending_count = 0
+        self._parked.clear()
+        self._parked_count = 0
+        self._deferred.clear()
+        self._queued_by_class = {name: 0 for name in PRIORITY_CLASSES}
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    def running_by_origin(self) -> Dict[str, int]:
+        """各源站执行中的探测数"""
+        return dict(self._origin_active)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度器统计信息"""
+        started = self._completed + self._active
+        return {
+            "max_concurrency": self.max_concurrency,
+            "per_origin_limit": self.per_origin_limit,
+            "http2_per_origin_limit": self.http2_per_origin_limit,
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.max_queue_size,
+            "origin_waiting": self._parked_count,
+            "running": self._active,
+            "busy_origins": len(self._origin_active),
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "overlap": {
+                "policy": self.overlap_policy,
+                "max_per_service": self.max_per_service,
+                "services_in_flight": len(self._service_in_flight),
+                "deferred": len(self._deferred),
+                "deferred_total": self._deferred_total,
+                "skipped": self._skipped,
+                "top_skipped": sorted(self._skipped_by_service.items(), key=lambda item: item[1], reverse=True)[:10]
+            },
+            "priority_classes": {
+                name: {
+                    "queued": self._queued_by_class[name],
+                    "shed": self._shed_by_class[name],
+                    "started": self._wait_by_class[name][0],
+                    "wait_avg_ms": round(self._wait_by_class[name][1] / self._wait_by_class[name][0] * 1000, 2)
+                    if self._wait_by_class[name][0] else 0,
+                    "wait_max_ms": round(self._wait_by_class[name][2] * 1000, 2)
+                }
+                for name in PRIORITY_CLASSES
+            },
+            "shed_low_ratio": self.shed_low_ratio,
+            "wait_time_ms": {
+                "last": round(self._wait_last * 1000, 2),
+                "avg": round(self._wait_total / started * 1000, 2) if started else 0,
+                "max": round(self._wait_max * 1000, 2)
+            }
+        }
+
+
+class ProbeTimer:
+    """
+    单次探测的分阶段计时器
+
+    作为httpcore的trace扩展挂到请求上，使用单调时钟记录连接建立、TLS握手、
+    首字节时间(TTFB)和响应体下载耗时；DNS解析耗时由DNS缓存的网络后端回填。
+    发生重定向时连接/握手耗时累加，TTFB和下载耗时以最后一跳为准。
+    复用已有连接时不会产生DNS、连接和握手阶段。
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.dns_time = None
+        self.connect_time = None
+        self.tls_time = None
+        self._phase_started: Dict[str, float] = {}
+        self._request_sent_at = None
+        self._headers_received_at = None
+        self._body_completed_at = None
+
+    async def trace(self, event_name: str, info: Dict[str, Any]):
+        """httpcore trace回调，事件名形如 connection.connect_tcp.started"""
+        now = time.perf_counter()
+        phase, _, stage = event_name.partition(".")[2].rpartition(".")
+
+        if stage == "started":
+            self._phase_started[phase] = now
+            if phase == "send_request_headers":
+                self._request_sent_at = now
+                self._headers_received_at = None
+            return
+
+        started = self._phase_started.pop(phase, None)
+        if started is None:
+            return
+        if phase == "connect_tcp":
+            self.connect_time = (self.connect_time or 0.0) + (now - started)
+        elif phase == "start_tls":
+            self.tls_time = (self.tls_time or 0.0) + (now - started)
+        elif phase == "receive_response_headers" and stage == "complete":
+            self._headers_received_at = now
+
+    def add_dns_time(self, seconds: float):
+        """累加DNS解析耗时（解析发生在connect_tcp阶段内）"""
+        self.dns_time = (self.dns_time or 0.0) + seconds
+
+    def mark_body_complete(self):
+        """响应体读取结束"""
+        self._body_completed_at = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        """从开始探测到现在的耗时（毫秒）"""
+        end = self._body_completed_at or time.perf_counter()
+        return (end - self.started_at) * 1000
+
+    @staticmethod
+    def _ms(seconds: Optional[float]) -> Optional[float]:
+        return round(seconds * 1000, 2) if seconds is not None else None
+
+    def as_result(self) -> Dict[str, Any]:
+        """转换为监控日志字段（毫秒），未经历的阶段为None"""
+        ttfb = None
+        download = None
+        if self._request_sent_at is not None and self._headers_received_at is not None:
+            ttfb = self._headers_received_at - self._request_sent_at
+            if self._body_completed_at is not None:
+                download = self._body_completed_at - self._headers_received_at
+        connect = self.connect_time
+        if connect is not None and self.dns_time is not None:
+            # connect_tcp阶段包含了DNS解析，扣除后为纯TCP连接耗时
+            connect = max(connect - self.dns_time, 0.0)
+        return {
+            "dns_time": self._ms(self.dns_time),
+            "connect_time": self._ms(connect),
+            "tls_time": self._ms(self.tls_time),
+            "ttfb_time": self._ms(ttfb),
+            "download_time": self._ms(download)
+        }
+
+
 class MonitorService:
     """监控服务类"""
     
     def __init__(self):
         # 优化HTTP客户端配置，添加连接限制
+        self._limits = httpx.Limits(
+            max_keepalive_connections=20,  # 最大保持连接数
+            max_connections=settings.PROBE_MAX_CONCURRENCY,  # 最大连接数，与探测并发上限一致，避免在连接池内排队
+            keepalive_expiry=30.0         # 连接保持时间
+        )
+        # 探测共享的DNS缓存，避免每次探测都经线程池调用系统解析器
+        self.dns_cache = AsyncDNSCache(
+            max_size=settings.DNS_CACHE_MAX_SIZE,
+            min_ttl=settings.DNS_CACHE_MIN_TTL,
+            max_ttl=settings.DNS_CACHE_MAX_TTL,
+            default_ttl=settings.DNS_CACHE_DEFAULT_TTL,
+            negative_ttl=settings.DNS_CACHE_NEGATIVE_TTL
+        )
+        # 添加重试配置
+        transport = self._make_transport(
+            retries=2,
+            verify=False,  # 在生产环境中根据需要调整
+            limits=self._limits
+        )
+        self._transport = transport
+        
+        # HTTP/2客户端在首次有服务启用HTTP/2时创建
+        self.http2_client = None
+        self._http2_transport = None
+        self._http2_unavailable = False
+        
         self.client = httpx.AsyncClient(
             timeout=httpx.Timeout(30.0),
             follow_redirects=True,
-            limits=httpx.Limits(
-                max_keepalive_connections=20,  # 最大保持连接数
-                max_connections=100,           # 最大连接数
-                keepalive_expiry=30.0         # 连接保持时间
-            ),
-            # 添加重试配置
-            transport=httpx.AsyncHTTPTransport(
-                retries=2,
-                verify=False  # 在生产环境中根据需要调整
-            )
+            limits=self._limits,
+            transport=transport
         )
         self._closed = False
+        self.dispatcher = ProbeDispatcher(
+            self,
+            max_concurrency=settings.PROBE_MAX_CONCURRENCY,
+            per_origin_limit=settings.PROBE_PER_ORIGIN_CONCURRENCY,
+            max_queue_size=settings.PROBE_QUEUE_SIZE,
+            http2_per_origin_limit=settings.PROBE_HTTP2_PER_ORIGIN_CONCURRENCY,
+            overlap_policy=settings.PROBE_OVERLAP_POLICY,
+            max_per_service=settings.PROBE_MAX_IN_FLIGHT_PER_SERVICE,
+            shed_low_ratio=settings.PROBE_SHED_LOW_RATIO
+        )
+        # 探测结果监听（同步回调，参数为服务和结果），如调度器据此调整自适应间隔
+        self.result_listeners: List[Callable[[Any, Dict[str, Any]], None]] = []
+        # 持续异常的服务最近一次告警时间（单调时钟），服务恢复后清除
+        self._last_alert_at: Dict[Any, float] = {}
     
     async def check_service(self, service: ServiceModel) -> Dict[str, Any]:
         """检查单个服务状态"""
         if self._closed:
             raise RuntimeError("MonitorService has been closed")
             
-        start_time = time.time()
+        timer = ProbeTimer()
+        timer_token = probe_timer_var.set(timer)
         result = {
             "service_id": getattr(service, 'id', 0),
             "status": "unknown",
@@ -62,22 +514,29 @@ class MonitorService:
             service_url = result["request_url"]
             logger.info(f"开始检查服务: {service_name} ({service_url})")
             
-            # 发送HTTP请求
-            response = await self.client.request(
+            # 发送HTTP请求，流式读取响应体，超过上限即停止读取
+            max_bytes = getattr(service, 'max_response_size', None) or settings.PROBE_MAX_RESPONSE_SIZE
+            client = self._client_for(service)
+            async with client.stream(
                 method=result["request_method"],
                 url=service_url,
-                timeout=min(getattr(service, 'timeout', 30), 30)  # 限制最大超时时间
-            )
+                timeout=min(getattr(service, 'timeout', 30), 30),  # 限制最大超时时间
+                extensions={"trace": timer.trace}
+            ) as response:
+                response_size, body_preview, truncated = await self._read_body(response, max_bytes)
+                timer.mark_body_complete()
             
             # 计算响应时间
-            response_time = (time.time() - start_time) * 1000  # 转换为毫秒
+            response_time = timer.elapsed_ms()  # 毫秒
             
             # 更新结果
             result.update({
                 "status": "success" if response.status_code < 400 else "failed",
                 "response_time": round(response_time, 2),
                 "status_code": response.status_code,
-                "response_size": len(response.content) if response.content else 0
+                "response_size": response_size,
+                "response_truncated": truncated,
+                "response_body": body_preview.decode(response.encoding or "utf-8", errors="replace")
             })
             
             logger.info(f"服务检查完成: {service_name}, 状态码: {response.status_code}, 响应时间: {response_time:.2f}ms")
@@ -110,154 +569,318 @@ class MonitorService:
             })
             logger.error(f"服务检查异常: {service_name}, 错误: {str(e)}")
         
+        finally:
+            probe_timer_var.reset(timer_token)
+        
+        # 分阶段耗时，失败时也保留已完成阶段的数据便于定位
+        result.update(timer.as_result())
         return result
     
-    async def save_monitor_log(self, result: Dict[str, Any]) -> Optional[MonitorLog]:
-        """保存监控日志"""
+    def _make_transport(self, **kwargs) -> httpx.AsyncHTTPTransport:
+        """创建探测传输层，启用DNS缓存时连接池通过缓存解析域名"""
+        if settings.DNS_CACHE_ENABLED:
+            return CachedDNSTransport(self.dns_cache, **kwargs)
+        return httpx.AsyncHTTPTransport(**kwargs)
+    
+    def _client_for(self, service: ServiceModel) -> httpx.AsyncClient:
+        """选择探测使用的客户端，启用HTTP/2的服务使用多路复用客户端"""
+        if getattr(service, 'http2', False) and not self._http2_unavailable:
+            if self.http2_client is None:
+                try:
+                    self._http2_transport = self._make_transport(
+                        http1=True,  # 未协商出HTTP/2（如明文HTTP）时仍可使用HTTP/1.1
+                        http2=True,
+                        retries=2,
+                        verify=False,
+                        limits=self._limits
+                    )
+                except ImportError:
+                    self._http2_unavailable = True
+                    logger.warning("未安装h2，HTTP/2探测不可用，改用HTTP/1.1")
+                    return self.client
+                self.http2_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(30.0),
+                    follow_redirects=True,
+                    transport=self._http2_transport
+                )
+                logger.info("HTTP/2探测客户端已创建")
+            return self.http2_client
+        return self.client
+    
+    @staticmethod
+    async def _read_body(response: httpx.Response, max_bytes: int) -> tuple[int, bytes, bool]:
+        """
+        分块读取响应体，只累计字节数并保留前N个字节
+
+        Returns:
+            (已读取字节数, 响应体前N个字节, 是否因超出上限而截断)
+        """
+        preview_limit = settings.PROBE_RESPONSE_BODY_PREVIEW
+        preview = bytearray()
+        received = 0
+        
+        async for chunk in response.aiter_bytes():
+            if len(preview) < preview_limit:
+                preview.extend(chunk[:preview_limit - len(preview)])
+            received += len(chunk)
+            if received > max_bytes:
+                # 剩余内容不再读取，退出stream上下文时连接会被关闭
+                return max_bytes, bytes(preview), True
+        
+        return received, bytes(preview), False
+    
+    async def save_result(self, result: Dict[str, Any]) -> Optional[MonitorLog]:
+        """一个事务内写入监控日志并更新服务状态（在数据库线程中执行）"""
         try:
-            with get_db_session() as db:  # 使用同步上下文管理器
-                log = MonitorLog(**result)
-                db.add(log)
-                db.flush()  # 刷新以获取ID
-                await asyncio.sleep(0)  # 让出控制权
-                return log
+            return await run_in_db_thread(self._save_result, result)
         except Exception as e:
-            logger.error(f"保存监控日志失败: {str(e)}")
+            logger.error(f"保存检查结果失败: service_id={result.get('service_id')}, 错误: {str(e)}")
             return None
     
-    async def update_service_status(self, service_id: int, status: str, check_time: datetime):
-        """更新服务状态"""
-        try:
-            with get_db_session() as db:
-                service = db.query(ServiceModel).filter(ServiceModel.id == service_id).first()
-                if service:
-                    service.status = status
-                    service.last_check_time = check_time
-                    if status == "success":
-                        service.last_success_time = check_time
-                    await asyncio.sleep(0)  # 让出控制权
-        except Exception as e:
-            logger.error(f"更新服务状态失败: service_id={service_id}, 错误: {str(e)}")
+    @staticmethod
+    def _save_result(result: Dict[str, Any]) -> MonitorLog:
+        row = ResultSink._log_row(result)
+        with get_db_session() as db:
+            log = MonitorLog(**row)
+            db.add(log)
+            
+            # 直接按主键更新服务状态，不再先查询服务对象；
+            # updated_at只反映配置变更（调度器据此增量同步），状态写入时保持原值
+            values = {
+                "status": result["status"],
+                "last_check_time": result["check_time"],
+                "last_response_time": row["response_time"],
+                "last_status_code": row["status_code"],
+                "last_error_message": row["error_message"],
+                "updated_at": ServiceModel.updated_at
+            }
+            if result["status"] == "success":
+                values["last_success_time"] = result["check_time"]
+            db.execute(
+                update(ServiceModel)
+                .where(ServiceModel.id == result["service_id"])
+                .values(**values)
+            )
+            db.flush()  # 刷新以获取ID
+        
+        # 统计汇总在日志提交后单独写入，失败不影响日志，由每日重建任务修正
+        if rollup_service.enabled:
+            try:
+                rollup_service.apply_batch([row])
+            except Exception as e:
+                logger.error(f"累加统计汇总失败: service_id={row['service_id']}, 错误: {str(e)}")
+        return log
     
     async def check_and_alert(self, service: ServiceModel) -> Optional[MonitorLog]:
         """检查服务并处理告警"""
-        # 获取服务的前一个状态（安全访问属性）
-        previous_status = getattr(service, 'status', 'unknown')
-        service_name = getattr(service, 'name', f'service_{getattr(service, "id", "unknown")}')
-        
         # 执行服务检查
         result = await self.check_service(service)
-        current_status = result["status"]
+        return await self.process_result(service, result)
+    
+    async def process_result(self, service: ServiceModel, result: Dict[str, Any]) -> Optional[MonitorLog]:
+        """
+        处理检查结果：判定告警、保存日志和服务状态、发送通知
+
+        告警在入库前判定并直接写入日志行，每次探测只需一个事务（写缓冲模式下随批次写入），
+        入库后不再回查日志更新告警状态。
+        """
+        service_name = getattr(service, 'name', f'service_{getattr(service, "id", "unknown")}')
+        alert_kind = self.decide_alert(service, result["status"])
+        if alert_kind == "alert" and not self._alert_due(service):
+            alert_kind = None
+        if alert_kind:
+            # 告警发送失败只记录日志不抛异常，按已发送记录
+            result["alert_sent"] = True
+            result["alert_methods"] = getattr(service, 'alert_methods', None)
         
-        # 保存监控日志
-        log = await self.save_monitor_log(result)
-        if not log:
-            logger.error(f"保存监控日志失败，跳过后续处理: {service_name}")
-            return None
+        if result["status"] not in ["failed", "timeout"]:
+            self._last_alert_at.pop(getattr(service, 'id', None), None)
         
-        # 更新服务状态
-        await self.update_service_status(
-            getattr(service, 'id', 0), 
-            current_status, 
-            result["check_time"]
-        )
-        
-        # 处理告警和恢复通知
-        enable_alert = getattr(service, 'enable_alert', False)
-        if enable_alert:
+        # 更新内存中的状态，调度器注册表中的探测目标下次判定告警时直接使用
+        service.status = result["status"]
+        service.last_check_time = result["check_time"]
+        for listener in self.result_listeners:
             try:
-                alert_sent = False
-                alert_methods = getattr(service, 'alert_methods', [])
-                
-                # 检查是否需要发送恢复通知
-                if (previous_status in ["failed", "timeout"] and current_status == "success"):
-                    # 服务从异常状态恢复到正常状态，发送恢复通知
-                    await alert_service.send_recovery_alert(service, result)
-                    alert_sent = True
-                    logger.info(f"服务恢复通知已发送: {service_name}")
-                
-                # 检查是否需要发送告警
-                elif current_status in ["failed", "timeout"]:
-                    # 服务异常，发送告警
-                    await alert_service.send_alert(service, result)
-                    alert_sent = True
-                    logger.info(f"服务告警已发送: {service_name}")
-                
-                # 更新告警状态
-                if alert_sent and log:
-                    try:
-                        with get_db_session() as db:
-                            # 重新获取log对象以避免会话问题
-                            log_to_update = db.query(MonitorLog).filter(MonitorLog.id == log.id).first()
-                            if log_to_update:
-                                log_to_update.alert_sent = True
-                                log_to_update.alert_methods = alert_methods
-                    except Exception as e:
-                        logger.error(f"更新告警状态失败: {str(e)}")
-                         
+                listener(service, result)
             except Exception as e:
-                logger.error(f"发送告警/恢复通知失败: {service_name}, 错误: {str(e)}")
+                logger.error(f"探测结果监听处理失败: {service_name}, 错误: {str(e)}")
+        
+        log = None
+        if result_sink.running:
+            await result_sink.put(result)
+        else:
+            log = await self.save_result(result)
+            if not log:
+                logger.error(f"保存监控日志失败，跳过后续处理: {service_name}")
+                return None
+        
+        # 处理告警和恢复通知
+        try:
+            if alert_kind == "recovery":
+                # 服务从异常状态恢复到正常状态，发送恢复通知
+                await alert_service.send_recovery_alert(service, result)
+                logger.info(f"服务恢复通知已发送: {service_name}")
+            elif alert_kind == "alert":
+                # 服务异常，发送告警
+                await alert_service.send_alert(service, result)
+                logger.info(f"服务告警已发送: {service_name}")
+        except Exception as e:
+            logger.error(f"发送告警/恢复通知失败: {service_name}, 错误: {str(e)}")
         
         return log
     
+    @staticmethod
+    def decide_alert(service: ServiceModel, current_status: str) -> Optional[str]:
+        """
+        根据前后状态判定需要发送的通知
+
+        Returns:
+            "recovery"(恢复通知) / "alert"(告警) / None(不发送)
+        """
+        if not getattr(service, 'enable_alert', False):
+            return None
+        previous_status = getattr(service, 'status', 'unknown')
+        if previous_status in ["failed", "timeout"] and current_status == "success":
+            return "recovery"
+        if current_status in ["failed", "timeout"]:
+            return "alert"
+        return None
+    
+    def _alert_due(self, service: ServiceModel) -> bool:
+        """
+        持续异常时是否需要再次告警
+
+        首次异常立即告警；之后按服务配置的间隔重复告警，自适应模式加快的复探
+        只用于尽快发现恢复，不会让告警数量随探测频率成倍增加。恢复后重新计时。
+        """
+        service_id = getattr(service, 'id', None)
+        now = time.monotonic()
+        last_alert = self._last_alert_at.get(service_id)
+        still_failing = getattr(service, 'status', None) in ["failed", "timeout"]
+        # 按整刻度调度的探测可能比配置间隔略早到期，留出10%余量
+        if still_failing and last_alert is not None and now - last_alert < (getattr(service, 'interval', 0) or 0) * 0.9:
+            return False
+        self._last_alert_at[service_id] = now
+        return True
+    
     async def get_active_services(self) -> list[ServiceModel]:
         """获取所有活跃的监控服务"""
         try:
-            with get_db_session() as db:
-                services = db.query(ServiceModel).filter(ServiceModel.is_active == True).all()
-                # 将服务对象从会话中分离，避免会话绑定问题
-                detached_services = []
-                for service in services:
-                    # 预先访问所有需要的属性
-                    service_data = {
-                        "id": service.id,
-                        "name": service.name,
-                        "url": service.url,
-                        "method": service.method,
-                        "timeout": service.timeout,
-                        "interval": service.interval,
-                        "retry_count": service.retry_count,
-                        "is_active": service.is_active,
-                        "status": service.status,
-                        "last_check_time": service.last_check_time,
-                        "last_success_time": service.last_success_time,
-                        "enable_alert": service.enable_alert,
-                        "alert_methods": service.alert_methods,
-                        "alert_contacts": service.alert_contacts,
-                        "description": service.description,
-                        "tags": service.tags,
-                        "created_at": service.created_at,
-                        "updated_at": service.updated_at
-                    }
-                    
-                    # 从会话中分离原对象
-                    db.expunge(service)
-                    
-                    # 创建新的分离对象
-                    detached_service = ServiceModel(**service_data)
-                    detached_services.append(detached_service)
-                
-                return detached_services
+            return await run_in_db_thread(self._load_active_services)
         except Exception as e:
             logger.error(f"获取活跃服务列表失败: {str(e)}")
             return []
     
+    @staticmethod
+    def _load_active_services() -> list[ServiceModel]:
+        with get_db_session() as db:
+            services = db.query(ServiceModel).filter(ServiceModel.is_active == True).all()
+            # 将服务对象从会话中分离，避免会话绑定问题
+            detached_services = []
+            for service in services:
+                # 预先访问所有需要的属性
+                service_data = {
+                    "id": service.id,
+                    "name": service.name,
+                    "url": service.url,
+                    "method": service.method,
+                    "timeout": service.timeout,
+                    "interval": service.interval,
+                    "retry_count": service.retry_count,
+                    "max_response_size": service.max_response_size,
+                    "http2": service.http2,
+                    "is_active": service.is_active,
+                    "status": service.status,
+                    "last_check_time": service.last_check_time,
+                    "last_success_time": service.last_success_time,
+                    "enable_alert": service.enable_alert,
+                    "alert_methods": service.alert_methods,
+                    "alert_contacts": service.alert_contacts,
+                    "description": service.description,
+                    "tags": service.tags,
+                    "created_at": service.created_at,
+                    "updated_at": service.updated_at
+                }
+                
+                # 从会话中分离原对象
+                db.expunge(service)
+                
+                # 创建新的分离对象
+                detached_service = ServiceModel(**service_data)
+                detached_services.append(detached_service)
+            
+            return detached_services
+    
     async def close(self):
         """关闭HTTP客户端"""
         if not self._closed:
+            await self.dispatcher.close()
             self._closed = True
             await self.client.aclose()
+            if self.http2_client is not None:
+                await self.http2_client.aclose()
             logger.info("MonitorService HTTP客户端已关闭")
     
+    @staticmethod
+    def _pool_stats(transport: Optional[httpx.AsyncHTTPTransport]) -> Dict[str, Any]:
+        """按源站汇总连接池中的连接数和每个连接承载的请求(流)数"""
+        pool = getattr(transport, "_pool", None)
+        origins: Dict[str, Dict[str, Any]] = {}
+        if pool is None:
+            return origins
+        
+        for connection in pool.connections:
+            # info() 形如 "'https://example.com:443', HTTP/2, ACTIVE, Request Count: 6"
+            match = re.match(r"'(.+?)', (HTTP/[\d.]+), (\w+), Request Count: (\d+)", connection.info())
+            if not match:
+                continue
+            origin, http_version, state, request_count = match.groups()
+            stats = origins.setdefault(origin, {
+                "http_version": http_version,
+                "connections": 0,
+                "active_connections": 0,
+                "total_streams": 0
+            })
+            stats["connections"] += 1
+            stats["total_streams"] += int(request_count)
+            if state == "ACTIVE":
+                stats["active_connections"] += 1
+        
+        for stats in origins.values():
+            stats["streams_per_connection"] = round(stats["total_streams"] / stats["connections"], 2)
+        return origins
+    
+    def get_http2_info(self) -> Dict[str, Any]:
+        """获取HTTP/2客户端的连接复用情况"""
+        if self.http2_client is None:
+            return {"enabled": False, "available": not self._http2_unavailable}
+        
+        origins = self._pool_stats(self._http2_transport)
+        running = self.dispatcher.running_by_origin()
+        for origin, stats in origins.items():
+            # 当前并发流数 = 该源站执行中的HTTP/2探测数 / 活跃连接数
+            in_flight = running.get(f"h2+{origin}", 0)
+            stats["in_flight_streams"] = in_flight
+            stats["concurrent_streams_per_connection"] = round(in_flight / stats["active_connections"], 2) if stats["active_connections"] else 0
+        
+        return {
+            "enabled": True,
+            "connections": sum(stats["connections"] for stats in origins.values()),
+            "origins": origins
+        }
+    
     def get_client_info(self):
         """获取HTTP客户端信息"""
         return {
             "is_closed": self._closed,
             "limits": {
-                "max_keepalive_connections": self.client._limits.max_keepalive_connections,
-                "max_connections": self.client._limits.max_connections,
-                "keepalive_expiry": self.client._limits.keepalive_expiry
-            }
+                "max_keepalive_connections": self._limits.max_keepalive_connections,
+                "max_connections": self._limits.max_connections,
+                "keepalive_expiry": self._limits.keepalive_expiry
+            },
+            "dispatcher": self.dispatcher.get_stats(),
+            "http2": self.get_http2_info(),
+            "dns_cache": self.dns_cache.get_stats() if settings.DNS_CACHE_ENABLED else {"enabled": False}
         }
 
 
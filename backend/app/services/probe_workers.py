@@ -0,0 +1,306 @@
+"""
+多进程探测工作池
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+from app.models.service import MonitorService as ServiceModel
+from app.services.monitor import ProbeDispatcher, monitor_service
+
+logger = logging.getLogger(__name__)
+
+# 发送给工作进程的服务字段，工作进程只负责探测，不需要告警等配置
+PROBE_FIELDS = ("id", "name", "url", "method", "timeout", "max_response_size", "http2", "priority")
+
+# 工作进程回传调度器重叠统计的间隔（秒）
+STATS_INTERVAL = 5.0
+
+
+def _worker_main(index: int, task_queue, result_queue, max_concurrency: int):
+    """工作进程入口：独立的事件循环，使用进程内的全局MonitorService客户端"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - probe-worker-{index} - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(_worker_loop(index, task_queue, result_queue, max_concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_loop(index: int, task_queue, result_queue, max_concurrency: int):
+    """
+    接收探测任务并通过调度器执行，结果回传主进程
+
+    结果队列中的消息为 (token, 结果)；token 为 None 时是定期回传的调度器重叠统计
+    (工作进程序号, pid, 统计)，重叠跳过发生在工作进程内，主进程只能据此汇总。
+    """
+    # 导入本模块时已创建全局 monitor_service，工作进程直接使用它，不再另建客户端
+    monitor = monitor_service
+    monitor.dispatcher.max_concurrency = max_concurrency
+    loop = asyncio.get_running_loop()
+
+    async def ship_result(service, result):
+        result_queue.put((service.token, result))
+
+    def ship_stats():
+        result_queue.put((None, (index, os.getpid(), monitor.dispatcher.overlap_snapshot())))
+
+    async def report_stats():
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            ship_stats()
+
+    monitor.dispatcher.result_handler = ship_result
+    reporter = asyncio.create_task(report_stats())
+    logger.info(f"探测工作进程 {index} 已启动，并发上限: {max_concurrency}")
+
+    while True:
+        message = await loop.run_in_executor(None, task_queue.get)
+        if message is None:
+            break
+        token, service_data = message
+        service = ServiceModel(**service_data)
+        service.token = token
+        if not monitor.dispatcher.submit(service):
+            # 工作进程队列已满，回传拒绝结果以便主进程释放占位
+            result_queue.put((token, None))
+
+    reporter.cancel()
+    await monitor.close()
+    ship_stats()
+    logger.info(f"探测工作进程 {index} 已退出")
+
+
+class ProbeWorkerPool:
+    """
+    多进程探测工作池
+
+    调度仍在API进程中进行，探测请求按源站哈希分片发送到N个工作进程，
+    每个工作进程有独立的事件循环、HTTP客户端和探测调度器（并发上限按进程数均分）。
+    同一源站的探测固定落在同一进程，按源站的并发上限和连接复用保持有效。
+    探测结果经结果队列回到主进程，统一由 monitor_service.process_result 入库和告警。
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._task_queues = []
+        self._result_queue = None
+        self._reader = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running = False
+
+        self._tokens = itertools.count()
+        self._pending: Dict[int, tuple] = {}  # token -> (service, 工作进程序号, 提交时间)
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._restarts = 0
+
+        # 工作进程最近回传的重叠统计；重启的工作进程计数清零，之前的累计值并入 _retired_*
+        self._worker_stats: Dict[int, Dict[str, Any]] = {}  # 工作进程序号 -> 统计
+        self._retired_skipped = 0
+        self._retired_deferred = 0
+        self._retired_skipped_by_service: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._running
+
+    def start(self):
+        """启动工作进程和结果读取线程"""
+        if self._running or self.processes <= 0:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._result_queue = self._context.Queue()
+        for index in range(self.processes):
+            self._task_queues.append(self._context.Queue())
+            self._workers.append(self._spawn(index))
+
+        self._running = True
+        self._reader = threading.Thread(target=self._read_results, name="probe-result-reader", daemon=True)
+        self._reader.start()
+        logger.info(f"探测工作池已启动，进程数: {self.processes}")
+
+    def _spawn(self, index: int):
+        """启动单个工作进程"""
+        max_concurrency = max(1, settings.PROBE_MAX_CONCURRENCY // self.processes)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._task_queues[index], self._result_queue, max_concurrency),
+            name=f"probe-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def _ensure_worker(self, index: int):
+        """工作进程意外退出时重启，并丢弃其未返回的任务"""
+        if self._workers[index].is_alive():
+            return
+
+        lost = [token for token, (_, worker, _) in self._pending.items() if worker == index]
+        for token in lost:
+            self._pending.pop(token, None)
+        logger.error(f"探测工作进程 {index} 已退出，正在重启，丢弃 {len(lost)} 个未完成的探测")
+        self._retire_stats(index)
+        self._task_queues[index] = self._context.Queue()
+        self._workers[index] = self._spawn(index)
+        self._restarts += 1
+
+    def shard_of(self, service: ServiceModel) -> int:
+        """按源站计算服务所属的工作进程"""
+        origin = ProbeDispatcher.origin_of(getattr(service, 'url', ''))
+        return zlib.crc32(origin.encode("utf-8")) % self.processes
+
+    def submit(self, service: ServiceModel) -> bool:
+        """提交探测任务到对应的工作进程"""
+        if not self._running:
+            return False
+
+        index = self.shard_of(service)
+        self._ensure_worker(index)
+
+        token = next(self._tokens)
+        service_data = {field: getattr(service, field, None) for field in PROBE_FIELDS}
+        self._pending[token] = (service, index, time.monotonic())
+        self._task_queues[index].put((token, service_data))
+        self._submitted += 1
+        return True
+
+    def _read_results(self):
+        """结果读取线程：从结果队列取出结果并交给事件循环处理"""
+        while self._running:
+            try:
+                message = self._result_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            token, payload = message
+            if token is None:
+                self._loop.call_soon_threadsafe(self._on_stats, *payload)
+            else:
+                self._loop.call_soon_threadsafe(self._on_result, token, payload)
+
+    def _on_result(self, token: int, result: Optional[Dict[str, Any]]):
+        """在事件循环中处理工作进程返回的结果"""
+        pending = self._pending.pop(token, None)
+        if pending is None:
+            return
+
+        service = pending[0]
+        if result is None:
+            self._rejected += 1
+            return
+
+        self._completed += 1
+        task = asyncio.create_task(monitor_service.process_result(service, result))
+        task.add_done_callback(self._log_failure)
+
+    def _on_stats(self, index: int, pid: int, stats: Dict[str, Any]):
+        """记录工作进程回传的重叠统计，忽略已重启的旧进程排在队列中的统计"""
+        if index < len(self._workers) and self._workers[index].pid == pid:
+            self._worker_stats[index] = stats
+
+    def _retire_stats(self, index: int):
+        """工作进程退出后，把它最后回传的累计计数并入历史值"""
+        stats = self._worker_stats.pop(index, None)
+        if stats is None:
+            return
+        self._retired_skipped += stats["skipped"]
+        self._retired_deferred += stats["deferred_total"]
+        for service_id, count in stats["skipped_by_service"].items():
+            self._retired_skipped_by_service[service_id] = self._retired_skipped_by_service.get(service_id, 0) + count
+
+    def skipped_of(self, service_id: int) -> int:
+        """服务在各工作进程中因上次探测未结束被跳过的次数"""
+        return self._retired_skipped_by_service.get(service_id, 0) + sum(
+            stats["skipped_by_service"].get(service_id, 0) for stats in self._worker_stats.values()
+        )
+
+    def overlap_stats(self) -> Dict[str, Any]:
+        """汇总各工作进程的重叠统计，格式与 ProbeDispatcher.get_stats 的 overlap 一致"""
+        snapshots = list(self._worker_stats.values())
+        skipped_by_service = dict(self._retired_skipped_by_service)
+        for stats in snapshots:
+            for service_id, count in stats["skipped_by_service"].items():
+                skipped_by_service[service_id] = skipped_by_service.get(service_id, 0) + count
+        dispatcher = monitor_service.dispatcher
+        return {
+            "policy": dispatcher.overlap_policy,
+            "max_per_service": dispatcher.max_per_service,
+            "reporting_workers": len(snapshots),
+            "services_in_flight": sum(stats["services_in_flight"] for stats in snapshots),
+            "deferred": sum(stats["deferred"] for stats in snapshots),
+            "deferred_total": self._retired_deferred + sum(stats["deferred_total"] for stats in snapshots),
+            "skipped": self._retired_skipped + sum(stats["skipped"] for stats in snapshots),
+            "top_skipped": sorted(skipped_by_service.items(), key=lambda item: item[1], reverse=True)[:10]
+        }
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"处理工作进程探测结果失败: {str(task.exception())}")
+
+    async def stop(self, timeout: float = 10.0):
+        """通知工作进程退出并等待结束"""
+        if not self._running:
+            return
+
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+
+        deadline = time.monotonic() + timeout
+        for process in self._workers:
+            while process.is_alive() and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            if process.is_alive():
+                process.terminate()
+
+        self._running = False
+        self._workers.clear()
+        self._task_queues.clear()
+        self._pending.clear()
+        logger.info("探测工作池已停止")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取工作池统计信息"""
+        in_flight = [0] * len(self._workers)
+        for _, index, _ in self._pending.values():
+            in_flight[index] += 1
+
+        return {
+            "enabled": self._running,
+            "processes": self.processes,
+            "workers": [
+                {
+                    "index": index,
+                    "pid": process.pid,
+                    "alive": process.is_alive(),
+                    "in_flight": in_flight[index]
+                }
+                for index, process in enumerate(self._workers)
+            ],
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "restarts": self._restarts,
+            "overlap": self.overlap_stats()
+        }
+
+
+# 创建全局探测工作池实例
+probe_worker_pool = ProbeWorkerPool(settings.PROBE_WORKER_PROCESSES)
@@ -0,0 +1,247 @@
+"""
+探测结果批量写入
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import insert, update, bindparam
+
+from app.core.config import settings
+from app.core.database import get_db_session, run_in_db_thread
+from app.models.service import MonitorService as ServiceModel
+from app.models.monitor_log import MonitorLog
+from app.services.rollup import rollup_service
+
+logger = logging.getLogger(__name__)
+
+# 批量插入时每行都带上全部字段，多行INSERT要求各行字段一致
+LOG_COLUMNS = [column.key for column in MonitorLog.__table__.columns if column.key != "id"]
+
+# 按主键批量更新服务状态；updated_at只反映配置变更（调度器据此增量同步），状态写入时保持原值
+_services = ServiceModel.__table__
+STATUS_UPDATE = (
+    update(_services)
+    .where(_services.c.id == bindparam("b_id"))
+    .values(status=bindparam("b_status"), last_check_time=bindparam("b_check_time"),
+            last_response_time=bindparam("b_response_time"), last_status_code=bindparam("b_status_code"),
+            last_error_message=bindparam("b_error_message"), updated_at=_services.c.updated_at)
+)
+SUCCESS_STATUS_UPDATE = STATUS_UPDATE.values(last_success_time=bindparam("b_success_time"))
+
+
+class ResultSink:
+    """
+    探测结果写缓冲（write-behind）
+
+    探测结果先进入内存缓冲区，每 flush_interval_ms 毫秒或攒够 batch_size 条时写库一次：
+    一条多行INSERT写入monitor_logs，一次批量UPDATE更新monitor_services的状态字段
+    （含最近一次检查的响应时间、状态码和错误信息，服务状态接口直接读取，不再逐个查询最新日志），
+    同一批内同一服务只保留最后一次检查的状态。
+    缓冲区达到 max_buffer 条时 put 会等待写库腾出空间（背压），关闭时写完剩余结果。
+    写库失败（如死锁、连接中断）时整批按指数退避重试，最多 max_retries 次，仍失败才丢弃；
+    重试期间新结果继续进入缓冲区，缓冲区满时由背压限制探测结果处理。
+    日志提交后再在单独的事务中累加统计汇总（同样重试），汇总失败不会回滚日志，
+    偏差由每日重建任务从原始日志修正。
+    告警在结果进入缓冲区之前判定，日志行直接带上告警状态，无需写入后再回查更新。
+    写库在数据库专用线程中执行，不阻塞事件循环。
+    """
+
+    def __init__(self, flush_interval_ms: int, batch_size: int, max_buffer: int,
+                 max_retries: int = 3, retry_backoff_ms: int = 500):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_buffer = max(max_buffer, batch_size)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff_ms / 1000
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._not_full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+        # 统计信息
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._failed_rows = 0
+        self._rollup_failed_rows = 0
+        self._retries = 0
+        self._backpressure_waits = 0
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
+        self._flush_time_last = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """启动后台写库任务"""
+        if self._running:
+            return
+        self._batch_ready = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._running = True
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(f"探测结果写缓冲已启动，写库间隔: {self.flush_interval * 1000:.0f}ms，批量: {self.batch_size}")
+
+    async def put(self, result: Dict[str, Any]):
+        """写入一条探测结果，缓冲区已满时等待"""
+        while len(self._buffer) >= self.max_buffer:
+            self._backpressure_waits += 1
+            self._not_full.clear()
+            await self._not_full.wait()
+
+        self._buffer.append(result)
+        if len(self._buffer) >= self.batch_size:
+            self._batch_ready.set()
+
+    async def _flush_loop(self):
+        """定时或攒够一批时写库，停止后写完剩余结果再退出"""
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                self._not_full.set()
+                await self._flush_batch(batch)
+
+            if not self._running:
+                break
+
+    async def _flush_batch(self, batch: List[Dict[str, Any]]):
+        """写入一批结果，日志提交后再累加统计汇总，两步各自重试"""
+        log_rows = [self._log_row(result) for result in batch]
+        if not await self._with_retries(self._write_batch, log_rows, "写入探测结果"):
+            self._failed_rows += len(log_rows)
+            return
+        if rollup_service.enabled and not await self._with_retries(self._apply_rollups, log_rows, "累加统计汇总"):
+            # 日志已保存，汇总偏差由每日重建任务修正
+            self._rollup_failed_rows += len(log_rows)
+
+    async def _with_retries(self, func, log_rows: List[Dict[str, Any]], action: str) -> bool:
+        """在数据库线程中执行，失败时按指数退避重试，超过重试次数返回 False"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                await run_in_db_thread(func, log_rows)
+                return True
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"批量{action}失败，重试 {self.max_retries} 次后放弃 {len(log_rows)} 条: {str(e)}")
+                    return False
+                delay = self.retry_backoff * 2 ** attempt
+                self._retries += 1
+                logger.warning(f"批量{action}失败，{delay:.1f}秒后重试({attempt + 1}/{self.max_retries}): {str(e)}")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _apply_rollups(log_rows: List[Dict[str, Any]]):
+        """单独的事务内把已提交的日志累加到统计汇总"""
+        rollup_service.apply_batch(log_rows)
+
+    def _write_batch(self, log_rows: List[Dict[str, Any]]):
+        """一个事务内批量插入日志并更新服务状态，失败时整个事务回滚并抛出异常"""
+        started = time.perf_counter()
+
+        # 同一服务只保留最后一次检查的状态；成功时额外更新最近成功时间
+        latest: Dict[int, Dict[str, Any]] = {}
+        for row in log_rows:
+            current = latest.get(row["service_id"])
+            if current is None or row["check_time"] >= current["check_time"]:
+                latest[row["service_id"]] = row
+        success_updates = [
+            dict(self._status_params(row), b_success_time=row["check_time"])
+            for row in latest.values() if row["status"] == "success"
+        ]
+        other_updates = [self._status_params(row) for row in latest.values() if row["status"] != "success"]
+
+        try:
+            with get_db_session() as db:
+                db.execute(insert(MonitorLog), log_rows)
+                if success_updates:
+                    db.execute(SUCCESS_STATUS_UPDATE, success_updates)
+                if other_updates:
+                    db.execute(STATUS_UPDATE, other_updates)
+            self._flushed_rows += len(log_rows)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._flushes += 1
+            self._flush_time_total += elapsed
+            self._flush_time_last = elapsed
+            self._flush_time_max = max(self._flush_time_max, elapsed)
+
+    @staticmethod
+    def _status_params(row: Dict[str, Any]) -> Dict[str, Any]:
+        """日志行转为服务状态更新参数（最近一次检查的状态和结果）"""
+        return {
+            "b_id": row["service_id"],
+            "b_status": row["status"],
+            "b_check_time": row["check_time"],
+            "b_response_time": row["response_time"],
+            "b_status_code": row["status_code"],
+            "b_error_message": row["error_message"]
+        }
+
+    @staticmethod
+    def _log_row(result: Dict[str, Any]) -> Dict[str, Any]:
+        """探测结果转为日志行，补齐数据库默认值"""
+        row = {column: result.get(column) for column in LOG_COLUMNS}
+        now = datetime.now()
+        row["check_time"] = row["check_time"] or now
+        row["created_at"] = row["created_at"] or now
+        row["response_truncated"] = bool(row["response_truncated"])
+        row["alert_sent"] = bool(row["alert_sent"])
+        return row
+
+    async def stop(self, timeout: float = 30.0):
+        """停止写缓冲，写完剩余结果"""
+        if not self._running:
+            return
+        self._running = False
+        self._batch_ready.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"探测结果写缓冲关闭超时，丢弃 {len(self._buffer)} 条")
+        logger.info("探测结果写缓冲已停止")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写缓冲统计信息"""
+        return {
+            "running": self._running,
+            "buffered": len(self._buffer),
+            "max_buffer": self.max_buffer,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": round(self.flush_interval * 1000),
+            "flushes": self._flushes,
+            "flushed_rows": self._flushed_rows,
+            "failed_rows": self._failed_rows,
+            "rollup_failed_rows": self._rollup_failed_rows,
+            "retries": self._retries,
+            "max_retries": self.max_retries,
+            "backpressure_waits": self._backpressure_waits,
+            "flush_time_ms": {
+                "last": round(self._flush_time_last * 1000, 2),
+                "avg": round(self._flush_time_total / self._flushes * 1000, 2) if self._flushes else 0,
+                "max": round(self._flush_time_max * 1000, 2)
+            }
+        }
+
+
+# 创建全局写缓冲实例
+result_sink = ResultSink(
+    flush_interval_ms=settings.RESULT_SINK_FLUSH_INTERVAL_MS,
+    batch_size=settings.RESULT_SINK_BATCH_SIZE,
+    max_buffer=settings.RESULT_SINK_MAX_BUFFER,
+    max_retries=settings.RESULT_SINK_MAX_RETRIES,
+    retry_backoff_ms=settings.RESULT_SINK_RETRY_BACKOFF_MS
+)
@@ -0,0 +1,677 @@
+"""
+监控统计汇总服务
+"""
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Callable
+
+from sqlalchemy import select, delete, update, insert, and_, or_, func, false, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import engine, get_db_session
+from app.models.monitor_log import MonitorLog
+from app.models.rollup import MonitorRollup, MonitorRollupHistogram, MonitorRollupSketch, MonitorRollupBackfill
+from app.services.sketch import DDSketch
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("minute", "hour", "day")
+
+
+def parse_bounds(value: str) -> Tuple[int, ...]:
+    """解析逗号分隔的区间边界(毫秒)，去重排序"""
+    return tuple(sorted({int(item) for item in value.split(",") if item.strip() and int(item) > 0}))
+
+
+# 成功检查响应时间的分布区间边界(毫秒)：[0, b1), [b1, b2) ... [bn, +∞)
+HISTOGRAM_BOUNDS = parse_bounds(settings.ROLLUP_HISTOGRAM_BOUNDS)
+
+# 仪表板响应时间分布的区间边界，由细分区间合并得到
+DASHBOARD_BOUNDS = (100, 300, 500, 1000)
+
+
+def check_bounds(bounds: Tuple[int, ...], required: Tuple[int, ...] = DASHBOARD_BOUNDS):
+    """合并区间时只能在细分区间的边界处切分，缺少仪表板边界时合并结果会错位"""
+    missing = sorted(set(required) - set(bounds))
+    if missing:
+        raise ValueError(f"ROLLUP_HISTOGRAM_BOUNDS 缺少仪表板响应时间分布的区间边界: {missing}")
+
+
+# 配置错误时启动失败，避免仪表板显示错误的分布
+check_bounds(HISTOGRAM_BOUNDS)
+
+# 分阶段耗时字段
+TIMING_FIELDS = ("dns_time", "connect_time", "tls_time", "ttfb_time", "download_time")
+
+_rollups = MonitorRollup.__table__
+_histograms = MonitorRollupHistogram.__table__
+_sketches = MonitorRollupSketch.__table__
+_backfills = MonitorRollupBackfill.__table__
+
+# 由日志累加得到的汇总表
+ROLLUP_TABLES = (_rollups, _histograms, _sketches)
+
+# 分位数草图只按小时/天保存，查询范围两端对齐到整点
+SKETCH_GRANULARITIES = ("hour", "day")
+
+# 累加的字段（其余为最小/最大值）
+ADDITIVE_FIELDS = (
+    "total_count", "success_count", "failed_count", "timeout_count", "alert_count",
+    "response_time_count", "response_time_sum", "response_time_sq_sum",
+    "success_response_time_count", "success_response_time_sum"
+) + tuple(f"{field}_{suffix}" for field in TIMING_FIELDS for suffix in ("sum", "count"))
+
+# 累加汇总需要读取的日志字段
+LOG_COLUMNS = [MonitorLog.id, MonitorLog.service_id, MonitorLog.status, MonitorLog.response_time,
+               MonitorLog.alert_sent, MonitorLog.check_time] + [getattr(MonitorLog, field) for field in TIMING_FIELDS]
+
+# 汇总查询的求和字段
+SUM_COLUMNS = [func.sum(_rollups.c[field]).label(field) for field in ADDITIVE_FIELDS]
+
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    """时间向下取整到粒度"""
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_to(moment: datetime, granularity: str) -> datetime:
+    """时间向上取整到粒度"""
+    floor = truncate(moment, granularity)
+    if floor == moment:
+        return floor
+    return floor + {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}[granularity]
+
+
+def histogram_bucket(response_time: float, bounds: Tuple[int, ...] = HISTOGRAM_BOUNDS) -> int:
+    """响应时间所在分布区间的下界"""
+    index = bisect.bisect_right(bounds, response_time)
+    return bounds[index - 1] if index else 0
+
+
+def merge_buckets(counts: Dict[int, int], bounds: Tuple[int, ...]) -> List[int]:
+    """把按下界存储的区间计数合并到 bounds 划分的区间，返回各区间次数"""
+    merged = [0] * (len(bounds) + 1)
+    for lower, count in counts.items():
+        merged[bisect.bisect_right(bounds, lower)] += count
+    return merged
+
+
+def bucket_labels(bounds: Tuple[int, ...]) -> List[str]:
+    """分布区间名称，如 0-100ms、1000ms+"""
+    lowers = (0,) + tuple(bounds)
+    labels = [f"{lowers[i]}-{lowers[i + 1]}ms" for i in range(len(bounds))]
+    return labels + [f"{lowers[-1]}ms+"]
+
+
+class RollupService:
+    """
+    统计汇总服务
+
+    日志写入后，把这批日志按 (服务, 粒度, 时间段) 累加到 monitor_rollups，
+    成功检查的响应时间按对数刻度区间（ROLLUP_HISTOGRAM_BOUNDS）计数，
+    累加到 monitor_rollup_histograms（每个非空区间一行，以区间下界标识）。
+    成功检查的响应时间还按服务、小时/天维护 DDSketch 分位数草图（monitor_rollup_sketches），
+    草图不能用SQL累加，写入时先补齐不存在的行，再加锁读出本批涉及的草图合并后整行覆盖。
+    累加用各数据库的upsert（MySQL ON DUPLICATE KEY UPDATE，PostgreSQL/SQLite ON CONFLICT），
+    不需要先查询。统计接口读取汇总表，查询范围按
+    “两端分钟/小时 + 中间整天” 拆分，读取的行数只与服务数和时间跨度有关，与日志量无关。
+    汇总在日志提交后单独写入，汇总失败不会丢失日志，由维护任务按天从原始日志重建修正；
+    汇总表新建时已有的日志由主节点在后台一次性回填。
+    """
+
+    def __init__(self):
+        self.enabled = settings.ROLLUP_ENABLED
+        self.sketch_accuracy = settings.ROLLUP_SKETCH_ACCURACY
+        DDSketch(self.sketch_accuracy)  # 配置的相对误差无效时启动失败
+        self._applied_rows = 0
+        self._apply_time_total = 0.0
+        self._last_rebuild: Optional[Dict[str, Any]] = None
+        self._last_backfill: Optional[Dict[str, Any]] = None
+        # 回填和重建不能同时处理同一天，否则重建后的汇总会被回填再累加一次
+        self._maintenance_lock = threading.Lock()
+
+    # ---------- 写入 ----------
+
+    @staticmethod
+    def accumulate(rows: Iterable[Dict[str, Any]], granularities: Iterable[str] = GRANULARITIES
+                   ) -> Tuple[Dict[tuple, Dict[str, Any]], Dict[tuple, int]]:
+        """把日志行汇总为 (服务, 粒度, 时间段) -> 统计，以及分布区间 -> 次数"""
+        rollups: Dict[tuple, Dict[str, Any]] = {}
+        histograms: Dict[tuple, int] = {}
+        for row in rows:
+            status = row["status"]
+            response_time = row.get("response_time")
+            success = status == "success"
+            for granularity in granularities:
+                key = (row["service_id"], granularity, truncate(row["check_time"], granularity))
+                stats = rollups.get(key)
+                if stats is None:
+                    stats = rollups[key] = dict.fromkeys(ADDITIVE_FIELDS, 0)
+                    stats["response_time_min"] = None
+                    stats["response_time_max"] = None
+                stats["total_count"] += 1
+                if success:
+                    stats["success_count"] += 1
+                elif status == "failed":
+                    stats["failed_count"] += 1
+                elif status == "timeout":
+                    stats["timeout_count"] += 1
+                if row.get("alert_sent"):
+                    stats["alert_count"] += 1
+                if response_time is not None:
+                    stats["response_time_count"] += 1
+                    stats["response_time_sum"] += response_time
+                    stats["response_time_sq_sum"] += response_time * response_time
+                    if stats["response_time_min"] is None or response_time < stats["response_time_min"]:
+                        stats["response_time_min"] = response_time
+                    if stats["response_time_max"] is None or response_time > stats["response_time_max"]:
+                        stats["response_time_max"] = response_time
+                    if success:
+                        stats["success_response_time_count"] += 1
+                        stats["success_response_time_sum"] += response_time
+                        histogram_key = key + (histogram_bucket(response_time),)
+                        histograms[histogram_key] = histograms.get(histogram_key, 0) + 1
+                for field in TIMING_FIELDS:
+                    value = row.get(field)
+                    if value is not None:
+                        stats[f"{field}_sum"] += value
+                        stats[f"{field}_count"] += 1
+        return rollups, histograms
+
+    def apply_batch(self, rows: List[Dict[str, Any]]):
+        """在单独的事务内把一批已提交的日志行累加到汇总表，失败时抛出异常"""
+        with get_db_session() as db:
+            self.apply(db, rows)
+
+    def apply(self, db: Session, rows: List[Dict[str, Any]], granularities: Iterable[str] = GRANULARITIES,
+              tables: Optional[Iterable[str]] = None):
+        """在调用方的事务内把一批日志行累加到汇总表，tables 为空时写入全部汇总表"""
+        if not rows:
+            return
+        started = time.perf_counter()
+        tables = {table.name for table in ROLLUP_TABLES} if tables is None else set(tables)
+        rollups, histograms = self.accumulate(rows, granularities)
+        now = datetime.now()
+        rollup_rows = [
+            {"service_id": service_id, "granularity": granularity, "bucket_start": bucket_start,
+             "updated_at": now, **stats}
+            for (service_id, granularity, bucket_start), stats in rollups.items()
+        ]
+        histogram_rows = [
+            {"service_id": service_id, "granularity": granularity, "bucket_start": bucket_start,
+             "bucket": bucket, "count": count}
+            for (service_id, granularity, bucket_start, bucket), count in histograms.items()
+        ]
+        if _rollups.name in tables:
+            self._upsert(db, _rollups, rollup_rows, ("service_id", "granularity", "bucket_start"),
+                         ADDITIVE_FIELDS, minimum=("response_time_min",), maximum=("response_time_max",),
+                         replace=("updated_at",))
+        if histogram_rows and _histograms.name in tables:
+            self._upsert(db, _histograms, histogram_rows, ("service_id", "granularity", "bucket_start", "bucket"),
+                         ("count",))
+        if _sketches.name in tables:
+            self._apply_sketches(db, rows, [g for g in granularities if g in SKETCH_GRANULARITIES], now)
+        self._applied_rows += len(rows)
+        self._apply_time_total += time.perf_counter() - started
+
+    def _apply_sketches(self, db: Session, rows: List[Dict[str, Any]], granularities: List[str], now: datetime):
+        """把成功检查的响应时间合并进对应的草图（补齐空草图、加锁读出、合并、覆盖写回）"""
+        sketches: Dict[tuple, DDSketch] = {}
+        for row in rows:
+            if row["status"] != "success" or row.get("response_time") is None:
+                continue
+            for granularity in granularities:
+                key = (row["service_id"], granularity, truncate(row["check_time"], granularity))
+                sketch = sketches.get(key)
+                if sketch is None:
+                    sketch = sketches[key] = DDSketch(self.sketch_accuracy)
+                sketch.add(row["response_time"])
+        if not sketches:
+            return
+
+        # 先插入不存在的空草图（已存在则忽略），再加锁读取：行锁只能锁住已存在的行，
+        # 两个写入方同时新建同一草图时，后插入的一方等待先提交的一方，之后读到合并后的草图，
+        # 不会互相覆盖（SQLite写事务本身串行）
+        empty = DDSketch(self.sketch_accuracy).to_bytes()
+        self._insert_missing(db, _sketches, [
+            {"service_id": service_id, "granularity": granularity, "bucket_start": bucket_start,
+             "count": 0, "data": empty, "updated_at": now}
+            for service_id, granularity, bucket_start in sorted(sketches)
+        ], ("service_id", "granularity", "bucket_start"))
+        query = select(_sketches.c.service_id, _sketches.c.granularity, _sketches.c.bucket_start, _sketches.c.data) \
+            .where(_sketches.c.service_id.in_({key[0] for key in sketches}),
+                   _sketches.c.granularity.in_({key[1] for key in sketches}),
+                   _sketches.c.bucket_start.in_({key[2] for key in sketches}))
+        if db.get_bind().dialect.name != "sqlite":
+            query = query.with_for_update()
+        for service_id, granularity, bucket_start, data in db.execute(query):
+            sketch = sketches.get((service_id, granularity, bucket_start))
+            if sketch is not None:
+                sketch.merge(DDSketch.from_bytes(data))
+
+        sketch_rows = [
+            {"service_id": service_id, "granularity": granularity, "bucket_start": bucket_start,
+             "count": sketch.count, "data": sketch.to_bytes(), "updated_at": now}
+            for (service_id, granularity, bucket_start), sketch in sketches.items()
+        ]
+        self._upsert(db, _sketches, sketch_rows, ("service_id", "granularity", "bucket_start"), (),
+                     replace=("count", "data", "updated_at"))
+
+    @staticmethod
+    def _insert_missing(db: Session, table, rows: List[Dict[str, Any]], keys: Tuple[str, ...]):
+        """按唯一键批量插入，已存在的行保持不变"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "mysql":
+            db.execute(insert(table).prefix_with("IGNORE"), rows)
+        elif dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            db.execute(dialect_insert(table).on_conflict_do_nothing(index_elements=list(keys)), rows)
+        else:
+            for row in rows:
+                exists = db.execute(
+                    select(table.c[keys[0]]).where(and_(*[table.c[key] == row[key] for key in keys]))
+                ).first()
+                if exists is None:
+                    db.execute(insert(table).values(**row))
+
+    @staticmethod
+    def _upsert(db: Session, table, rows: List[Dict[str, Any]], keys: Tuple[str, ...], additive: Iterable[str],
+                minimum: Iterable[str] = (), maximum: Iterable[str] = (), replace: Iterable[str] = ()):
+        """按唯一键批量插入，已存在时累加/取最小最大值"""
+        dialect = db.get_bind().dialect.name
+        least, greatest = (func.min, func.max) if dialect == "sqlite" else (func.least, func.greatest)
+
+        def merged(new):
+            values = {field: table.c[field] + new[field] for field in additive}
+            for field in minimum:
+                values[field] = func.coalesce(least(table.c[field], new[field]), table.c[field], new[field])
+            for field in maximum:
+                values[field] = func.coalesce(greatest(table.c[field], new[field]), table.c[field], new[field])
+            for field in replace:
+                values[field] = new[field]
+            return values
+
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            statement = mysql_insert(table)
+            db.execute(statement.on_duplicate_key_update(**merged(statement.inserted)), rows)
+        elif dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            statement = dialect_insert(table)
+            db.execute(statement.on_conflict_do_update(index_elements=list(keys), set_=merged(statement.excluded)), rows)
+        else:
+            # 其他数据库逐行先更新，不存在时插入
+            for row in rows:
+                result = db.execute(
+                    update(table)
+                    .where(and_(*[table.c[key] == row[key] for key in keys]))
+                    .values(**merged(row))
+                )
+                if result.rowcount == 0:
+                    db.execute(insert(table).values(**row))
+
+    # ---------- 重建和保留 ----------
+
+    def rebuild(self, start_day: datetime, end_day: datetime, chunk_size: int = 5000) -> Dict[str, Any]:
+        """
+        从原始日志按天重建 [start_day, end_day) 的汇总
+
+        每天先删除当天各粒度的汇总，再分块读取当天日志累加（upsert可以分块累加）。
+        只应重建已经结束的日期，当天仍在写入的汇总重建时会与增量写入冲突。
+        原始日志已被清理（或部分清理）的日期不重建，否则会用不完整的日志覆盖保留期更长的汇总，
+        因此起点不早于最早日志之后的第一个完整日期。
+        """
+        with self._maintenance_lock:
+            started = time.perf_counter()
+            day = truncate(start_day, "day")
+            end_day = truncate(end_day, "day")
+            with get_db_session() as db:
+                oldest = db.execute(select(func.min(MonitorLog.check_time))).scalar()
+            if oldest is None:
+                day = end_day
+            else:
+                first_full_day = truncate(oldest, "day")
+                if first_full_day < oldest:
+                    first_full_day += timedelta(days=1)
+                day = max(day, first_full_day)
+            start = day
+            days = 0
+            log_rows = 0
+            while day < end_day:
+                next_day = day + timedelta(days=1)
+                with get_db_session() as db:
+                    for table in ROLLUP_TABLES:
+                        db.execute(delete(table).where(table.c.bucket_start >= day, table.c.bucket_start < next_day))
+                    log_rows += self._apply_day(db, day, chunk_size)
+                days += 1
+                day = next_day
+
+            self._last_rebuild = {
+                "start": min(start, end_day).isoformat(),
+                "end": end_day.isoformat(),
+                "days": days,
+                "log_rows": log_rows,
+                "elapsed_seconds": round(time.perf_counter() - started, 2),
+                "finished_at": datetime.now().isoformat()
+            }
+        logger.info(f"统计汇总重建完成: {days} 天, {log_rows} 条日志")
+        return self._last_rebuild
+
+    def _apply_day(self, db: Session, day: datetime, chunk_size: int, max_log_id: Optional[int] = None,
+                   tables: Optional[Iterable[str]] = None) -> int:
+        """分块读取一天的日志（可限定ID上限）累加到汇总，返回日志条数"""
+        next_day = day + timedelta(days=1)
+        # 超出保留期的粒度不再累加
+        granularities = [granularity for granularity in GRANULARITIES if day >= self._retention_cutoff(granularity)]
+        conditions = [MonitorLog.check_time >= day, MonitorLog.check_time < next_day]
+        if max_log_id is not None:
+            conditions.append(MonitorLog.id <= max_log_id)
+        log_rows = 0
+        last_id = 0
+        while True:
+            chunk = db.execute(
+                select(*LOG_COLUMNS)
+                .where(*conditions, MonitorLog.id > last_id)
+                .order_by(MonitorLog.id)
+                .limit(chunk_size)
+            ).mappings().all()
+            if not chunk:
+                break
+            last_id = chunk[-1]["id"]
+            if granularities:
+                self.apply(db, [dict(row) for row in chunk], granularities, tables)
+            log_rows += len(chunk)
+        return log_rows
+
+    # ---------- 历史回填 ----------
+
+    @staticmethod
+    def pending_backfill() -> Tuple[List[str], Optional[int]]:
+        """
+        建表前调用：返回尚不存在的汇总表和当前最大日志ID
+
+        在建表之前取日志ID上限，建表后写入的日志都会增量累加，回填只处理上限以内的日志，
+        两者互不重叠，不需要删除或停止写入。
+        """
+        inspector = inspect(engine)
+        missing = [table.name for table in ROLLUP_TABLES if not inspector.has_table(table.name)]
+        if not missing or not inspector.has_table(MonitorLog.__tablename__):
+            return [], None
+        with get_db_session() as db:
+            max_log_id = db.execute(select(func.max(MonitorLog.id))).scalar()
+        return missing, max_log_id
+
+    @staticmethod
+    def plan_backfill(tables: List[str], max_log_id: Optional[int]):
+        """建表后为新建的汇总表记录回填任务，多个进程同时建表时只保留先写入的一条"""
+        if not tables or max_log_id is None:
+            return
+        try:
+            with get_db_session() as db:
+                existing = set(db.execute(select(_backfills.c.table_name)).scalars())
+                rows = [{"table_name": table, "max_log_id": max_log_id, "next_day": None, "created_at": datetime.now()}
+                        for table in tables if table not in existing]
+                if rows:
+                    db.execute(insert(_backfills), rows)
+                    logger.info(f"汇总表 {', '.join(tables)} 需要回填 ID≤{max_log_id} 的历史日志")
+        except IntegrityError:
+            logger.info("回填任务已由其他进程记录")
+
+    def backfill(self, should_stop: Callable[[], bool] = lambda: False,
+                 chunk_size: int = 5000) -> Optional[Dict[str, Any]]:
+        """
+        把汇总表新建之前的日志按天累加到汇总（主节点启动维护任务时在后台执行）
+
+        这些日志从未累加过，直接upsert即可，包括仍在写入的当天。
+        每天一个事务，锁定回填记录后读取进度，处理完更新进度，中断或主节点切换后从未完成的那天继续。
+        同一ID上限和进度的表一起回填，日志只读一遍。每天处理完检查 should_stop（失去主节点身份时停止）。
+        没有回填任务时返回 None。
+        """
+        started = time.perf_counter()
+        days = 0
+        log_rows = 0
+        with self._maintenance_lock:
+            while not should_stop():
+                with get_db_session() as db:
+                    query = select(_backfills).order_by(_backfills.c.table_name)
+                    if db.get_bind().dialect.name != "sqlite":
+                        query = query.with_for_update()
+                    tasks = db.execute(query).mappings().all()
+                    if not tasks:
+                        break
+                    max_log_id, progress = tasks[0]["max_log_id"], tasks[0]["next_day"]
+                    tables = [task["table_name"] for task in tasks
+                              if task["max_log_id"] == max_log_id and task["next_day"] == progress]
+                    # 从进度（或日保留期起点）之后第一条待回填日志所在的那天开始，跳过没有日志的日期
+                    cutoff = self._retention_cutoff("day")
+                    first = db.execute(
+                        select(func.min(MonitorLog.check_time))
+                        .where(MonitorLog.check_time >= max(progress or cutoff, cutoff), MonitorLog.id <= max_log_id)
+                    ).scalar()
+                    if first is None:
+                        db.execute(delete(_backfills).where(_backfills.c.table_name.in_(tables)))
+                        logger.info(f"汇总表 {', '.join(tables)} 历史回填完成")
+                        continue
+                    day = truncate(first, "day")
+                    log_rows += self._apply_day(db, day, chunk_size, max_log_id, tables)
+                    db.execute(
+                        update(_backfills).where(_backfills.c.table_name.in_(tables))
+                        .values(next_day=day + timedelta(days=1))
+                    )
+                days += 1
+        if days == 0:
+            return None
+
+        self._last_backfill = {
+            "days": days,
+            "log_rows": log_rows,
+            "interrupted": should_stop(),
+            "elapsed_seconds": round(time.perf_counter() - started, 2),
+            "finished_at": datetime.now().isoformat()
+        }
+        logger.info(f"统计汇总回填结束: {self._last_backfill}")
+        return self._last_backfill
+
+    @staticmethod
+    def _retention_cutoff(granularity: str) -> datetime:
+        """该粒度汇总保留的最早日期"""
+        days = {
+            "minute": settings.ROLLUP_MINUTE_RETENTION_DAYS,
+            "hour": settings.ROLLUP_HOUR_RETENTION_DAYS,
+            "day": settings.ROLLUP_DAY_RETENTION_DAYS
+        }[granularity]
+        return truncate(datetime.now() - timedelta(days=days), "day")
+
+    def purge_expired(self) -> Dict[str, int]:
+        """按各粒度的保留天数删除过期汇总"""
+        deleted = {}
+        with get_db_session() as db:
+            for granularity in GRANULARITIES:
+                cutoff = self._retention_cutoff(granularity)
+                count = 0
+                for table in ROLLUP_TABLES:
+                    result = db.execute(
+                        delete(table).where(table.c.granularity == granularity, table.c.bucket_start < cutoff)
+                    )
+                    count += result.rowcount
+                deleted[granularity] = count
+        return deleted
+
+    def delete_service(self, service_id: int) -> int:
+        """删除服务的全部汇总，返回删除的行数"""
+        deleted = 0
+        with get_db_session() as db:
+            for table in ROLLUP_TABLES:
+                deleted += db.execute(delete(table).where(table.c.service_id == service_id)).rowcount
+        return deleted
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def _coverable_start(start: datetime) -> datetime:
+        """分钟/小时汇总超出保留期后，查询起点对齐到仍保留的更粗粒度"""
+        now = datetime.now()
+        if start < now - timedelta(days=settings.ROLLUP_HOUR_RETENTION_DAYS):
+            return truncate(start, "day")
+        if start < now - timedelta(days=settings.ROLLUP_MINUTE_RETENTION_DAYS):
+            return truncate(start, "hour")
+        return truncate(start, "minute")
+
+    @classmethod
+    def cover(cls, start: datetime, end: datetime,
+              granularities: Tuple[str, ...] = GRANULARITIES) -> List[Tuple[str, datetime, datetime]]:
+        """
+        把时间范围拆成尽量粗的粒度段：开头的分钟到整点、整点到零点，
+        中间的整天，结尾的整点和分钟，返回 [(粒度, 开始, 结束)]
+        """
+        segments = []
+        moment = truncate(cls._coverable_start(start), granularities[0])
+        level = 0
+        while level < len(granularities) - 1:
+            boundary = ceil_to(moment, granularities[level + 1])
+            if boundary > end:
+                break
+            if boundary > moment:
+                segments.append((granularities[level], moment, boundary))
+            moment = boundary
+            level += 1
+        while level >= 0:
+            stop = truncate(end, granularities[level]) if level > 0 else end
+            if stop > moment:
+                segments.append((granularities[level], moment, stop))
+                moment = stop
+            level -= 1
+        return segments
+
+    @classmethod
+    def _range_filter(cls, table, start: datetime, end: datetime, service_id: Optional[int] = None,
+                      granularities: Tuple[str, ...] = GRANULARITIES):
+        conditions = [
+            and_(table.c.granularity == granularity, table.c.bucket_start >= segment_start,
+                 table.c.bucket_start < segment_end)
+            for granularity, segment_start, segment_end in cls.cover(start, end, granularities)
+        ]
+        condition = or_(*conditions) if conditions else false()
+        if service_id:
+            condition = and_(table.c.service_id == service_id, condition)
+        return condition
+
+    def summary(self, db: Session, start: datetime, end: Optional[datetime] = None,
+                service_id: Optional[int] = None, by_service: bool = False) -> List[Dict[str, Any]]:
+        """时间范围内的汇总统计，by_service 时按服务分组"""
+        end = end or datetime.now()
+        columns = list(SUM_COLUMNS) + [
+            func.min(_rollups.c.response_time_min).label("response_time_min"),
+            func.max(_rollups.c.response_time_max).label("response_time_max")
+        ]
+        query = select(*columns).where(self._range_filter(_rollups, start, end, service_id))
+        if by_service:
+            query = select(_rollups.c.service_id, *columns) \
+                .where(self._range_filter(_rollups, start, end, service_id)) \
+                .group_by(_rollups.c.service_id)
+        rows = [self._normalize(dict(row)) for row in db.execute(query).mappings()]
+        return rows if by_service else (rows or [self._normalize({})])
+
+    def series(self, db: Session, granularity: str, start: datetime, end: Optional[datetime] = None,
+               service_id: Optional[int] = None) -> Dict[datetime, Dict[str, Any]]:
+        """按时间段分组的汇总统计（单一粒度）"""
+        end = end or datetime.now()
+        conditions = [_rollups.c.granularity == granularity,
+                      _rollups.c.bucket_start >= truncate(start, granularity), _rollups.c.bucket_start < end]
+        if service_id:
+            conditions.append(_rollups.c.service_id == service_id)
+        query = select(
+            _rollups.c.bucket_start, *SUM_COLUMNS,
+            func.min(_rollups.c.response_time_min).label("response_time_min"),
+            func.max(_rollups.c.response_time_max).label("response_time_max")
+        ).where(*conditions).group_by(_rollups.c.bucket_start)
+        return {row["bucket_start"]: self._normalize(dict(row)) for row in db.execute(query).mappings()}
+
+    def histogram(self, db: Session, start: datetime, end: Optional[datetime] = None,
+                  service_id: Optional[int] = None) -> Dict[int, int]:
+        """时间范围内成功检查的响应时间分布：区间下界 -> 次数，只读取区间计数行"""
+        end = end or datetime.now()
+        query = select(_histograms.c.bucket, func.sum(_histograms.c.count)) \
+            .where(self._range_filter(_histograms, start, end, service_id)) \
+            .group_by(_histograms.c.bucket)
+        return {bucket: int(count or 0) for bucket, count in db.execute(query)}
+
+    def percentiles(self, db: Session, quantiles: Iterable[float], start: datetime, end: Optional[datetime] = None,
+                    service_ids: Optional[List[int]] = None, by_service: bool = False) -> Dict[str, Any]:
+        """
+        合并时间范围内的草图，计算成功检查响应时间的分位数
+
+        范围两端对齐到整点；读取的行数约为 服务数 × (天数 + 两端小时数)。
+        返回 {"count", "quantiles": {q: 值}}，by_service 时另有 "services": {服务ID: 同结构}。
+        """
+        end = end or datetime.now()
+        quantiles = sorted(set(quantiles))
+        condition = self._range_filter(_sketches, start, end, granularities=SKETCH_GRANULARITIES)
+        if service_ids:
+            condition = and_(_sketches.c.service_id.in_(service_ids), condition)
+        query = select(_sketches.c.service_id, _sketches.c.data).where(condition)
+
+        total = DDSketch(self.sketch_accuracy)
+        per_service: Dict[int, DDSketch] = {}
+        for service_id, data in db.execute(query):
+            sketch = DDSketch.from_bytes(data)
+            total.merge(sketch)
+            if by_service:
+                per_service.setdefault(service_id, DDSketch(self.sketch_accuracy)).merge(sketch)
+
+        result = {"count": total.count, "quantiles": total.quantiles(quantiles)}
+        if by_service:
+            result["services"] = {
+                service_id: {"count": sketch.count, "quantiles": sketch.quantiles(quantiles)}
+                for service_id, sketch in per_service.items()
+            }
+        return result
+
+    @staticmethod
+    def _normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+        """汇总结果补齐空值并计算平均值"""
+        for field in ADDITIVE_FIELDS:
+            row[field] = row.get(field) or 0
+        count = row["response_time_count"]
+        row["avg_response_time"] = row["response_time_sum"] / count if count else None
+        if count:
+            variance = max(0.0, row["response_time_sq_sum"] / count - row["avg_response_time"] ** 2)
+            row["stddev_response_time"] = variance ** 0.5
+        else:
+            row["stddev_response_time"] = None
+        success_count = row["success_response_time_count"]
+        row["avg_success_response_time"] = row["success_response_time_sum"] / success_count if success_count else None
+        for field in TIMING_FIELDS:
+            row[f"avg_{field}"] = row[f"{field}_sum"] / row[f"{field}_count"] if row[f"{field}_count"] else None
+        row.setdefault("response_time_min", None)
+        row.setdefault("response_time_max", None)
+        return row
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取汇总写入统计"""
+        return {
+            "enabled": self.enabled,
+            "applied_rows": self._applied_rows,
+            "apply_time_ms_avg": round(self._apply_time_total / self._applied_rows * 1000, 4) if self._applied_rows else 0,
+            "last_rebuild": self._last_rebuild,
+            "last_backfill": self._last_backfill
+        }
+
+
+# 创建全局统计汇总服务实例
+rollup_service = RollupService()
@@ -3,19 +3,236 @@
 """
 import asyncio
 import logging
-from datetime import datetime
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Set, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.asyncio import AsyncIOExecutor
 
+from app.core.config import settings
+from app.core.database import run_in_db_thread
 from app.services.monitor import monitor_service
+from app.services.probe_workers import probe_worker_pool
+from app.services.agent_lease import agent_lease_manager
+from app.services.service_registry import ProbeTarget, service_registry
+from app.services.cluster import cluster_membership
 
 logger = logging.getLogger(__name__)
 
 
+class TimingWheel:
+    """
+    哈希时间轮
+
+    时间按 tick 秒划分，任务按到期tick对槽数取模放入对应槽，每个槽是 key -> 任务 的字典，
+    添加、删除、修改间隔都是O(1)。每个tick只处理当前槽，槽内到期tick未到的任务
+    （间隔超过一圈）留在原槽等待下一圈。到期任务按间隔放回新的槽，并作为一批交给 dispatch。
+    事件循环被阻塞错过的tick会在下一次唤醒时补齐，同一批发出。
+
+    任务可以指定相位（间隔内的固定偏移，取值[0, 1)）：到期时刻对齐到
+    绝对时间（Unix时间）上 "间隔的整数倍 + 相位" 的刻度，重启后相位不变，
+    同间隔的任务按相位均匀分散在整个间隔内，而不是同时触发。
+    """
+
+    def __init__(self, tick: float, slots: int, dispatch: Callable[[List[Any]], Awaitable[None]]):
+        self.tick = tick
+        self._slots: List[Dict[Any, list]] = [dict() for _ in range(slots)]
+        self._entries: Dict[Any, list] = {}  # key -> [到期tick, 间隔tick数, 槽序号, 相位]
+        self._dispatch = dispatch
+        self._tick_no = 0
+        self._origin = time.monotonic()
+        self._epoch_tick = int(time.time() / tick)  # 第0个tick对应的绝对刻度
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计信息
+        self._dispatched = 0
+        self._batches = 0
+        self._lag_last = 0.0
+        self._lag_max = 0.0
+        self._lag_total = 0.0
+        self._expected_rate = 0.0  # 按间隔计算的理论每秒派发数
+        self._per_second = deque(maxlen=60)  # 最近60秒每秒派发数: [秒, 数量]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def _ticks(self, seconds: float) -> int:
+        return max(1, round(seconds / self.tick))
+
+    def _aligned_after(self, tick_no: int, interval_ticks: int, phase: float) -> int:
+        """tick_no之后第一个与相位对齐的tick"""
+        absolute = tick_no + self._epoch_tick
+        delta = (int(phase * interval_ticks) - absolute) % interval_ticks
+        return tick_no + (delta or interval_ticks)
+
+    def _place(self, key, due_tick: int, interval_ticks: int, phase: Optional[float]):
+        slot = due_tick % len(self._slots)
+        entry = [due_tick, interval_ticks, slot, phase]
+        self._slots[slot][key] = entry
+        self._entries[key] = entry
+
+    def add(self, key, interval: float, first_delay: float = None, phase: float = None):
+        """
+        添加任务；已存在时替换
+
+        Args:
+            first_delay: 首次到期前的等待秒数，为空时按相位对齐（未指定相位时等待一个间隔）
+            phase: 间隔内的固定相位，取值[0, 1)
+        """
+        self.remove(key)
+        interval_ticks = self._ticks(interval)
+        if first_delay is not None:
+            due_tick = self._tick_no + self._ticks(first_delay)
+        elif phase is not None:
+            due_tick = self._aligned_after(self._tick_no, interval_ticks, phase)
+        else:
+            due_tick = self._tick_no + interval_ticks
+        self._place(key, due_tick, interval_ticks, phase)
+        self._expected_rate += 1 / (interval_ticks * self.tick)
+
+    def remove(self, key) -> bool:
+        """删除任务"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._slots[entry[2]].pop(key, None)
+        self._expected_rate -= 1 / (entry[1] * self.tick)
+        return True
+
+    def set_interval(self, key, interval: float):
+        """修改任务间隔：有相位的任务对齐到新间隔的相位，否则新间隔比剩余等待时间短时提前到期"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        due_tick, _, _, phase = entry
+        interval_ticks = self._ticks(interval)
+        if phase is not None:
+            due_tick = self._aligned_after(self._tick_no, interval_ticks, phase)
+        else:
+            due_tick = min(due_tick, self._tick_no + interval_ticks)
+        self.remove(key)
+        self._place(key, due_tick, interval_ticks, phase)
+        self._expected_rate += 1 / (interval_ticks * self.tick)
+
+    def aligned_delay(self, interval: float, phase: float) -> float:
+        """按相位对齐的任务从现在起到首次到期的秒数"""
+        interval_ticks = self._ticks(interval)
+        return (self._aligned_after(self._tick_no, interval_ticks, phase) - self._tick_no) * self.tick
+
+    def interval_of(self, key) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[1] * self.tick if entry else None
+
+    def next_due(self, key) -> Optional[float]:
+        """任务下次到期的单调时钟时间"""
+        entry = self._entries.get(key)
+        return self._origin + entry[0] * self.tick if entry else None
+
+    def keys(self):
+        return self._entries.keys()
+
+    def _advance(self, tick_no: int) -> List[Any]:
+        """处理一个tick：取出当前槽中到期的任务并放回下一次到期的槽"""
+        slot = self._slots[tick_no % len(self._slots)]
+        due = [key for key, entry in slot.items() if entry[0] <= tick_no]
+        for key in due:
+            _, interval_ticks, _, phase = slot.pop(key)
+            if phase is not None:
+                next_tick = self._aligned_after(tick_no, interval_ticks, phase)
+            else:
+                next_tick = tick_no + interval_ticks
+            self._place(key, next_tick, interval_ticks, phase)
+        return due
+
+    def start(self):
+        if self._task is None:
+            self._origin = time.monotonic() - self._tick_no * self.tick
+            self._epoch_tick = int(time.time() / self.tick) - self._tick_no
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            delay = self._origin + (self._tick_no + 1) * self.tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            now = time.monotonic()
+            now_tick = int((now - self._origin) / self.tick)
+            first_tick = self._tick_no + 1
+            due = []
+            while self._tick_no < now_tick:
+                self._tick_no += 1
+                due.extend(self._advance(self._tick_no))
+            if not due:
+                continue
+
+            # 本批最早应到期的tick到实际发出的延迟
+            lag = now - (self._origin + first_tick * self.tick)
+            self._lag_last = lag
+            self._lag_max = max(self._lag_max, lag)
+            self._lag_total += lag
+            self._batches += 1
+            self._dispatched += len(due)
+            self._count_dispatched(int(now), len(due))
+            try:
+                await self._dispatch(due)
+            except Exception as e:
+                logger.error(f"时间轮批量派发失败: {str(e)}")
+
+    def _count_dispatched(self, second: int, count: int):
+        if self._per_second and self._per_second[-1][0] == second:
+            self._per_second[-1][1] += count
+        else:
+            self._per_second.append([second, count])
+
+    def dispatch_rate(self) -> Dict[str, Any]:
+        """最近一分钟每秒派发数"""
+        now = int(time.monotonic())
+        counts = {second: count for second, count in self._per_second if now - 60 <= second < now}
+        per_second = [counts.get(second, 0) for second in range(now - 60, now)]
+        return {
+            "expected_per_sec": round(self._expected_rate, 2),
+            "last_sec": per_second[-1],
+            "avg_per_sec_1m": round(sum(per_second) / len(per_second), 2),
+            "max_per_sec_1m": max(per_second)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取时间轮统计信息"""
+        return {
+            "entries": len(self._entries),
+            "tick_ms": round(self.tick * 1000),
+            "slots": len(self._slots),
+            "dispatched": self._dispatched,
+            "batches": self._batches,
+            "dispatch_rate": self.dispatch_rate(),
+            "dispatch_lag_ms": {
+                "last": round(self._lag_last * 1000, 2),
+                "avg": round(self._lag_total / self._batches * 1000, 2) if self._batches else 0,
+                "max": round(self._lag_max * 1000, 2)
+            }
+        }
+
+
 class SchedulerService:
-    """调度器服务类"""
+    """
+    调度器服务类
+
+    监控任务由时间轮调度，到期服务从进程内的探测目标注册表取出后提交探测，不读数据库。
+    服务增删改由接口通过 sync_service / remove_monitor_job 增量通知，
+    APScheduler只保留按updated_at水位线兜底同步的作业。
+    """
     
     def __init__(self):
         # 配置调度器
@@ -37,171 +254,298 @@ class SchedulerService:
             timezone='Asia/Shanghai'
         )
         
+        # 监控任务时间轮
+        self.wheel = TimingWheel(
+            tick=settings.SCHEDULER_TICK_MS / 1000,
+            slots=settings.SCHEDULER_WHEEL_SLOTS,
+            dispatch=self._dispatch_due
+        )
+        self._watermark: Optional[datetime] = None  # 已同步到的服务updated_at
+        self._loaded = False  # 是否已完成启动时的全量加载
+        self._last_sync_changes = 0
+        self._last_overdue = 0  # 最近一次全量加载时错过探测的服务数
+        # 自适应间隔：service_id -> [最近检查是否成功, 连续成功次数]
+        self._health: Dict[int, list] = {}
+        monitor_service.result_listeners.append(self._on_result)
+        
         self._running = False
     
     def start(self):
         """启动调度器"""
         if not self._running:
             self.scheduler.start()
+            self.wheel.start()
             self._running = True
             
-            # 添加定期刷新任务的作业
+            # 添加定期同步任务的作业，启动时立即全量加载一次
             self.scheduler.add_job(
                 func=self._refresh_monitor_jobs,
-                trigger=IntervalTrigger(minutes=1),  # 每分钟检查一次
+                trigger=IntervalTrigger(seconds=settings.SCHEDULER_SYNC_INTERVAL),
                 id='refresh_monitor_jobs',
                 name='刷新监控任务',
+                next_run_time=datetime.now(self.scheduler.timezone),
                 replace_existing=True
             )
             
             logger.info("调度器已启动")
     
     def shutdown(self):
-        """关闭调度器"""
+        """关闭调度器，清空监控任务和探测目标（失去主节点身份后可重新启动）"""
         if self._running:
             self.scheduler.shutdown()
+            self.wheel.stop()
+            for service_id in list(self.wheel.keys()):
+                self.wheel.remove(service_id)
+            service_registry.replace_all([])
+            self._health.clear()
+            self._watermark = None
+            self._loaded = False
             self._running = False
             logger.info("调度器已关闭")
     
     async def _refresh_monitor_jobs(self):
-        """刷新监控任务"""
+        """
+        同步探测目标和监控任务（增量同步的兜底）
+
+        服务增删改由接口直接通知调度器；这里启动时全量加载一次，之后只查询
+        updated_at 水位线之后变更过的服务，覆盖接口之外（如直接改库、其他进程）的变更。
+        删除的行不会出现在增量结果中，接口的通知也只到达处理请求的进程，
+        因此每次增量同步还读取全部活跃服务的ID，移除本地已不存在或已禁用的服务。
+        """
         try:
-            # 获取所有活跃的监控服务
-            services = await monitor_service.get_active_services()
-            
-            # 获取当前所有监控任务的ID
-            current_job_ids = set()
-            for job in self.scheduler.get_jobs():
-                if job.id.startswith('monitor_'):
-                    current_job_ids.add(job.id)
+            since = None
+            if self._loaded:
+                # 向前多查一段，避免漏掉提交较晚但updated_at较早的变更
+                since = (self._watermark - timedelta(seconds=settings.SCHEDULER_SYNC_OVERLAP)
+                         if self._watermark else datetime.min)
+            known = set(service_registry.ids())
+            targets, active_ids = await run_in_db_thread(self._load_targets, since)
+            if not self._running:
+                return
             
-            # 需要的任务ID
-            needed_job_ids = set()
+            for target in targets:
+                if target.updated_at and (self._watermark is None or target.updated_at > self._watermark):
+                    self._watermark = target.updated_at
+            self._last_sync_changes = len(targets)
             
-            for service in services:
-                job_id = f"monitor_{service.id}"
-                needed_job_ids.add(job_id)
-                
-                # 检查任务是否存在
-                existing_job = self.scheduler.get_job(job_id)
-                
-                if existing_job:
-                    # 检查间隔是否需要更新
-                    current_interval = existing_job.trigger.interval.total_seconds()
-                    if current_interval != service.interval:
-                        # 更新任务间隔
-                        self.scheduler.modify_job(
-                            job_id,
-                            trigger=IntervalTrigger(seconds=service.interval)
-                        )
-                        logger.info(f"更新监控任务间隔: {service.name} -> {service.interval}秒")
-                else:
-                    # 添加新的监控任务
-                    self.scheduler.add_job(
-                        func=self._monitor_job,
-                        trigger=IntervalTrigger(seconds=service.interval),
-                        args=[service.id],
-                        id=job_id,
-                        name=f"监控服务: {service.name}",
-                        replace_existing=True
-                    )
-                    logger.info(f"添加监控任务: {service.name}, 间隔: {service.interval}秒")
+            # 分片调度时只保留本节点负责的服务
+            owned = [target for target in targets if self._owns(target.id)]
+            if since is None:
+                # 全量加载时删除不再需要的任务；加载期间由接口新加入的任务保留
+                for service_id in known - {target.id for target in owned}:
+                    self.remove_monitor_job(service_id)
+                self._loaded = True
+            else:
+                for target in targets:
+                    if not self._owns(target.id):
+                        self.remove_monitor_job(target.id)
+                # 其他进程删除或禁用的服务；只处理查询前已在注册表中的，查询期间由接口新加入的保留
+                for service_id in known - active_ids:
+                    self.remove_monitor_job(service_id)
             
-            # 删除不再需要的任务
-            for job_id in current_job_ids - needed_job_ids:
-                self.scheduler.remove_job(job_id)
-                logger.info(f"删除监控任务: {job_id}")
+            # 全量加载（启动/重新分配）时新加入的任务按补探策略安排首次探测
+            delays = self._catchup_delays(owned) if since is None else {}
+            for target in owned:
+                self.sync_service(target, first_delay=delays.get(target.id))
                 
         except Exception as e:
             logger.error(f"刷新监控任务失败: {str(e)}")
     
-    async def _monitor_job(self, service_id: int):
-        """执行监控任务"""
+    @staticmethod
+    def _load_targets(since: Optional[datetime]) -> Tuple[List[ProbeTarget], Set[int]]:
+        """
+        读取探测目标和全部活跃服务的ID
+
+        since为空时读取全部活跃服务，否则读取该时间之后变更的服务（含已禁用），
+        另外只读取活跃服务的ID用于发现已删除的服务。
+        """
+        from app.core.database import SessionLocal
+        from app.models.service import MonitorService as ServiceModel
+        
+        db = SessionLocal()
         try:
-            # 获取服务信息
-            from app.core.database import SessionLocal
-            from app.models.service import MonitorService as ServiceModel
-            
-            db = SessionLocal()
-            try:
-                service = db.query(ServiceModel).filter(ServiceModel.id == service_id).first()
-                if not service or not service.is_active:
-                    logger.warning(f"服务不存在或已禁用: {service_id}")
-                    return
-                
-                # 预先访问所有可能需要的属性，避免懒加载问题
-                service_data = {
-                    "id": service.id,
-                    "name": service.name,
-                    "url": service.url,
-                    "method": service.method,
-                    "timeout": service.timeout,
-                    "status": service.status,
-                    "is_active": service.is_active,
-                    "enable_alert": service.enable_alert,
-                    "alert_methods": service.alert_methods,
-                    "last_check_time": service.last_check_time,
-                    "last_success_time": service.last_success_time,
-                    "created_at": service.created_at,
-                    "updated_at": service.updated_at
-                }
-                
-                # 从会话中分离对象
-                db.expunge(service)
-                
-            finally:
-                db.close()
-            
-            # 重新创建服务对象，避免会话绑定问题
-            detached_service = ServiceModel(**service_data)
-            
-            # 执行监控检查
-            logger.debug(f"执行监控任务: {detached_service.name}")
-            await monitor_service.check_and_alert(detached_service)
-            
-        except Exception as e:
-            logger.error(f"监控任务执行失败 (service_id: {service_id}): {str(e)}")
+            query = db.query(ServiceModel)
+            if since is None:
+                query = query.filter(ServiceModel.is_active == True)
+                targets = [ProbeTarget.from_model(service) for service in query.all()]
+                return targets, {target.id for target in targets}
+            query = query.filter(ServiceModel.updated_at >= since)
+            active_ids = {row[0] for row in db.query(ServiceModel.id).filter(ServiceModel.is_active == True)}
+            return [ProbeTarget.from_model(service) for service in query.all()], active_ids
+        finally:
+            db.close()
     
-    def add_monitor_job(self, service_id: int, service_name: str, interval: int):
-        """添加监控任务"""
-        job_id = f"monitor_{service_id}"
+    def _catchup_delays(self, targets: List[ProbeTarget]) -> Dict[int, float]:
+        """
+        计算错过探测的服务的补探等待时间
+
+        下次到期时间由 last_check_time 和相位推出，不需要额外持久化：相位对齐到绝对时间，
+        重启后未错过的服务仍按原来的时刻探测；last_check_time 距今已超过一个间隔
+        （或从未检查）的服务在停机期间错过了探测，按 SCHEDULER_CATCHUP_POLICY 处理：
+        skip 等到下一个相位时刻，run_once 下一个刻度立即补探，
+        spread 按最久未检查优先在 SCHEDULER_CATCHUP_WINDOW 秒内均匀补探
+        （相位时刻更早到来的不再单独补探）。
+        """
+        now = datetime.now()
+        overdue = [
+            target for target in targets
+            if target.id not in self.wheel and (
+                target.last_check_time is None
+                or (now - target.last_check_time).total_seconds() > target.interval
+            )
+        ]
+        self._last_overdue = len(overdue)
+        policy = settings.SCHEDULER_CATCHUP_POLICY
+        if not overdue or policy not in ("run_once", "spread"):
+            return {}
+        if policy == "run_once":
+            return {target.id: 0 for target in overdue}
         
-        self.scheduler.add_job(
-            func=self._monitor_job,
-            trigger=IntervalTrigger(seconds=interval),
-            args=[service_id],
-            id=job_id,
-            name=f"监控服务: {service_name}",
-            replace_existing=True
-        )
+        overdue.sort(key=lambda target: target.last_check_time or datetime.min)
+        delays = {}
+        step = settings.SCHEDULER_CATCHUP_WINDOW / len(overdue)
+        for index, target in enumerate(overdue):
+            delay = index * step
+            if delay < self.wheel.aligned_delay(target.interval, self.phase_of(target.id)):
+                delays[target.id] = delay
+        logger.info(f"{len(overdue)} 个服务错过探测，{len(delays)} 个在 {settings.SCHEDULER_CATCHUP_WINDOW} 秒内补探")
+        return delays
+    
+    def sync_service(self, service, probe_soon: bool = False, first_delay: float = None):
+        """
+        服务配置变更后增量更新探测目标和监控任务
+
+        Args:
+            service: 服务ORM对象（接口提交后调用）或探测目标
+            probe_soon: 新加入的任务是否在下一个刻度立即探测（新建/启用服务时）
+            first_delay: 新加入的任务首次探测前的等待秒数，为空时按相位对齐
+        """
+        if not self._running:
+            # 非主节点不运行调度，变更由主节点的兜底同步获取
+            return
+        target = service if isinstance(service, ProbeTarget) else ProbeTarget.from_model(service)
+        if not target.is_active or not self._owns(target.id):
+            # 分片调度时其他节点负责的服务由该节点的兜底同步获取
+            self.remove_monitor_job(target.id)
+            return
         
+        service_registry.upsert(target)
+        interval = self._effective_interval(target.id, target.interval)
+        if target.id in self.wheel:
+            if self.wheel.interval_of(target.id) != interval:
+                self.update_monitor_job(target.id, target.name, interval)
+        else:
+            self.add_monitor_job(target.id, target.name, interval, first_delay=0 if probe_soon else first_delay)
+    
+    def _on_result(self, service, result: Dict[str, Any]):
+        """探测结果回调：记录最近状态，自适应模式下按状态调整探测间隔"""
+        if not settings.ADAPTIVE_INTERVAL_ENABLED or service.id not in self.wheel:
+            return
+        state = self._health.get(service.id)
+        if state is None:
+            state = self._health[service.id] = [deque(maxlen=settings.ADAPTIVE_FLAP_WINDOW), 0]
+        success = result["status"] == "success"
+        state[0].append(success)
+        state[1] = state[1] + 1 if success else 0
+        
+        interval = self._effective_interval(service.id, service.interval)
+        if self.wheel.interval_of(service.id) != interval:
+            self.wheel.set_interval(service.id, interval)
+            logger.info(f"调整探测间隔: {service.name}, {self._adaptive_mode(service.id) or 'normal'}, "
+                        f"{service.interval}秒 -> {interval}秒")
+    
+    def _adaptive_mode(self, service_id: int) -> Optional[str]:
+        """服务当前的自适应状态：flapping 抖动，failing 异常，stable 长期稳定，None 按配置间隔"""
+        state = self._health.get(service_id)
+        if not settings.ADAPTIVE_INTERVAL_ENABLED or not state or not state[0]:
+            return None
+        recent, streak = state
+        history = list(recent)
+        if sum(1 for previous, current in zip(history, history[1:]) if previous != current) >= settings.ADAPTIVE_FLAP_CHANGES:
+            return "flapping"
+        if not history[-1]:
+            return "failing"
+        if streak >= settings.ADAPTIVE_STABLE_CHECKS:
+            return "stable"
+        return None
+    
+    def _effective_interval(self, service_id: int, interval: int) -> int:
+        """
+        服务实际使用的探测间隔（秒）
+
+        异常或抖动时按 ADAPTIVE_FAILURE_FACTOR 加快（不低于 ADAPTIVE_MIN_INTERVAL），尽快发现恢复；
+        每连续成功 ADAPTIVE_STABLE_CHECKS 次间隔翻倍，最多 ADAPTIVE_MAX_FACTOR 倍且不超过
+        ADAPTIVE_MAX_INTERVAL；恢复成功后回到配置间隔。
+        """
+        mode = self._adaptive_mode(service_id)
+        if mode in ("failing", "flapping"):
+            return min(interval, max(settings.ADAPTIVE_MIN_INTERVAL, round(interval * settings.ADAPTIVE_FAILURE_FACTOR)))
+        if mode == "stable":
+            factor = min(settings.ADAPTIVE_MAX_FACTOR, 2 ** (self._health[service_id][1] // settings.ADAPTIVE_STABLE_CHECKS))
+            return max(interval, min(settings.ADAPTIVE_MAX_INTERVAL, round(interval * factor)))
+        return interval
+    
+    @staticmethod
+    def _owns(service_id: int) -> bool:
+        """本节点是否负责该服务（未启用分片调度时负责全部服务）"""
+        return not settings.SCHEDULER_SHARDING_ENABLED or cluster_membership.owns(service_id)
+    
+    async def rebalance(self):
+        """分片调度节点变化后全量重新加载本节点负责的服务"""
+        if not self._running:
+            return
+        self._loaded = False
+        self._watermark = None
+        await self._refresh_monitor_jobs()
+        logger.info(f"重新分配后本节点负责 {len(service_registry)} 个服务")
+    
+    async def _dispatch_due(self, service_ids: List[int]):
+        """批量执行到期的监控任务，探测目标直接取自注册表，不读数据库"""
+        for service_id in service_ids:
+            target = service_registry.get(service_id)
+            if target is None:
+                # 已删除或已禁用的服务直接移出时间轮
+                logger.warning(f"服务不存在或已禁用: {service_id}")
+                self.remove_monitor_job(service_id)
+                continue
+            self._submit(target)
+    
+    @staticmethod
+    def _submit(service):
+        """提交到探测调度器（或多进程工作池、远程探测节点），由其控制并发并排队执行"""
+        logger.debug(f"提交监控任务: {service.name}")
+        if settings.PROBE_EXECUTION == "agent":
+            agent_lease_manager.enqueue(service)
+        elif probe_worker_pool.enabled:
+            probe_worker_pool.submit(service)
+        else:
+            monitor_service.dispatcher.submit(service)
+    
+    @staticmethod
+    def phase_of(service_id: int) -> float:
+        """服务在间隔内的固定相位：按ID做乘法哈希，连续ID也能均匀分散"""
+        return ((service_id * 2654435761) & 0xFFFFFFFF) / 2 ** 32
+    
+    def add_monitor_job(self, service_id: int, service_name: str, interval: int, first_delay: float = None):
+        """添加监控任务，按服务相位分散到整个间隔内执行"""
+        self.wheel.add(service_id, interval, first_delay, phase=self.phase_of(service_id))
         logger.info(f"添加监控任务: {service_name}, 间隔: {interval}秒")
     
     def remove_monitor_job(self, service_id: int):
-        """删除监控任务"""
-        job_id = f"monitor_{service_id}"
-        
-        try:
-            self.scheduler.remove_job(job_id)
-            logger.info(f"删除监控任务: {job_id}")
-        except Exception as e:
-            logger.warning(f"删除监控任务失败: {job_id}, 错误: {str(e)}")
+        """删除监控任务和探测目标"""
+        if self.wheel.remove(service_id):
+            logger.info(f"删除监控任务: monitor_{service_id}")
+        service_registry.remove(service_id)
+        self._health.pop(service_id, None)
     
     def update_monitor_job(self, service_id: int, service_name: str, interval: int):
         """更新监控任务"""
-        job_id = f"monitor_{service_id}"
-        
-        try:
-            self.scheduler.modify_job(
-                job_id,
-                trigger=IntervalTrigger(seconds=interval),
-                name=f"监控服务: {service_name}"
-            )
-            logger.info(f"更新监控任务: {service_name}, 新间隔: {interval}秒")
-        except Exception as e:
-            logger.warning(f"更新监控任务失败: {job_id}, 错误: {str(e)}")
-            # 如果更新失败，尝试重新添加
+        if service_id not in self.wheel:
+            # 任务不存在时重新添加
             self.add_monitor_job(service_id, service_name, interval)
+            return
+        self.wheel.set_interval(service_id, interval)
+        logger.info(f"更新监控任务: {service_name}, 新间隔: {interval}秒")
     
     def get_job_status(self) -> dict:
         """获取任务状态"""
@@ -214,9 +558,46 @@ class SchedulerService:
                 "trigger": str(job.trigger)
             })
         
+        # 多进程工作池模式下重叠跳过发生在工作进程内，使用工作池汇总的统计
+        overlap_source = probe_worker_pool if probe_worker_pool.enabled else monitor_service.dispatcher
+        
+        # 单调时钟换算为本地时间
+        offset = datetime.now() - timedelta(seconds=time.monotonic())
+        adaptive = {"failing": 0, "flapping": 0, "stable": 0}
+        for service_id in self.wheel.keys():
+            target = service_registry.get(service_id)
+            mode = self._adaptive_mode(service_id)
+            if mode:
+                adaptive[mode] += 1
+            jobs.append({
+                "id": f"monitor_{service_id}",
+                "name": f"监控服务: {target.name if target else service_id}",
+                "next_run_time": (offset + timedelta(seconds=self.wheel.next_due(service_id))).isoformat(),
+                "trigger": f"interval[{timedelta(seconds=self.wheel.interval_of(service_id))}]",
+                "interval": target.interval if target else None,
+                "effective_interval": self.wheel.interval_of(service_id),
+                "adaptive": mode,
+                "skipped": overlap_source.skipped_of(service_id)
+            })
+        
         return {
             "running": self._running,
             "total_jobs": len(jobs),
+            "wheel": self.wheel.get_stats(),
+            "registry": service_registry.get_stats(),
+            "cluster": cluster_membership.get_stats(),
+            "sync": {
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+                "last_changes": self._last_sync_changes
+            },
+            "adaptive": {"enabled": settings.ADAPTIVE_INTERVAL_ENABLED, **adaptive},
+            "overlap": probe_worker_pool.overlap_stats() if probe_worker_pool.enabled
+            else monitor_service.dispatcher.get_stats()["overlap"],
+            "catchup": {
+                "policy": settings.SCHEDULER_CATCHUP_POLICY,
+                "window": settings.SCHEDULER_CATCHUP_WINDOW,
+                "last_overdue": self._last_overdue
+            },
             "jobs": jobs
         }
 
@@ -0,0 +1,95 @@
+"""
+探测目标注册表
+"""
+import logging
+from typing import Dict, Optional, List, Iterable
+
+from app.models.service import MonitorService as ServiceModel
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeTarget:
+    """
+    探测目标
+
+    只包含探测、入库和告警需要的服务字段，字段名与 MonitorService 模型一致，
+    可以直接交给探测调度器、多进程工作池、远程探测节点和告警服务使用。
+    status 为最近一次检查的状态，由 process_result 在内存中更新，用于判定告警/恢复。
+    """
+
+    FIELDS = (
+        "id", "name", "url", "method", "timeout", "interval", "max_response_size", "http2", "priority",
+        "is_active", "status", "enable_alert", "alert_methods", "alert_contacts",
+        "description", "last_check_time", "updated_at"
+    )
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for field in self.FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def from_model(cls, service: ServiceModel) -> "ProbeTarget":
+        """从ORM对象创建（需在会话内调用）"""
+        return cls(**{field: getattr(service, field) for field in cls.FIELDS})
+
+    def __repr__(self):
+        return f"<ProbeTarget(id={self.id}, name='{self.name}', url='{self.url}')>"
+
+
+class ServiceRegistry:
+    """
+    进程内的探测目标注册表
+
+    由调度器维护：启动时全量加载活跃服务，之后由服务增删改接口和按updated_at的兜底同步
+    增量更新，updated_at 作为版本号，未变化的记录不会覆盖。探测时直接从这里取目标，不再读库。
+    """
+
+    def __init__(self):
+        self._targets: Dict[int, ProbeTarget] = {}
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def __contains__(self, service_id: int) -> bool:
+        return service_id in self._targets
+
+    def get(self, service_id: int) -> Optional[ProbeTarget]:
+        return self._targets.get(service_id)
+
+    def ids(self) -> Iterable[int]:
+        return self._targets.keys()
+
+    def upsert(self, target: ProbeTarget) -> bool:
+        """
+        写入探测目标，返回是否有变化
+
+        已存在的目标保留内存中的状态（写缓冲模式下数据库中的状态可能稍旧）。
+        """
+        current = self._targets.get(target.id)
+        if current is not None:
+            if (target.updated_at is not None and current.updated_at is not None
+                    and target.updated_at < current.updated_at):
+                return False
+            if all(getattr(current, field) == getattr(target, field)
+                   for field in ProbeTarget.FIELDS if field not in ("status", "last_check_time")):
+                return False
+            target.status = current.status
+            target.last_check_time = current.last_check_time
+        self._targets[target.id] = target
+        return True
+
+    def remove(self, service_id: int) -> Optional[ProbeTarget]:
+        return self._targets.pop(service_id, None)
+
+    def replace_all(self, targets: List[ProbeTarget]):
+        """全量加载后替换注册表"""
+        self._targets = {target.id: target for target in targets}
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"targets": len(self._targets)}
+
+
+# 创建全局探测目标注册表实例
+service_registry = ServiceRegistry()
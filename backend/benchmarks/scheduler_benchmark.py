@@ -0,0 +1,113 @@
+"""
+监控任务时间轮基准测试
+
+模拟大量服务（默认5万个，间隔10s~5min随机）在时间轮上运行，
+统计添加/删除耗时、每批派发延迟、每秒派发数和事件循环延迟，按时间窗口输出以观察是否稳定。
+加 --no-phase 对比不分散相位（同一批加入的同间隔服务同时触发）时的突发情况。
+
+用法（在backend目录下）:
+    python -m benchmarks.scheduler_benchmark --services 50000 --duration 60
+    python -m benchmarks.scheduler_benchmark --services 50000 --duration 60 --no-phase
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+# 基准测试不访问数据库
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.scheduler import TimingWheel, SchedulerService
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def run(services: int, duration: float, tick_ms: int, slots: int, window: float, phased: bool):
+    batches = []  # (时间, 批大小, 派发延迟ms)
+
+    async def dispatch(keys):
+        # 模拟按批提交探测的开销
+        for _ in keys:
+            pass
+
+    wheel = TimingWheel(tick=tick_ms / 1000, slots=slots, dispatch=dispatch)
+    intervals = [10, 30, 60, 120, 300]
+
+    started = time.perf_counter()
+    for service_id in range(services):
+        phase = SchedulerService.phase_of(service_id) if phased else None
+        wheel.add(service_id, random.choice(intervals), phase=phase)
+    add_us = (time.perf_counter() - started) / services * 1e6
+
+    started = time.perf_counter()
+    for service_id in range(0, services, 10):
+        phase = SchedulerService.phase_of(service_id) if phased else None
+        wheel.remove(service_id)
+        wheel.add(service_id, random.choice(intervals), phase=phase)
+    churn_us = (time.perf_counter() - started) / (services // 10) * 1e6
+    print(f"服务数: {services}, 添加: {add_us:.2f}us/个, 删除+重新添加: {churn_us:.2f}us/个")
+
+    # 记录每批派发延迟
+    original_dispatch = wheel._dispatch
+
+    async def recording_dispatch(keys):
+        batches.append((time.monotonic(), len(keys), wheel.get_stats()["dispatch_lag_ms"]["last"]))
+        await original_dispatch(keys)
+
+    wheel._dispatch = recording_dispatch
+
+    loop_lags = []
+
+    async def sample_loop():
+        while True:
+            expected = time.perf_counter() + 0.05
+            await asyncio.sleep(0.05)
+            loop_lags.append((time.monotonic(), max(0.0, (time.perf_counter() - expected) * 1000)))
+
+    sampler = asyncio.create_task(sample_loop())
+    wheel.start()
+    begin = time.monotonic()
+    await asyncio.sleep(duration)
+    wheel.stop()
+    sampler.cancel()
+
+    print(f"理论每秒派发数: {wheel.dispatch_rate()['expected_per_sec']}")
+    print(f"{'窗口':>10} {'派发数':>8} {'批次':>6} {'每秒max':>8} {'延迟p50':>9} {'延迟p99':>9} {'延迟max':>9} {'循环p99':>9}")
+    for window_start in range(0, int(duration), int(window)):
+        low, high = begin + window_start, begin + window_start + window
+        window_batches = [b for b in batches if low <= b[0] < high]
+        lags = [b[2] for b in window_batches]
+        loop_window = [lag for t, lag in loop_lags if low <= t < high]
+        per_second = {}
+        for t, size, _ in window_batches:
+            per_second[int(t - begin)] = per_second.get(int(t - begin), 0) + size
+        print(f"{window_start:>5}-{window_start + int(window):<4} {sum(b[1] for b in window_batches):>8} "
+              f"{len(window_batches):>6} {max(per_second.values(), default=0):>8} {percentile(lags, 0.5):>8.2f}ms {percentile(lags, 0.99):>8.2f}ms "
+              f"{max(lags, default=0):>8.2f}ms {percentile(loop_window, 0.99):>8.2f}ms")
+
+    stats = wheel.get_stats()
+    all_lags = [b[2] for b in batches]
+    print(f"总计派发: {stats['dispatched']}, 批次: {stats['batches']}, "
+          f"平均批大小: {statistics.mean(b[1] for b in batches) if batches else 0:.1f}, "
+          f"派发延迟 p99: {percentile(all_lags, 0.99):.2f}ms, max: {stats['dispatch_lag_ms']['max']:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监控任务时间轮基准测试")
+    parser.add_argument("--services", type=int, default=50000, help="服务数")
+    parser.add_argument("--duration", type=float, default=60, help="运行时长（秒）")
+    parser.add_argument("--tick-ms", type=int, default=250, help="时间轮刻度（毫秒）")
+    parser.add_argument("--slots", type=int, default=4096, help="时间轮槽数")
+    parser.add_argument("--window", type=float, default=10, help="统计窗口（秒）")
+    parser.add_argument("--no-phase", action="store_true", help="不分散相位")
+    args = parser.parse_args()
+    asyncio.run(run(args.services, args.duration, args.tick_ms, args.slots, args.window, not args.no_phase))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,13 @@ from app.api.routes import api_router
 from app.services.scheduler import scheduler_service
 from app.services.maintenance_scheduler import maintenance_scheduler
 from app.services.monitor import monitor_service
+from app.services.probe_workers import probe_worker_pool
+from app.services.agent_lease import agent_lease_manager
+from app.services.result_sink import result_sink
+from app.services.loop_monitor import loop_monitor
 from app.services.alert import alert_service
+from app.services.leader import scheduler_leader
+from app.services.cluster import cluster_membership
 
 # 配置日志 - 移除emoji字符避免Windows编码问题
 logging.basicConfig(
@@ -32,22 +38,70 @@ logger = logging.getLogger(__name__)
 shutdown_event = asyncio.Event()
 
 
+def start_probe_workers():
+    """启动探测工作进程（PROBE_WORKER_PROCESSES > 0 且在本机探测时），只在运行监控调度器的节点上启动"""
+    if settings.PROBE_WORKER_PROCESSES > 0 and settings.PROBE_EXECUTION != "agent":
+        probe_worker_pool.start()
+        logger.info(f"探测工作池已启动，进程数: {settings.PROBE_WORKER_PROCESSES}")
+
+
+async def start_schedulers():
+    """启动维护调度器和监控调度器（启用选主时只在主节点上运行；分片调度时监控调度器在每个节点运行）"""
+    if not settings.SCHEDULER_SHARDING_ENABLED:
+        start_probe_workers()
+        scheduler_service.start()
+        logger.info("监控调度器已启动")
+    
+    await maintenance_scheduler.start()
+    logger.info("维护调度器已启动")
+
+
+async def stop_schedulers():
+    """停止维护调度器和监控调度器"""
+    if not settings.SCHEDULER_SHARDING_ENABLED:
+        scheduler_service.shutdown()
+        await probe_worker_pool.stop()
+        logger.info("监控调度器已停止")
+    
+    await maintenance_scheduler.stop()
+    logger.info("维护调度器已停止")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     logger.info("启动业务监控平台...")
     
     try:
+        # 远程探测节点可以写入探测结果并触发告警，必须配置访问令牌
+        if settings.PROBE_EXECUTION == "agent" and not settings.AGENT_TOKEN:
+            raise RuntimeError("PROBE_EXECUTION=agent 时必须设置 AGENT_TOKEN")
+        # 任务租约保存在进程内存中，多个工作进程时节点领取和回传可能落到不同进程
+        if settings.PROBE_EXECUTION == "agent" and settings.WORKERS > 1:
+            raise RuntimeError("PROBE_EXECUTION=agent 时 WORKERS 必须为1（任务租约保存在进程内存中）")
+        
         # 初始化数据库
         await init_db()
         
-        # 启动调度器
-        scheduler_service.start()
-        logger.info("监控调度器已启动")
+        # 启动事件循环延迟监控
+        loop_monitor.start()
+        
+        # 启动探测结果写缓冲
+        if settings.RESULT_SINK_ENABLED:
+            result_sink.start()
+        
+        # 分片调度：每个节点加入哈希环后只调度自己负责的服务
+        if settings.SCHEDULER_SHARDING_ENABLED:
+            start_probe_workers()
+            await cluster_membership.start(on_change=scheduler_service.rebalance)
+            scheduler_service.start()
+            logger.info("监控调度器已启动（分片调度）")
         
-        # 启动维护调度器
-        await maintenance_scheduler.start()
-        logger.info("维护调度器已启动")
+        # 启动调度器：启用选主时由当选的主节点启动，多个工作进程/副本只有一个在调度
+        if settings.LEADER_ELECTION_ENABLED:
+            scheduler_leader.start(on_elected=start_schedulers, on_demoted=stop_schedulers)
+        else:
+            await start_schedulers()
         
         # 设置信号处理器
         def signal_handler(signum, frame):
@@ -69,18 +123,28 @@ async def lifespan(app: FastAPI):
         logger.info("开始关闭业务监控平台...")
         
         try:
-            # 停止调度器
-            scheduler_service.shutdown()
-            logger.info("监控调度器已停止")
+            # 停止调度器，主节点同时释放租约以便其他节点立即接管
+            if settings.LEADER_ELECTION_ENABLED:
+                await scheduler_leader.stop()
+            else:
+                await stop_schedulers()
+            if settings.SCHEDULER_SHARDING_ENABLED:
+                scheduler_service.shutdown()
+                await cluster_membership.stop()
+                logger.info("监控调度器已停止（分片调度）")
             
-            # 停止维护调度器
-            await maintenance_scheduler.stop()
-            logger.info("维护调度器已停止")
+            # 停止探测工作进程
+            await probe_worker_pool.stop()
             
             # 关闭监控服务HTTP客户端
             await monitor_service.close()
             logger.info("监控服务HTTP客户端已关闭")
             
+            # 写入剩余的探测结果
+            await result_sink.stop()
+            
+            await loop_monitor.stop()
+            
             # 关闭告警服务HTTP客户端
             await alert_service.close()
             logger.info("告警服务HTTP客户端已关闭")
@@ -146,6 +210,10 @@ async def health_check():
             "service": "business-monitor",
             "database_pool": pool_status,
             "monitor_service": monitor_info,
+            "probe_workers": probe_worker_pool.get_stats(),
+            "result_sink": result_sink.get_stats(),
+            "event_loop": loop_monitor.get_stats(),
+            "leader": scheduler_leader.get_stats(),
             "scheduler": {
                 "monitor_scheduler_running": scheduler_status["running"],
                 "monitor_jobs": scheduler_status["total_jobs"],
@@ -190,6 +258,12 @@ async def system_status():
             },
             "services": {
                 "monitor_service": monitor_info,
+                "probe_workers": probe_worker_pool.get_stats(),
+                "probe_agents": agent_lease_manager.get_stats(),
+                "result_sink": result_sink.get_stats(),
+                "event_loop": loop_monitor.get_stats(),
+                "leader": scheduler_leader.get_stats(),
+                "cluster": cluster_membership.get_stats(),
                 "scheduler_service": scheduler_status,
                 "maintenance_service": maintenance_status
             }
@@ -208,9 +282,16 @@ async def graceful_shutdown():
     
     # 执行清理工作
     try:
-        scheduler_service.shutdown()
-        await maintenance_scheduler.stop()
+        if settings.LEADER_ELECTION_ENABLED:
+            await scheduler_leader.stop()
+        else:
+            await stop_schedulers()
+        if settings.SCHEDULER_SHARDING_ENABLED:
+            scheduler_service.shutdown()
+            await cluster_membership.stop()
+        await probe_worker_pool.stop()
         await monitor_service.close()
+        await result_sink.stop()
         await alert_service.close()
     except Exception as e:
         logger.error(f"优雅关闭过程中出错: {str(e)}")
@@ -227,7 +308,7 @@ if __name__ == "__main__":
             log_level="info",
             access_log=True,
             # 添加工作进程和连接限制
-            workers=1,  # 单进程模式，避免多进程间的资源竞争
+            workers=settings.WORKERS,  # 多进程时通过数据库租约选主，只有主节点运行调度器
             limit_concurrency=1000,  # 限制并发连接数
             limit_max_requests=10000,  # 限制每个worker处理的最大请求数
             timeout_keep_alive=30,  # Keep-alive超时时间
@@ -0,0 +1,24 @@
+"""
+测试公共配置
+"""
+import os
+import sys
+
+# 测试使用内存SQLite，不依赖MySQL
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DEBUG", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def db_tables():
+    """在内存SQLite中建表，测试结束后删除（只在当前线程的连接中可见）"""
+    import app.models  # noqa: F401 注册全部模型
+    from app.core.database import Base, engine
+
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
@@ -0,0 +1,49 @@
+"""
+远程探测节点租约和结果校验测试
+"""
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.service import MonitorService as ServiceModel
+from app.schemas.agent import AgentResultItem
+from app.services.agent_lease import AgentLeaseManager
+
+
+def result_item(**result):
+    return {"lease_id": "bj-01-1", "service_id": 1, "result": result}
+
+
+@pytest.mark.parametrize("result", [
+    {"status": "ok"},
+    {"status": "success", "response_time": "fast"},
+    {"status": "success", "response_time": -1},
+    {"status": "success", "status_code": [200]},
+    {"status": "failed", "error_type": "x" * 51},
+    {"status": "success", "check_time": datetime(2026, 1, 1, tzinfo=timezone.utc).isoformat()},
+    {"response_time": 10.0},
+])
+def test_invalid_results_are_rejected(result):
+    with pytest.raises(ValidationError):
+        AgentResultItem.model_validate(result_item(**result))
+
+
+def test_complete_returns_validated_result():
+    manager = AgentLeaseManager(lease_timeout=60, max_lease_size=10, max_queue_size=10)
+    manager.enqueue(ServiceModel(id=1, name="api", url="http://example.com"))
+    lease = manager.lease("bj-01", 10)
+
+    item = AgentResultItem.model_validate({
+        "lease_id": lease["lease_id"],
+        "service_id": 1,
+        "result": {"status": "success", "response_time": "12.5", "check_time": "2026-01-01T10:00:00",
+                   "service_id": 99, "probe_node": "other", "alert_sent": True, "unknown": 1}
+    })
+    service, result = manager.complete("bj-01", item.lease_id, item.service_id, item.result)
+    assert service.id == 1
+    assert result == {"status": "success", "response_time": 12.5, "check_time": datetime(2026, 1, 1, 10),
+                      "service_id": 1, "probe_node": "bj-01"}
+
+    # 同一结果重复回传按迟到结果忽略
+    assert manager.complete("bj-01", item.lease_id, item.service_id, item.result) is None
@@ -0,0 +1,64 @@
+"""
+持续异常时的告警频率测试
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.services import monitor as monitor_module
+from app.services.monitor import MonitorService
+
+
+class FakeSink:
+    running = True
+
+    async def put(self, result):
+        pass
+
+
+def simulate(monkeypatch, statuses, step, interval=60):
+    """按 step 秒一次的探测依次处理 statuses，返回每次结果的通知类型"""
+    clock = {"now": 1000.0}
+    sent = []
+
+    async def send_alert(service, result):
+        sent.append("alert")
+
+    async def send_recovery_alert(service, result):
+        sent.append("recovery")
+
+    monkeypatch.setattr(monitor_module.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(monitor_module, "result_sink", FakeSink())
+    monkeypatch.setattr(monitor_module.alert_service, "send_alert", send_alert)
+    monkeypatch.setattr(monitor_module.alert_service, "send_recovery_alert", send_recovery_alert)
+
+    monitor = MonitorService()
+    service = SimpleNamespace(id=1, name="svc", enable_alert=True, alert_methods="email",
+                              status="success", interval=interval)
+
+    async def run():
+        decisions = []
+        for status in statuses:
+            sent.clear()
+            await monitor.process_result(service, {"status": status, "check_time": None})
+            decisions.append(sent[0] if sent else None)
+            clock["now"] += step
+        await monitor.close()
+        return decisions
+
+    return asyncio.run(run())
+
+
+def test_fast_reprobe_alerts_at_configured_cadence(monkeypatch):
+    # 间隔60秒的服务异常后按15秒复探，仍只每60秒告警一次
+    decisions = simulate(monkeypatch, ["failed"] * 9, step=15)
+    assert decisions == ["alert", None, None, None, "alert", None, None, None, "alert"]
+
+
+def test_normal_cadence_alerts_every_failed_check(monkeypatch):
+    decisions = simulate(monkeypatch, ["failed", "timeout", "failed"], step=60)
+    assert decisions == ["alert", "alert", "alert"]
+
+
+def test_recovery_resets_alert_timer(monkeypatch):
+    decisions = simulate(monkeypatch, ["failed", "success", "failed", "failed"], step=15)
+    assert decisions == ["alert", "recovery", "alert", None]
@@ -0,0 +1,98 @@
+"""
+日志分区和数据清理测试
+"""
+import asyncio
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import insert, select, func
+
+from app.core.database import get_db_session
+from app.models.monitor_log import MonitorLog
+from app.models.rollup import MonitorRollup
+from app.services.data_cleanup import DataCleanupService, _to_days, _from_days, _partition_name
+from app.services.rollup import rollup_service
+
+
+def test_to_days_matches_mysql():
+    # MySQL文档示例: TO_DAYS('2007-10-07') = 733321
+    assert _to_days(date(2007, 10, 7)) == 733321
+    assert _from_days(733321) == date(2007, 10, 7)
+    assert _from_days(_to_days(date(2028, 2, 29))) == date(2028, 2, 29)
+
+
+def test_daily_partitions_cross_month():
+    definitions = DataCleanupService._daily_partitions(date(2028, 2, 28), date(2028, 3, 1))
+    assert definitions == [
+        "PARTITION p20280228 VALUES LESS THAN (TO_DAYS('2028-02-29'))",
+        "PARTITION p20280229 VALUES LESS THAN (TO_DAYS('2028-03-01'))",
+        "PARTITION p20280301 VALUES LESS THAN (TO_DAYS('2028-03-02'))",
+    ]
+    assert DataCleanupService._daily_partitions(date(2026, 1, 2), date(2026, 1, 1)) == []
+
+
+def test_expired_partitions_stop_at_cutoff_day():
+    partitions = [
+        ("p0", _to_days(date(2026, 1, 1))),
+        (_partition_name(date(2026, 1, 1)), _to_days(date(2026, 1, 2))),
+        (_partition_name(date(2026, 1, 2)), _to_days(date(2026, 1, 3))),
+        ("pmax", None),
+    ]
+    # 截止时间在1月2日当天：1月2日分区还有未过期的数据，只删除更早的分区
+    expired = DataCleanupService.expired_of(partitions, datetime(2026, 1, 2, 15, 30))
+    assert [name for name, _ in expired] == ["p0", "p20260101"]
+
+    # 全部过期时仍保留最后一个有上界的分区和 pmax
+    expired = DataCleanupService.expired_of(partitions, datetime(2027, 1, 1))
+    assert [name for name, _ in expired] == ["p0", "p20260101"]
+    assert DataCleanupService.expired_of(partitions, datetime(2025, 12, 31, 23)) == []
+
+
+def test_first_partition_day_uses_retention():
+    today = date(2026, 10, 17)
+    assert DataCleanupService._first_partition_day(datetime(2026, 1, 1, 8), 30, today) == date(2026, 9, 17)
+    assert DataCleanupService._first_partition_day(datetime(2026, 10, 1, 8), 30, today) == date(2026, 10, 1)
+    assert DataCleanupService._first_partition_day(None, 30, today) == today
+
+
+def test_delete_service_data(db_tables):
+    rows = [
+        {"service_id": service_id, "check_time": datetime(2026, 10, 17, 10, minute), "status": "success",
+         "response_time": 100.0, "alert_sent": False}
+        for service_id in (1, 2) for minute in range(5)
+    ]
+    with get_db_session() as db:
+        db.execute(insert(MonitorLog), rows)
+    rollup_service.apply_batch(rows)
+
+    service = DataCleanupService()
+    service.batch_size = 2
+    result = service.delete_service_data(1)
+
+    assert result["log_rows"] == 5
+    assert result["rollup_rows"] > 0
+    with get_db_session() as db:
+        remaining_logs = db.execute(select(MonitorLog.service_id, func.count()).group_by(MonitorLog.service_id)).all()
+        remaining_rollups = set(db.execute(select(MonitorRollup.service_id)).scalars())
+    assert remaining_logs == [(2, 5)]
+    assert remaining_rollups == {2}
+
+
+
+def test_cleanup_endpoint_runs_off_event_loop(monkeypatch):
+    from app.api.endpoints import monitor_logs
+
+    calls = []
+
+    def cleanup_old_logs(retention_days, dry_run, service_id):
+        calls.append((threading.current_thread(), retention_days, dry_run))
+        return {"cutoff_date": datetime(2026, 1, 1).isoformat(), "total_count": 3, "deleted_count": 3}
+
+    monkeypatch.setattr(monitor_logs.data_cleanup_service, "cleanup_old_logs", cleanup_old_logs)
+    result = asyncio.run(monitor_logs.cleanup_old_logs(days_to_keep=90, dry_run=False))
+
+    # 统计和删除在线程池中执行
+    assert calls[0][0] is not threading.main_thread()
+    assert calls[0][1:] == (90, False)
+    assert result["deleted_count"] == 3
+    assert result["dropped_partitions"] == []
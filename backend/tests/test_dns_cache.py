@@ -0,0 +1,125 @@
+"""
+探测DNS缓存测试
+"""
+import asyncio
+
+import httpcore
+import httpx
+import pytest
+
+from app.services.dns_cache import AsyncDNSCache, CachedDNSTransport
+
+
+class CountingCache(AsyncDNSCache):
+    """不访问网络的缓存，解析结果和耗时由测试控制"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.fail = fail
+        self.lookups = []
+
+    async def _lookup(self, host):
+        self.lookups.append(host)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            error = f"DNS解析失败: {host}"
+            self._store(host, [], self.negative_ttl, error)
+            return [], error
+        addresses = ["10.0.0.1"]
+        self._store(host, addresses, self.default_ttl, None)
+        return addresses, None
+
+
+def test_ip_literal_is_not_looked_up():
+    cache = CountingCache()
+    assert asyncio.run(cache.resolve("127.0.0.1")) == ["127.0.0.1"]
+    assert cache.lookups == []
+
+
+def test_positive_and_negative_entries_are_cached():
+    async def scenario():
+        ok = CountingCache()
+        await ok.resolve("a.example")
+        await ok.resolve("a.example")
+
+        bad = CountingCache(fail=True)
+        for _ in range(2):
+            with pytest.raises(httpcore.ConnectError):
+                await bad.resolve("missing.example")
+        return ok, bad
+
+    ok, bad = asyncio.run(scenario())
+    assert ok.lookups == ["a.example"]
+    assert ok.get_stats()["hits"] == 1
+    assert bad.lookups == ["missing.example"]
+    assert bad.get_stats()["negative_hits"] == 1
+
+
+def test_lru_eviction():
+    async def scenario():
+        cache = CountingCache(max_size=2)
+        for host in ("a.example", "b.example", "a.example", "c.example"):
+            await cache.resolve(host)
+        await cache.resolve("a.example")
+        await cache.resolve("b.example")
+        return cache
+
+    cache = asyncio.run(scenario())
+    # b 最久未使用，插入 c 时被淘汰，之后需要重新解析
+    assert cache.lookups == ["a.example", "b.example", "c.example", "b.example"]
+    assert cache.get_stats()["evictions"] == 2
+
+
+def test_concurrent_lookups_are_coalesced():
+    async def scenario():
+        cache = CountingCache(delay=0.01)
+        results = await asyncio.gather(*(cache.resolve("a.example") for _ in range(5)))
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert cache.lookups == ["a.example"]
+    assert results == [["10.0.0.1"]] * 5
+    assert cache.get_stats()["coalesced"] == 4
+
+
+def test_cancelled_leader_does_not_fail_waiters():
+    async def scenario():
+        cache = CountingCache(delay=0.05)
+        leader = asyncio.create_task(cache.resolve("a.example"))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.resolve("a.example")) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        return cache, leader, results
+
+    cache, leader, results = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert results == [["10.0.0.1"]] * 3
+    assert cache.lookups == ["a.example"]
+
+
+def test_transport_resolves_through_cache():
+    class RecordingBackend(httpcore.AsyncNetworkBackend):
+        def __init__(self):
+            self.hosts = []
+
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            self.hosts.append(host)
+            raise httpcore.ConnectError("拒绝连接")
+
+    async def scenario():
+        cache = CountingCache()
+        transport = CachedDNSTransport(cache)
+        backend = RecordingBackend()
+        # 替换底层网络后端，只验证传入的是解析后的IP
+        transport._pool._network_backend._backend = backend
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(httpx.ConnectError):
+                await client.get("http://a.example/")
+        return cache, backend
+
+    cache, backend = asyncio.run(scenario())
+    assert cache.lookups == ["a.example"]
+    assert backend.hosts == ["10.0.0.1"]
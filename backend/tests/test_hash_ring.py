@@ -0,0 +1,49 @@
+"""
+一致性哈希环测试
+"""
+from collections import Counter
+
+from app.services.cluster import HashRing
+
+SERVICE_IDS = range(1, 10001)
+
+
+def assignments(ring):
+    return {service_id: ring.owner(service_id) for service_id in SERVICE_IDS}
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing([], 100).owner(1) is None
+
+
+def test_owner_is_deterministic_and_order_independent():
+    first = HashRing(["a", "b", "c"], 100)
+    second = HashRing(["c", "a", "b", "a"], 100)
+    assert first.nodes == ["a", "b", "c"]
+    assert assignments(first) == assignments(second)
+
+
+def test_load_is_balanced_with_virtual_nodes():
+    counts = Counter(assignments(HashRing(["a", "b", "c", "d"], 100)).values())
+    assert set(counts) == {"a", "b", "c", "d"}
+    # 每个节点负责的服务数与平均值相差不超过30%
+    assert max(counts.values()) < 2500 * 1.3
+    assert min(counts.values()) > 2500 * 0.7
+
+
+def test_adding_a_node_moves_only_its_share():
+    before = assignments(HashRing(["a", "b", "c"], 100))
+    after = assignments(HashRing(["a", "b", "c", "d"], 100))
+    moved = [service_id for service_id in SERVICE_IDS if before[service_id] != after[service_id]]
+
+    # 换节点的服务都归了新节点，数量约为 1/4
+    assert all(after[service_id] == "d" for service_id in moved)
+    assert 0.15 < len(moved) / len(SERVICE_IDS) < 0.35
+
+
+def test_removing_a_node_keeps_other_assignments():
+    before = assignments(HashRing(["a", "b", "c"], 100))
+    after = assignments(HashRing(["a", "c"], 100))
+    for service_id in SERVICE_IDS:
+        if before[service_id] != "b":
+            assert after[service_id] == before[service_id]
@@ -0,0 +1,59 @@
+"""
+数据库租约选主测试
+"""
+import os
+
+from app.core.config import settings
+from app.services.leader import LeaderElector, default_node_id
+
+
+def make_elector(node_id):
+    return LeaderElector(name="test", lease_seconds=30, renew_interval=10, node_id=node_id)
+
+
+def test_first_insert_wins(db_tables):
+    a, b = make_elector("a"), make_elector("b")
+    assert a._insert_lease() == 1
+    assert b._insert_lease() == 0
+    assert b._read_lease() == ("a", 1)
+
+
+def test_take_over_is_conditional_on_observed_version(db_tables):
+    a, b, c = make_elector("a"), make_elector("b"), make_elector("c")
+    a._insert_lease()
+
+    # b 和 c 观察到同一版本后同时抢占，只有一个成功
+    assert b._take_over(1) == 2
+    assert c._take_over(1) == 0
+    assert a._read_lease() == ("b", 2)
+
+
+def test_renew_fails_after_take_over(db_tables):
+    a, b = make_elector("a"), make_elector("b")
+    a._insert_lease()
+    assert a._renew_lease(1) == 2
+    assert b._take_over(2) == 3
+    # 原持有者续约失败，需要让出
+    assert a._renew_lease(2) == 0
+
+
+def test_only_holder_can_release(db_tables):
+    a, b = make_elector("a"), make_elector("b")
+    a._insert_lease()
+    b._release_lease()
+    assert a._read_lease() == ("a", 1)
+
+    a._release_lease()
+    assert a._read_lease() == (None, 2)
+    assert b._take_over(2) == 3
+
+
+def test_node_ids_are_unique_even_with_shared_node_id(monkeypatch):
+    monkeypatch.setattr(settings, "NODE_ID", "monitor")
+    first = default_node_id.__wrapped__()
+    second = default_node_id.__wrapped__()
+
+    assert first.startswith(f"monitor:{os.getpid()}:")
+    assert first != second
+    # 进程内只生成一次
+    assert default_node_id() == default_node_id()
@@ -0,0 +1,281 @@
+"""
+探测调度器测试
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.services.monitor import ProbeDispatcher
+
+
+class FakeMonitor:
+    """记录并发情况的假探测器，探测在 release() 之前一直挂起"""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.started = []
+        self.processed = []
+        self._gate = asyncio.Event()
+
+    async def check_service(self, service):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.started.append(service.id)
+        try:
+            await self._gate.wait()
+        finally:
+            self.running -= 1
+        return {"service_id": service.id}
+
+    async def process_result(self, service, result):
+        self.processed.append(service.id)
+
+    def release(self):
+        self._gate.set()
+
+
+def make_service(service_id, url="http://a.example:80/", priority="normal"):
+    return SimpleNamespace(id=service_id, url=url, priority=priority, http2=False)
+
+
+def make_dispatcher(monitor, **kwargs):
+    options = dict(max_concurrency=3, per_origin_limit=2, max_queue_size=100)
+    options.update(kwargs)
+    return ProbeDispatcher(monitor, **options)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def drain(dispatcher, timeout=2.0):
+    """等待已提交的探测全部执行完"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while dispatcher.in_flight and loop.time() < deadline:
+        await asyncio.sleep(0.001)
+
+
+def test_origin_of_normalizes_default_ports():
+    assert ProbeDispatcher.origin_of("https://a.example/x") == "https://a.example:443"
+    assert ProbeDispatcher.origin_of("http://a.example/x") == "http://a.example:80"
+    assert ProbeDispatcher.origin_of("http://a.example:8080/x") == "http://a.example:8080"
+
+
+def test_global_and_per_origin_limits():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor)
+        for service_id in range(4):
+            dispatcher.submit(make_service(service_id, "http://a.example/"))
+        for service_id in range(4, 8):
+            dispatcher.submit(make_service(service_id, "http://b.example/"))
+        await settle()
+
+        assert dispatcher.get_stats()["running"] == 3
+        assert max(dispatcher.running_by_origin().values()) <= 2
+        assert dispatcher.queue_depth == 5
+
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return monitor, dispatcher
+
+    monitor, dispatcher = asyncio.run(scenario())
+    assert monitor.max_running == 3
+    assert sorted(monitor.processed) == list(range(8))
+    assert dispatcher.get_stats()["completed"] == 8
+
+
+def test_queue_full_rejects_same_priority():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, max_concurrency=1, max_queue_size=2)
+        results = [dispatcher.submit(make_service(service_id)) for service_id in range(4)]
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return results, dispatcher
+
+    results, dispatcher = asyncio.run(scenario())
+    # 第一个立即执行，两个排队，第四个因队列已满被拒绝
+    assert results == [True, True, True, False]
+    assert dispatcher.get_stats()["rejected"] == 1
+
+
+def test_pending_probes_start_in_submit_order():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, max_concurrency=1)
+        for service_id in range(5):
+            dispatcher.submit(make_service(service_id, f"http://h{service_id}.example/"))
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    assert monitor.started == [0, 1, 2, 3, 4]
+
+
+def test_failed_probe_releases_slot():
+    class FailingMonitor(FakeMonitor):
+        async def check_service(self, service):
+            raise RuntimeError("boom")
+
+    async def scenario():
+        monitor = FailingMonitor()
+        dispatcher = make_dispatcher(monitor, max_concurrency=1)
+        dispatcher.submit(make_service(1))
+        dispatcher.submit(make_service(2))
+        await drain(dispatcher)
+        await dispatcher.close()
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    stats = dispatcher.get_stats()
+    assert stats["completed"] == 2
+    assert stats["running"] == 0
+    assert dispatcher.running_by_origin() == {}
+
+
+def test_overlap_skip_drops_probe_while_previous_in_flight():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, overlap_policy="skip")
+        service = make_service(1)
+        results = [dispatcher.submit(service) for _ in range(3)]
+        monitor.release()
+        await drain(dispatcher)
+        assert dispatcher.submit(service)
+        await drain(dispatcher)
+        await dispatcher.close()
+        return results, monitor, dispatcher
+
+    results, monitor, dispatcher = asyncio.run(scenario())
+    assert results == [True, False, False]
+    assert monitor.started == [1, 1]
+    assert dispatcher.skipped_of(1) == 2
+
+
+def test_overlap_queue_one_runs_once_after_previous():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, overlap_policy="queue_one")
+        service = make_service(1)
+        results = [dispatcher.submit(service) for _ in range(4)]
+        await settle()
+        assert monitor.running == 1
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return results, monitor, dispatcher
+
+    results, monitor, dispatcher = asyncio.run(scenario())
+    # 第二次暂存，上一次结束后执行；第三、四次跳过
+    assert results == [True, True, False, False]
+    assert monitor.started == [1, 1]
+    assert monitor.max_running == 1
+    assert dispatcher.skipped_of(1) == 2
+
+
+def test_overlap_allow_n_caps_per_service():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, overlap_policy="allow_n", max_per_service=2)
+        service = make_service(1)
+        results = [dispatcher.submit(service) for _ in range(3)]
+        await settle()
+        running = monitor.running
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return results, running, dispatcher
+
+    results, running, dispatcher = asyncio.run(scenario())
+    assert results == [True, True, False]
+    assert running == 2
+    assert dispatcher.get_stats()["overlap"]["services_in_flight"] == 0
+
+
+def test_higher_priority_starts_first():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, max_concurrency=1)
+        dispatcher.submit(make_service(0, "http://h0.example/"))
+        for service_id, priority in ((1, "low"), (2, "normal"), (3, "critical"), (4, "low"), (5, "critical")):
+            dispatcher.submit(make_service(service_id, f"http://h{service_id}.example/", priority))
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    assert monitor.started == [0, 3, 5, 2, 1, 4]
+
+
+def test_low_priority_shed_above_ratio():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, max_concurrency=1, max_queue_size=4, shed_low_ratio=0.5)
+        dispatcher.submit(make_service(0))
+        results = [dispatcher.submit(make_service(service_id, priority="low")) for service_id in range(1, 4)]
+        normal = dispatcher.submit(make_service(4))
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return results, normal, dispatcher
+
+    results, normal, dispatcher = asyncio.run(scenario())
+    # 待执行达到容量一半后新的low探测直接丢弃，normal不受影响
+    assert results == [True, True, False]
+    assert normal
+    assert dispatcher.get_stats()["priority_classes"]["low"]["shed"] == 1
+
+
+def test_full_queue_evicts_newest_lowest_priority():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, max_concurrency=1, max_queue_size=3)
+        dispatcher.submit(make_service(0, "http://h0.example/"))
+        dispatcher.submit(make_service(1, "http://h1.example/", "low"))
+        dispatcher.submit(make_service(2, "http://h2.example/", "normal"))
+        dispatcher.submit(make_service(3, "http://h3.example/", "low"))
+        accepted = [
+            dispatcher.submit(make_service(4, "http://h4.example/", "critical")),
+            dispatcher.submit(make_service(5, "http://h5.example/", "normal")),
+            dispatcher.submit(make_service(6, "http://h6.example/", "normal")),
+        ]
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return accepted, monitor, dispatcher
+
+    accepted, monitor, dispatcher = asyncio.run(scenario())
+    # critical 挤掉最后入队的 low(3)，normal 挤掉 low(1)，之后没有更低优先级可挤，拒绝
+    assert accepted == [True, True, False]
+    assert monitor.started == [0, 4, 2, 5]
+    shed = dispatcher.get_stats()["priority_classes"]
+    assert shed["low"]["shed"] == 2
+    assert shed["normal"]["shed"] == 1
+    assert dispatcher.queue_depth == 0
+
+
+def test_parked_probe_keeps_its_place():
+    async def scenario():
+        monitor = FakeMonitor()
+        dispatcher = make_dispatcher(monitor, max_concurrency=2, per_origin_limit=1)
+        dispatcher.submit(make_service(0, "http://a.example/"))
+        dispatcher.submit(make_service(1, "http://a.example/"))
+        dispatcher.submit(make_service(2, "http://b.example/"))
+        dispatcher.submit(make_service(3, "http://c.example/"))
+        await settle()
+        monitor.release()
+        await drain(dispatcher)
+        await dispatcher.close()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    # 1 因源站a并发已满暂存，a空出后先于更晚入队的 3 执行
+    assert monitor.started == [0, 2, 1, 3]
@@ -0,0 +1,40 @@
+"""
+多进程探测工作池统计汇总测试
+"""
+from types import SimpleNamespace
+
+from app.services.probe_workers import ProbeWorkerPool
+
+
+def overlap(skipped_by_service, deferred_total=0, in_flight=0):
+    return {
+        "services_in_flight": in_flight,
+        "deferred": 0,
+        "deferred_total": deferred_total,
+        "skipped": sum(skipped_by_service.values()),
+        "skipped_by_service": skipped_by_service
+    }
+
+
+def test_overlap_stats_aggregate_workers_and_restarts():
+    pool = ProbeWorkerPool(2)
+    pool._workers = [SimpleNamespace(pid=100), SimpleNamespace(pid=200)]
+
+    pool._on_stats(0, 100, overlap({1: 3, 2: 1}, deferred_total=2, in_flight=5))
+    pool._on_stats(1, 200, overlap({3: 4}, in_flight=1))
+    stats = pool.overlap_stats()
+    assert stats["reporting_workers"] == 2
+    assert stats["skipped"] == 8
+    assert stats["deferred_total"] == 2
+    assert stats["services_in_flight"] == 6
+    assert stats["top_skipped"][0] == (3, 4)
+    assert pool.skipped_of(1) == 3
+
+    # 工作进程重启后计数从零开始，之前的累计值保留；旧进程排队中的统计被忽略
+    pool._retire_stats(0)
+    pool._workers[0] = SimpleNamespace(pid=101)
+    pool._on_stats(0, 100, overlap({1: 9}))
+    pool._on_stats(0, 101, overlap({1: 2}))
+    assert pool.skipped_of(1) == 5
+    assert pool.overlap_stats()["skipped"] == 10
+    assert pool.overlap_stats()["deferred_total"] == 2
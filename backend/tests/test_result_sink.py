@@ -0,0 +1,66 @@
+"""
+探测结果写缓冲测试
+"""
+import asyncio
+
+from app.services.result_sink import ResultSink
+
+
+class FlakySink(ResultSink):
+    """前 failures 次写库失败，之后记录写入的批次"""
+
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(flush_interval_ms=10, batch_size=10, max_buffer=100, retry_backoff_ms=1, **kwargs)
+        self.failures = failures
+        self.batches = []
+
+    def _write_batch(self, results):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("Deadlock found when trying to get lock")
+        self.batches.append(list(results))
+
+    def _apply_rollups(self, log_rows):
+        pass
+
+
+async def run_sink(sink, count):
+    sink.start()
+    for index in range(count):
+        await sink.put({"service_id": index})
+    await sink.stop()
+
+
+def test_failed_batch_is_retried():
+    sink = FlakySink(failures=2, max_retries=3)
+    asyncio.run(run_sink(sink, 5))
+
+    assert [len(batch) for batch in sink.batches] == [5]
+    stats = sink.get_stats()
+    assert stats["retries"] == 2
+    assert stats["failed_rows"] == 0
+
+
+def test_batch_dropped_after_max_retries():
+    sink = FlakySink(failures=10, max_retries=2)
+    asyncio.run(run_sink(sink, 5))
+
+    assert sink.batches == []
+    stats = sink.get_stats()
+    assert stats["retries"] == 2
+    assert stats["failed_rows"] == 5
+
+
+def test_rollup_failure_keeps_logs():
+    class RollupFailingSink(FlakySink):
+        def _apply_rollups(self, log_rows):
+            raise RuntimeError("Lock wait timeout exceeded")
+
+    sink = RollupFailingSink(failures=0, max_retries=1)
+    asyncio.run(run_sink(sink, 5))
+
+    # 日志已写入，只有汇总计为失败
+    assert [len(batch) for batch in sink.batches] == [5]
+    stats = sink.get_stats()
+    assert stats["failed_rows"] == 0
+    assert stats["rollup_failed_rows"] == 5
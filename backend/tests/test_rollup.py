@@ -0,0 +1,179 @@
+"""
+统计汇总测试
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select, func
+
+from app.core.database import get_db_session
+from app.models.monitor_log import MonitorLog
+from app.models.rollup import MonitorRollup, MonitorRollupBackfill
+from app.services.rollup import (
+    RollupService, ROLLUP_TABLES, HISTOGRAM_BOUNDS, DASHBOARD_BOUNDS,
+    check_bounds, histogram_bucket, merge_buckets, truncate
+)
+
+
+def log_row(service_id, check_time, status="success", response_time=120.0, **fields):
+    row = {"service_id": service_id, "check_time": check_time, "status": status,
+           "response_time": response_time, "alert_sent": False}
+    row.update(fields)
+    return row
+
+
+def test_cover_splits_into_coarsest_segments():
+    start = datetime.now().replace(microsecond=0) - timedelta(days=1, hours=2)
+    start = start.replace(minute=50, second=0)
+    end = start + timedelta(days=1, hours=3, minutes=20)
+    segments = RollupService.cover(start, end)
+
+    # 首尾相接覆盖整个范围，中间使用更粗的粒度
+    assert segments[0][1] == start
+    assert segments[-1][2] == end
+    for (_, _, previous_end), (_, next_start, _) in zip(segments, segments[1:]):
+        assert previous_end == next_start
+    granularities = [segment[0] for segment in segments]
+    assert granularities[0] == "minute" and granularities[-1] == "minute"
+    assert "hour" in granularities
+    for granularity, segment_start, segment_end in segments:
+        assert truncate(segment_start, granularity) == segment_start
+        if granularity != "minute":
+            assert truncate(segment_end, granularity) == segment_end
+
+
+def test_cover_aligned_day_uses_single_segment():
+    day = truncate(datetime.now(), "day") - timedelta(days=1)
+    assert RollupService.cover(day, day + timedelta(days=1)) == [("day", day, day + timedelta(days=1))]
+
+
+def test_accumulate_counts_and_histogram():
+    moment = datetime(2026, 1, 1, 10, 15, 30)
+    rows = [
+        log_row(1, moment, response_time=50.0, dns_time=2.0),
+        log_row(1, moment + timedelta(seconds=10), response_time=250.0, alert_sent=True),
+        log_row(1, moment + timedelta(minutes=1), status="timeout", response_time=None),
+        log_row(2, moment, status="failed", response_time=30.0),
+    ]
+    rollups, histograms = RollupService.accumulate(rows, ("minute", "hour"))
+
+    minute = rollups[(1, "minute", datetime(2026, 1, 1, 10, 15))]
+    assert minute["total_count"] == 2
+    assert minute["success_count"] == 2
+    assert minute["alert_count"] == 1
+    assert minute["response_time_min"] == 50.0
+    assert minute["response_time_max"] == 250.0
+    assert minute["response_time_sq_sum"] == 50.0 ** 2 + 250.0 ** 2
+    assert minute["dns_time_count"] == 1
+
+    hour = rollups[(1, "hour", datetime(2026, 1, 1, 10))]
+    assert hour["total_count"] == 3
+    assert hour["timeout_count"] == 1
+    assert hour["response_time_count"] == 2
+    assert rollups[(2, "hour", datetime(2026, 1, 1, 10))]["failed_count"] == 1
+
+    # 只有成功检查计入响应时间分布
+    hour_buckets = {key[3]: count for key, count in histograms.items() if key[:3] == (1, "hour", datetime(2026, 1, 1, 10))}
+    assert hour_buckets == {histogram_bucket(50.0): 1, histogram_bucket(250.0): 1}
+    assert not any(key[0] == 2 for key in histograms)
+
+
+def test_histogram_merges_into_dashboard_bounds():
+    counts = {}
+    for response_time in (0.5, 99.0, 100.0, 250.0, 400.0, 999.0, 1000.0, 45000.0):
+        bucket = histogram_bucket(response_time)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    assert merge_buckets(counts, DASHBOARD_BOUNDS) == [2, 2, 1, 1, 2]
+    assert sum(merge_buckets(counts, HISTOGRAM_BOUNDS)) == 8
+
+
+def test_bounds_must_include_dashboard_bounds():
+    check_bounds(HISTOGRAM_BOUNDS)
+    with pytest.raises(ValueError, match="300"):
+        check_bounds((1, 10, 100, 200, 500, 1000))
+
+
+def insert_logs(rows):
+    with get_db_session() as db:
+        db.execute(insert(MonitorLog), rows)
+        return db.execute(select(func.max(MonitorLog.id))).scalar()
+
+
+def total_count():
+    with get_db_session() as db:
+        return db.execute(
+            select(func.sum(MonitorRollup.total_count)).where(MonitorRollup.granularity == "day")
+        ).scalar() or 0
+
+
+def test_pending_backfill_detects_new_tables(db_tables):
+    service = RollupService()
+    insert_logs([log_row(1, datetime.now())])
+    assert service.pending_backfill() == ([], None)
+
+    for table in ROLLUP_TABLES:
+        table.drop(db_tables)
+    tables, max_log_id = service.pending_backfill()
+    assert tables == [table.name for table in ROLLUP_TABLES]
+    assert max_log_id == 1
+    for table in ROLLUP_TABLES:
+        table.create(db_tables)
+
+
+def test_backfill_adds_only_logs_before_upgrade(db_tables):
+    service = RollupService()
+    now = datetime.now().replace(microsecond=0)
+    old_rows = [log_row(1, now - timedelta(days=days)) for days in (0, 0, 3, 5)]
+    max_log_id = insert_logs(old_rows)
+    service.plan_backfill([table.name for table in ROLLUP_TABLES], max_log_id)
+    # 重复记录（多个进程同时初始化）被忽略
+    service.plan_backfill([table.name for table in ROLLUP_TABLES], max_log_id)
+
+    # 升级后写入的日志已增量累加，回填不能重复计入
+    new_row = log_row(1, now)
+    insert_logs([new_row])
+    service.apply_batch([new_row])
+
+    result = service.backfill()
+    assert result["days"] == 3
+    assert result["log_rows"] == 4
+    assert total_count() == 5
+    with get_db_session() as db:
+        assert db.execute(select(func.count()).select_from(MonitorRollupBackfill)).scalar() == 0
+    assert service.backfill() is None
+
+
+def test_backfill_resumes_after_stop(db_tables):
+    service = RollupService()
+    now = datetime.now().replace(microsecond=0)
+    max_log_id = insert_logs([log_row(1, now - timedelta(days=days)) for days in (1, 2, 3)])
+    service.plan_backfill([table.name for table in ROLLUP_TABLES], max_log_id)
+
+    calls = []
+    first = service.backfill(should_stop=lambda: calls.append(1) or len(calls) > 1)
+    assert first["days"] == 1
+    assert first["interrupted"]
+    assert total_count() == 1
+
+    second = service.backfill()
+    assert second["days"] == 2
+    assert total_count() == 3
+
+
+def test_rebuild_keeps_rollups_of_purged_days(db_tables):
+    service = RollupService()
+    today = truncate(datetime.now(), "day")
+    rows = [log_row(1, today - timedelta(days=days) + timedelta(hours=12)) for days in (5, 3, 1)]
+    insert_logs(rows)
+    service.apply_batch(rows)
+
+    # 模拟日志清理：最早一天的原始日志已删除，汇总保留
+    with get_db_session() as db:
+        db.query(MonitorLog).filter(MonitorLog.check_time < today - timedelta(days=4)).delete()
+
+    result = service.rebuild(today - timedelta(days=10), today)
+    # 最早日志所在的一天可能只清理了一部分，也不重建
+    assert result["start"] == (today - timedelta(days=2)).isoformat()
+    assert result["days"] == 2
+    assert result["log_rows"] == 1
+    assert total_count() == 3
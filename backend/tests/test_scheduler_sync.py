@@ -0,0 +1,35 @@
+"""
+调度器兜底同步测试
+"""
+import asyncio
+from datetime import datetime
+
+from app.services.scheduler import SchedulerService
+from app.services.service_registry import ProbeTarget, service_registry
+
+
+def make_target(service_id, updated_at=None):
+    return ProbeTarget(id=service_id, name=f"s{service_id}", url="http://a.example/", interval=60,
+                       is_active=True, updated_at=updated_at or datetime(2026, 10, 17, 10))
+
+
+def test_incremental_sync_removes_services_deleted_elsewhere():
+    scheduler = SchedulerService()
+    scheduler._running = True
+    loads = [
+        ([make_target(1), make_target(2), make_target(3)], {1, 2, 3}),
+        # 增量同步：没有变更的行，服务2在其他进程中被删除、服务3被直接改库禁用
+        ([], {1}),
+    ]
+    scheduler._load_targets = lambda since: loads.pop(0)
+    try:
+        asyncio.run(scheduler._refresh_monitor_jobs())
+        assert sorted(scheduler.wheel.keys()) == [1, 2, 3]
+
+        asyncio.run(scheduler._refresh_monitor_jobs())
+        assert list(scheduler.wheel.keys()) == [1]
+        assert service_registry.get(2) is None
+        assert service_registry.get(3) is None
+        assert service_registry.get(1) is not None
+    finally:
+        service_registry.replace_all([])
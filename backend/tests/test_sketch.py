@@ -0,0 +1,94 @@
+"""
+分位数草图测试
+"""
+import random
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.core.database import get_db_session
+from app.models.rollup import MonitorRollupSketch
+from app.services.rollup import RollupService
+from app.services.sketch import DDSketch
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5, 1.2) for _ in range(5000)]
+    sketch = DDSketch(0.01)
+    for value in values:
+        sketch.add(value)
+
+    estimates = sketch.quantiles([0.5, 0.9, 0.99])
+    for q, estimate in estimates.items():
+        exact = exact_quantile(values, q)
+        assert abs(estimate - exact) <= 0.01 * exact + 1e-9
+        assert sketch.quantile(q) == estimate
+
+
+def test_merge_equals_single_sketch():
+    left, right, combined = DDSketch(), DDSketch(), DDSketch()
+    for value in range(1, 500):
+        (left if value % 2 else right).add(float(value))
+        combined.add(float(value))
+    left.add(0.0)
+    combined.add(0.0)
+    left.merge(right)
+
+    assert left.bins == combined.bins
+    assert left.count == combined.count == 500
+    assert left.zero_count == 1
+
+
+def test_merge_with_different_accuracy_keeps_counts():
+    fine, coarse = DDSketch(0.001), DDSketch(0.02)
+    for value in (1.0, 10.0, 100.0):
+        fine.add(value)
+    fine.add(0.0)
+    coarse.merge(fine)
+    assert coarse.count == 4
+    assert coarse.zero_count == 1
+    assert coarse.quantile(1.0) == pytest.approx(100.0, rel=0.02)
+
+
+def test_encoding_round_trip_with_large_keys():
+    # 相对误差0.0001时60秒的区间序号约为55000，超出int16
+    sketch = DDSketch(0.0001)
+    for value in (0.0, 0.5, 250.0, 60000.0):
+        sketch.add(value)
+    assert max(sketch.bins) > 2 ** 15
+
+    decoded = DDSketch.from_bytes(sketch.to_bytes())
+    assert decoded.bins == sketch.bins
+    assert decoded.count == 4
+    assert decoded.quantile(1.0) == pytest.approx(60000.0, rel=1e-4)
+
+
+@pytest.mark.parametrize("accuracy", [0, -0.1, 1, 1.5])
+def test_invalid_accuracy_rejected(accuracy):
+    with pytest.raises(ValueError):
+        DDSketch(accuracy)
+
+
+def test_apply_merges_into_existing_sketch(db_tables):
+    service = RollupService()
+    moment = datetime(2026, 1, 1, 10, 30)
+    row = {"service_id": 1, "check_time": moment, "status": "success", "response_time": 100.0, "alert_sent": False}
+    for response_time in (100.0, 200.0):
+        with get_db_session() as db:
+            service.apply(db, [dict(row, response_time=response_time)])
+
+    with get_db_session() as db:
+        sketches = db.execute(
+            select(MonitorRollupSketch.granularity, MonitorRollupSketch.count, MonitorRollupSketch.data)
+        ).all()
+    assert sorted(granularity for granularity, _, _ in sketches) == ["day", "hour"]
+    for _, count, data in sketches:
+        assert count == 2
+        assert DDSketch.from_bytes(data).quantile(1.0) == pytest.approx(200.0, rel=0.01)
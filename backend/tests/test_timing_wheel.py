@@ -0,0 +1,131 @@
+"""
+时间轮调度测试
+"""
+import asyncio
+import time
+
+from app.services.scheduler import TimingWheel
+
+
+async def _noop(keys):
+    pass
+
+
+def make_wheel(slots=8, tick=1.0):
+    return TimingWheel(tick=tick, slots=slots, dispatch=_noop)
+
+
+def advance(wheel, ticks):
+    """手动推进时间轮，返回 到期tick -> 到期任务"""
+    fired = {}
+    for _ in range(ticks):
+        wheel._tick_no += 1
+        due = wheel._advance(wheel._tick_no)
+        if due:
+            fired[wheel._tick_no] = sorted(due)
+    return fired
+
+
+def test_task_fires_every_interval():
+    wheel = make_wheel()
+    wheel.add("a", interval=3)
+    fired = advance(wheel, 10)
+    assert fired == {3: ["a"], 6: ["a"], 9: ["a"]}
+
+
+def test_interval_longer_than_one_round():
+    wheel = make_wheel(slots=8)
+    wheel.add("a", interval=20)
+    fired = advance(wheel, 45)
+    # 槽序号相同的前几圈不会误触发
+    assert fired == {20: ["a"], 40: ["a"]}
+
+
+def test_first_delay_and_remove():
+    wheel = make_wheel()
+    wheel.add("a", interval=5, first_delay=1)
+    wheel.add("b", interval=2)
+    assert advance(wheel, 2) == {1: ["a"], 2: ["b"]}
+    assert wheel.remove("b")
+    assert not wheel.remove("b")
+    assert "b" not in wheel
+    assert advance(wheel, 6) == {6: ["a"]}
+    assert len(wheel) == 1
+
+
+def test_set_interval_shortens_remaining_wait():
+    wheel = make_wheel()
+    wheel.add("a", interval=10)
+    advance(wheel, 2)
+    wheel.set_interval("a", 3)
+    assert wheel.interval_of("a") == 3
+    assert advance(wheel, 6) == {5: ["a"], 8: ["a"]}
+
+
+def test_missed_ticks_are_caught_up_in_one_batch():
+    batches = []
+
+    async def dispatch(keys):
+        batches.append(sorted(keys))
+
+    async def scenario():
+        wheel = TimingWheel(tick=0.01, slots=16, dispatch=dispatch)
+        wheel.add("a", interval=0.01)
+        wheel.add("b", interval=0.02)
+        wheel.start()
+        await asyncio.sleep(0.005)
+        # 阻塞事件循环，错过若干tick
+        time.sleep(0.05)
+        await asyncio.sleep(0.005)
+        wheel.stop()
+
+    asyncio.run(scenario())
+    assert batches
+    # 被阻塞后的第一批包含错过的各个tick内到期的任务
+    assert batches[0].count("a") >= 3
+    assert "b" in batches[0]
+
+
+def test_phase_aligns_to_absolute_ticks():
+    wheel = make_wheel(slots=64)
+    interval = 10
+    for key, phase in (("a", 0.0), ("b", 0.35), ("c", 0.9)):
+        wheel.add(key, interval=interval, phase=phase)
+    fired = advance(wheel, 40)
+
+    offsets = {}
+    for tick_no, keys in fired.items():
+        for key in keys:
+            offsets.setdefault(key, set()).add((tick_no + wheel._epoch_tick) % interval)
+    assert offsets == {"a": {0}, "b": {3}, "c": {9}}
+
+
+def test_phases_spread_same_interval_tasks():
+    wheel = make_wheel(slots=128)
+    interval = 60
+    for key in range(60):
+        wheel.add(key, interval=interval, phase=key / 60)
+    fired = advance(wheel, interval)
+    assert len(fired) == 60
+    assert all(len(keys) == 1 for keys in fired.values())
+
+
+def test_aligned_delay_matches_first_fire():
+    wheel = make_wheel(slots=64)
+    delay = wheel.aligned_delay(12, 0.5)
+    wheel.add("a", interval=12, phase=0.5)
+    fired = advance(wheel, 12)
+    assert list(fired) == [int(delay)]
+
+
+def test_phase_of_is_stable_and_spread():
+    from app.services.scheduler import SchedulerService
+
+    phases = [SchedulerService.phase_of(service_id) for service_id in range(1, 1001)]
+    assert phases == [SchedulerService.phase_of(service_id) for service_id in range(1, 1001)]
+    assert all(0 <= phase < 1 for phase in phases)
+    # 连续ID均匀分布在十个区间内
+    buckets = [0] * 10
+    for phase in phases:
+        buckets[int(phase * 10)] += 1
+    assert min(buckets) >= 80